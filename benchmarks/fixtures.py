@@ -0,0 +1,273 @@
+import gzip
+import json
+import random
+import requests
+
+ERAS = {
+    "frontier": {
+        "start": 200000,
+        "transactions": 5,
+        "contract_share": 0.1,
+        "max_subtraces": 1,
+        "max_depth": 1,
+        "events_per_call": 0.2
+    },
+    "byzantium": {
+        "start": 5000000,
+        "transactions": 150,
+        "contract_share": 0.5,
+        "max_subtraces": 1,
+        "max_depth": 3,
+        "events_per_call": 0.5
+    },
+    "istanbul": {
+        "start": 9500000,
+        "transactions": 200,
+        "contract_share": 0.7,
+        "max_subtraces": 2,
+        "max_depth": 3,
+        "events_per_call": 0.6
+    }
+}
+TRANSFER_METHOD = "0xa9059cbb"
+TRANSFER_EVENT = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+BLOCK_REWARD = 3 * 10 ** 18
+
+
+def _random_hex(generator, size):
+    return "0x" + "".join(generator.choice("0123456789abcdef") for _ in range(size * 2))
+
+
+def _encode_word(value):
+    if isinstance(value, str):
+        value = int(value, 16)
+    return "{:064x}".format(value)
+
+
+def _generate_calls(generator, era, transaction, trace_address, depth):
+    """
+    Generate trace of a contract call with nested calls
+
+    Returns
+    -------
+    list
+        Traces in the order returned by trace_block
+    """
+    subtraces = generator.randint(0, era["max_subtraces"]) if depth < era["max_depth"] else 0
+    to = transaction["to"] if not trace_address else _random_hex(generator, 20)
+    trace = {
+        "action": {
+            "callType": "call",
+            "from": transaction["from"] if not trace_address else transaction["to"],
+            "gas": hex(generator.randint(21000, 500000)),
+            "input": TRANSFER_METHOD + _encode_word(to) + _encode_word(generator.randint(1, 10 ** 24)),
+            "to": to,
+            "value": hex(0)
+        },
+        "blockHash": transaction["blockHash"],
+        "blockNumber": int(transaction["blockNumber"], 16),
+        "result": {
+            "gasUsed": hex(generator.randint(5000, 100000)),
+            "output": "0x" + _encode_word(1)
+        },
+        "subtraces": subtraces,
+        "traceAddress": trace_address,
+        "transactionHash": transaction["hash"],
+        "transactionPosition": int(transaction["transactionIndex"], 16),
+        "type": "call"
+    }
+    if generator.random() < 0.05:
+        trace["error"] = "Reverted"
+        del trace["result"]
+    traces = [trace]
+    for index in range(subtraces):
+        traces += _generate_calls(generator, era, transaction, trace_address + [index], depth + 1)
+    return traces
+
+
+def _generate_block(generator, era, number):
+    """
+    Generate block with transactions, traces and logs similar to blocks of given era
+
+    Returns
+    -------
+    tuple
+        Block in eth_getBlockByNumber format, traces in trace_block format and logs in eth_getLogs format
+    """
+    block_hash = _random_hex(generator, 32)
+    miner = _random_hex(generator, 20)
+    block = {
+        "number": hex(number),
+        "hash": block_hash,
+        "parentHash": _random_hex(generator, 32),
+        "nonce": _random_hex(generator, 8),
+        "sha3Uncles": _random_hex(generator, 32),
+        "logsBloom": "0x" + "0" * 512,
+        "transactionsRoot": _random_hex(generator, 32),
+        "stateRoot": _random_hex(generator, 32),
+        "receiptsRoot": _random_hex(generator, 32),
+        "miner": miner,
+        "difficulty": hex(generator.randint(10 ** 12, 10 ** 15)),
+        "totalDifficulty": hex(generator.randint(10 ** 20, 10 ** 22)),
+        "extraData": "0x",
+        "size": hex(generator.randint(1000, 40000)),
+        "gasLimit": hex(8000000),
+        "gasUsed": hex(generator.randint(0, 8000000)),
+        "timestamp": hex(1438269988 + number * 14),
+        "transactions": [],
+        "uncles": []
+    }
+    traces = []
+    logs = []
+    for index in range(generator.randint(0, era["transactions"] * 2)):
+        is_call = generator.random() < era["contract_share"]
+        transaction = {
+            "hash": _random_hex(generator, 32),
+            "nonce": hex(generator.randint(0, 1000)),
+            "blockHash": block_hash,
+            "blockNumber": hex(number),
+            "transactionIndex": hex(index),
+            "from": _random_hex(generator, 20),
+            "to": _random_hex(generator, 20),
+            "value": hex(0 if is_call else generator.randint(1, 10 ** 20)),
+            "gas": hex(generator.randint(21000, 500000)),
+            "gasPrice": hex(generator.randint(10 ** 9, 10 ** 11)),
+            "input": "0x"
+        }
+        if is_call:
+            transaction_traces = _generate_calls(generator, era, transaction, [], 0)
+            transaction["input"] = transaction_traces[0]["action"]["input"]
+        else:
+            transaction_traces = [{
+                "action": {
+                    "callType": "call",
+                    "from": transaction["from"],
+                    "gas": hex(0),
+                    "input": "0x",
+                    "to": transaction["to"],
+                    "value": transaction["value"]
+                },
+                "blockHash": block_hash,
+                "blockNumber": number,
+                "result": {"gasUsed": hex(0), "output": "0x"},
+                "subtraces": 0,
+                "traceAddress": [],
+                "transactionHash": transaction["hash"],
+                "transactionPosition": index,
+                "type": "call"
+            }]
+        block["transactions"].append(transaction)
+        traces += transaction_traces
+        transaction_log_index = 0
+        for trace in transaction_traces:
+            if trace["type"] != "call" or "error" in trace or trace["action"]["input"] == "0x":
+                continue
+            while generator.random() < era["events_per_call"] / (1 + era["events_per_call"]):
+                logs.append({
+                    "address": trace["action"]["to"],
+                    "blockHash": block_hash,
+                    "blockNumber": hex(number),
+                    "data": "0x" + _encode_word(generator.randint(1, 10 ** 24)),
+                    "logIndex": hex(len(logs)),
+                    "removed": False,
+                    "topics": [TRANSFER_EVENT, "0x" + _encode_word(trace["action"]["from"]),
+                               "0x" + _encode_word(_random_hex(generator, 20))],
+                    "transactionHash": transaction["hash"],
+                    "transactionIndex": hex(index),
+                    "transactionLogIndex": hex(transaction_log_index),
+                    "type": "mined"
+                })
+                transaction_log_index += 1
+    traces.append({
+        "action": {"author": miner, "rewardType": "block", "value": hex(BLOCK_REWARD)},
+        "blockHash": block_hash,
+        "blockNumber": number,
+        "result": None,
+        "subtraces": 0,
+        "traceAddress": [],
+        "transactionHash": None,
+        "transactionPosition": None,
+        "type": "reward"
+    })
+    return block, traces, logs
+
+
+def generate_fixture(era, number_of_blocks=100, seed=0):
+    """
+    Generate synthetic blocks similar to blocks of given era
+
+    Sizes of blocks, share of contract calls, depth of traces and number of events are taken from ERAS
+
+    Parameters
+    ----------
+    era : str
+        Name of era, i.e. byzantium
+    number_of_blocks : int
+        Number of consecutive blocks
+    seed : int
+        Seed of random generator, the same seed gives the same fixture
+
+    Returns
+    -------
+    dict
+        Fixture with blocks, traces and logs by block number
+    """
+    generator = random.Random(seed)
+    era_parameters = ERAS[era]
+    fixture = {"era": era, "blocks": {}, "traces": {}, "logs": {}}
+    for number in range(era_parameters["start"], era_parameters["start"] + number_of_blocks):
+        block, traces, logs = _generate_block(generator, era_parameters, number)
+        fixture["blocks"][str(number)] = block
+        fixture["traces"][str(number)] = traces
+        fixture["logs"][str(number)] = logs
+    return fixture
+
+
+def record_fixture(node_url, start, end, era=None):
+    """
+    Record responses of parity node for blocks in [start, end)
+
+    Parameters
+    ----------
+    node_url : str
+        URL of parity JSON RPC API with tracing enabled
+    start : int
+        First block
+    end : int
+        Block after the last one
+    era : str
+        Name of recorded fixture
+
+    Returns
+    -------
+    dict
+        Fixture with blocks, traces and logs by block number
+    """
+    fixture = {"era": era or "{}-{}".format(start, end), "blocks": {}, "traces": {}, "logs": {}}
+    for number in range(start, end):
+        request = [
+            {"jsonrpc": "2.0", "id": "blocks", "method": "eth_getBlockByNumber", "params": [hex(number), True]},
+            {"jsonrpc": "2.0", "id": "traces", "method": "trace_block", "params": [hex(number)]},
+            {"jsonrpc": "2.0", "id": "logs", "method": "eth_getLogs",
+             "params": [{"fromBlock": hex(number), "toBlock": hex(number)}]}
+        ]
+        responses = requests.post(node_url, json=request).json()
+        for response in responses:
+            fixture[response["id"]][str(number)] = response["result"]
+    return fixture
+
+
+def save_fixture(fixture, path):
+    """
+    Save fixture to a compressed JSON file
+    """
+    with gzip.open(path, "wt") as fixture_file:
+        json.dump(fixture, fixture_file)
+
+
+def load_fixture(path):
+    """
+    Load fixture from a compressed JSON file
+    """
+    with gzip.open(path, "rt") as fixture_file:
+        return json.load(fixture_file)
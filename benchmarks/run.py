@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Offline ingestion benchmarks
+
+Replays recorded or generated parity responses through extraction code and reports
+blocks/s, rows/s, CPU time and peak RSS for each driver, i.e.
+
+    python3 -m benchmarks.run --era byzantium --blocks 100
+    python3 -m benchmarks.run --fixture byzantium.json.gz --drivers traces,events --clickhouse
+"""
+import json
+import resource
+import click
+from time import time
+from config import INDICES, EVENTS_RANGE_SIZE
+from clients.metrics import METRICS
+from benchmarks.fixtures import ERAS, generate_fixture, load_fixture, save_fixture, record_fixture
+from benchmarks.stub_node import StubNode
+from benchmarks.stand_in import MemoryClickhouse
+
+BENCHMARK_TABLE_PREFIX = "benchmark_"
+STANDARD_TOKEN_ABI = "standard-token-abi.json"
+# All calls of fixture traces are decoded with the standard token ABI as calls to one contract
+BENCHMARK_CONTRACT = "0x0"
+
+
+def benchmark_blocks(node_url, client, indices, start, end):
+    from operations.blocks import Blocks
+    blocks = Blocks(indices, client, node_url)
+    blocks._create_blocks(start, end - 1, max_blocks=end - start)
+
+
+def benchmark_traces(node_url, client, indices, start, end):
+    from operations.internal_transactions import InternalTransactions, NUMBER_OF_BLOCKS_PER_CHUNK
+    from operations.block_ranges import ClickhouseBlockRanges
+    indices["miner_transaction"] = indices["internal_transaction"]
+    internal_transactions = InternalTransactions(indices, client, [(None, None, node_url)])
+    internal_transactions.block_ranges = ClickhouseBlockRanges("traces_extracted", client, indices)
+    internal_transactions._save_traces = internal_transactions.block_ranges.add_blocks
+    try:
+        for chunk_start in range(start, end, NUMBER_OF_BLOCKS_PER_CHUNK):
+            internal_transactions._extract_traces_chunk(
+                list(range(chunk_start, min(chunk_start + NUMBER_OF_BLOCKS_PER_CHUNK, end)))
+            )
+        client.flush()
+    finally:
+        internal_transactions.executor.close()
+
+
+def benchmark_events(node_url, client, indices, start, end):
+    from operations.events import ClickhouseEvents
+    events = ClickhouseEvents(indices, [(None, None, node_url)], client)
+    for range_start in range(start, end, EVENTS_RANGE_SIZE):
+        block_range = (range_start, min(range_start + EVENTS_RANGE_SIZE, end))
+        events._save_events(events._get_events(block_range))
+        events._save_processed_blocks(block_range)
+    client.flush()
+
+
+def benchmark_inputs(node_url, client, indices, start, end, fixture=None):
+    from operations.inputs import ClickhouseTransactionsInputs
+    inputs = ClickhouseTransactionsInputs(indices, [(None, None, node_url)], client)
+    try:
+        inputs._set_contracts_abi({BENCHMARK_CONTRACT: open(STANDARD_TOKEN_ABI).read()})
+        encoded_params = {
+            "{}.{}".format(trace["transactionHash"], index): (BENCHMARK_CONTRACT, trace["action"]["input"])
+            for number in range(start, end)
+            for index, trace in enumerate(fixture["traces"][str(number)])
+            if trace["type"] == "call" and trace["action"]["input"] != "0x"
+        }
+        decoded_inputs = inputs._decode_inputs_batch(encoded_params)
+        client.bulk_index(index=indices["transaction_input"], docs=decoded_inputs)
+    finally:
+        inputs.executor.close()
+
+
+DRIVERS = {
+    "blocks": benchmark_blocks,
+    "traces": benchmark_traces,
+    "events": benchmark_events,
+    "inputs": benchmark_inputs
+}
+
+
+def _get_cpu_time():
+    return sum(
+        usage.ru_utime + usage.ru_stime
+        for usage in [resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)]
+    )
+
+
+def _get_peak_rss():
+    """
+    Get peak resident set size of this process and finished child processes in megabytes
+    """
+    return max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    ) / 1024
+
+
+def run_driver(driver, node_url, client, indices, start, end, **kwargs):
+    """
+    Run benchmark driver and measure its throughput
+
+    Returns
+    -------
+    dict
+        Number of blocks and inserted rows, wall and CPU time, rates and peak RSS
+    """
+    METRICS.reset()
+    cpu_time = _get_cpu_time()
+    start_time = time()
+    driver(node_url, client, indices, start, end, **kwargs)
+    elapsed = time() - start_time
+    inserted_rows = METRICS.get_state().get("extractor_rows_inserted_total", {"samples": {}})["samples"]
+    rows = sum(inserted_rows.values())
+    return {
+        "blocks": end - start,
+        "rows": rows,
+        "seconds": elapsed,
+        "blocks_per_second": (end - start) / elapsed,
+        "rows_per_second": rows / elapsed,
+        "cpu_seconds": _get_cpu_time() - cpu_time,
+        "peak_rss_mb": _get_peak_rss()
+    }
+
+
+def _create_clickhouse_client(indices):
+    """
+    Create client of local clickhouse server with empty benchmark tables
+    """
+    from clients.custom_clickhouse import CustomClickhouse
+    from operations.indices import ClickhouseIndices
+    client = CustomClickhouse()
+    for index in indices.values():
+        client.send_sql_request("DROP TABLE IF EXISTS {}".format(index))
+    ClickhouseIndices(indices).prepare_indices()
+    return client
+
+
+@click.command()
+@click.option("--era", default="byzantium", type=click.Choice(sorted(ERAS.keys())), help="Era of generated blocks")
+@click.option("--blocks", default=100, help="Number of generated or recorded blocks")
+@click.option("--fixture", default=None, help="Path to compressed fixture, generated if not specified")
+@click.option("--record", default=None, help="URL of parity node to record the fixture from")
+@click.option("--start", default=None, type=int, help="First recorded block")
+@click.option("--drivers", default=",".join(DRIVERS.keys()), help="Comma-separated list of drivers")
+@click.option("--clickhouse", is_flag=True, help="Insert into local clickhouse server instead of in-process stand-in")
+@click.option("--output", default=None, help="File to save results in JSON format")
+def main(era, blocks, fixture, record, start, drivers, clickhouse, output):
+    """
+    Benchmark ingestion with replayed parity responses
+    """
+    if record:
+        if start is None:
+            raise click.UsageError("--start is required to record a fixture")
+        recorded_fixture = record_fixture(record, start, start + blocks)
+        save_fixture(recorded_fixture, fixture or "{}-{}.json.gz".format(start, start + blocks))
+        return
+    fixture_data = load_fixture(fixture) if fixture else generate_fixture(era, blocks)
+    numbers = sorted(int(number) for number in fixture_data["blocks"].keys())
+    # Without flags table processed ranges are not imported from per-block flags
+    indices = {name: BENCHMARK_TABLE_PREFIX + table for name, table in INDICES.items() if name != "block_flag"}
+    node = StubNode(fixture_data)
+    node_url = node.start()
+    results = {}
+    try:
+        for name in drivers.split(","):
+            client = _create_clickhouse_client(indices) if clickhouse else MemoryClickhouse(indices)
+            kwargs = {"fixture": fixture_data} if name == "inputs" else {}
+            results[name] = run_driver(DRIVERS[name], node_url, client, dict(indices), numbers[0], numbers[-1] + 1,
+                                       **kwargs)
+            print("{:8s} {blocks:6d} blocks {rows:9d} rows {seconds:8.2f}s {blocks_per_second:10.1f} blocks/s "
+                  "{rows_per_second:10.1f} rows/s {cpu_seconds:8.2f}s CPU {peak_rss_mb:8.1f}MB peak RSS".format(
+                      name, **results[name]))
+    finally:
+        node.stop()
+    if output:
+        with open(output, "w") as output_file:
+            json.dump({"era": fixture_data["era"], "results": results}, output_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
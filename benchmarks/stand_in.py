@@ -0,0 +1,73 @@
+import re
+from schema.schema import SCHEMA
+from clients.row_binary import encode_rows
+from clients.metrics import METRICS
+from clients.columns import ColumnBatch
+
+
+class MemoryClickhouse:
+    """
+    In-process stand-in for a database client used by benchmarks
+
+    Inserted records get ids and are encoded in RowBinary format like records sent to clickhouse,
+    then dropped. Processed ranges are not saved, so every run starts from scratch
+
+    Parameters
+    ----------
+    indices : dict
+        Dictionary of table names
+    schema : dict
+        Columns of each table, see schema.schema
+    """
+    def __init__(self, indices, schema=SCHEMA):
+        self.tables = {table: name for name, table in indices.items() if name in schema}
+        self.schema = schema
+        self.columns = {}
+
+    def _get_columns(self, index):
+        """
+        Get columns of a table with nested columns split into arrays
+
+        Returns
+        -------
+        list
+            List of tuples with column names and types
+        """
+        if index not in self.columns:
+            columns = [("id", "String")]
+            for name, column_type in self.schema[self.tables[index]].items():
+                nested = re.match(r"^Nested\((.*)\)$", column_type)
+                if not nested:
+                    columns.append((name, column_type))
+                    continue
+                for nested_column in nested.group(1).split(","):
+                    nested_name, nested_type = nested_column.split()
+                    columns.append(("{}.{}".format(name, nested_name), "Array({})".format(nested_type)))
+            self.columns[index] = columns
+        return self.columns[index]
+
+    def bulk_index(self, index, docs, id_field="id", deduplication_token=None, **kwargs):
+        if isinstance(docs, ColumnBatch):
+            docs.rename(id_field, "id")
+            docs = docs.to_docs()
+            id_field = "id"
+        for document in docs:
+            document["id"] = str(document.pop(id_field))
+        with METRICS.timer("extractor_insert_seconds", table=index):
+            encode_rows(docs, self._get_columns(index))
+        METRICS.inc("extractor_rows_inserted_total", len(docs), table=index)
+
+    def bulk_index_async(self, index, docs, id_field="id", barrier=False, deduplication_token=None, callback=None,
+                         **kwargs):
+        self.bulk_index(index, docs, id_field, deduplication_token)
+        if callback:
+            callback()
+
+    def flush(self):
+        pass
+
+    def search(self, index, fields, query=None, **kwargs):
+        return []
+
+    def fetch_all(self, sql, **kwargs):
+        return []
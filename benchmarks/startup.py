@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Startup time benchmark of extractor.py
+
+    python3 -m benchmarks.startup --runs 5
+"""
+import json
+import os
+import subprocess
+import sys
+import click
+from time import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["web3", "ethereum", "numpy", "pandas", "pyelasticsearch", "pygtrie", "tqdm", "clickhouse_driver"]
+IMPORTED_MODULES_SCRIPT = """
+import sys, json
+import extractor
+print(json.dumps(sorted(set(name.split(".")[0] for name in sys.modules))))
+"""
+
+
+def get_heavy_imports(heavy_modules=HEAVY_MODULES):
+    """
+    Get heavy dependencies imported by extractor.py before a command is started
+
+    Returns
+    -------
+    list
+        Names of imported heavy modules
+    """
+    output = subprocess.check_output([sys.executable, "-c", IMPORTED_MODULES_SCRIPT], cwd=ROOT_DIR)
+    imported_modules = json.loads(output.decode("utf-8").strip().splitlines()[-1])
+    return [module for module in heavy_modules if module in imported_modules]
+
+
+def measure_startup(runs=5):
+    """
+    Measure wall time of extractor.py --help in fresh processes
+
+    Returns
+    -------
+    float
+        Median time in seconds
+    """
+    times = []
+    for _ in range(runs):
+        start = time()
+        subprocess.check_call([sys.executable, "extractor.py", "--help"], cwd=ROOT_DIR, stdout=subprocess.DEVNULL)
+        times.append(time() - start)
+    return sorted(times)[len(times) // 2]
+
+
+@click.command()
+@click.option("--runs", default=5, help="Number of measured starts")
+def main(runs):
+    """
+    Measure startup time of extractor.py and list eagerly imported heavy dependencies
+    """
+    print("Median startup time: {:.3f}s".format(measure_startup(runs)))
+    print("Heavy modules imported at startup: {}".format(", ".join(get_heavy_imports()) or "none"))
+
+
+if __name__ == '__main__':
+    main()
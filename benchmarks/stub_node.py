@@ -0,0 +1,140 @@
+import json
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+from threading import Thread, Lock
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def _parse_block_number(value, latest):
+    if value in ("latest", "pending", None):
+        return latest
+    if value == "earliest":
+        return 0
+    if isinstance(value, str):
+        return int(value, 16)
+    return value
+
+
+class StubNode:
+    """
+    Local JSON RPC server that replays recorded parity responses
+
+    Supports methods used by extraction: eth_syncing, eth_blockNumber, eth_getBlockByNumber,
+    trace_block, eth_getLogs and log filters. Batch requests are supported
+
+    Parameters
+    ----------
+    fixture : dict
+        Blocks, traces and logs by block number, see benchmarks.fixtures
+    """
+    def __init__(self, fixture):
+        self.blocks = {int(number): block for number, block in fixture["blocks"].items()}
+        self.traces = {int(number): traces for number, traces in fixture["traces"].items()}
+        self.logs = {int(number): logs for number, logs in fixture["logs"].items()}
+        self.latest = max(self.blocks.keys())
+        self.filters = {}
+        self.lock = Lock()
+        self.server = None
+
+    def _get_logs(self, log_filter):
+        start = _parse_block_number(log_filter.get("fromBlock"), self.latest)
+        end = _parse_block_number(log_filter.get("toBlock"), self.latest)
+        addresses = log_filter.get("address")
+        if isinstance(addresses, str):
+            addresses = [addresses]
+        return [
+            log
+            for number in range(start, end + 1)
+            for log in self.logs.get(number, [])
+            if not addresses or log["address"] in addresses
+        ]
+
+    def _get_block(self, number, full_transactions):
+        block = self.blocks.get(_parse_block_number(number, self.latest))
+        if block and not full_transactions:
+            block = dict(block, transactions=[transaction["hash"] for transaction in block["transactions"]])
+        return block
+
+    def _new_filter(self, log_filter):
+        with self.lock:
+            filter_id = hex(len(self.filters) + 1)
+            self.filters[filter_id] = log_filter
+        return filter_id
+
+    def call(self, method, params):
+        """
+        Get result of JSON RPC method
+
+        Raises KeyError for unsupported methods
+        """
+        methods = {
+            "eth_syncing": lambda: False,
+            "eth_blockNumber": lambda: hex(self.latest),
+            "net_version": lambda: "1",
+            "eth_getBlockByNumber": lambda: self._get_block(*params),
+            "trace_block": lambda: self.traces.get(_parse_block_number(params[0], self.latest)),
+            "eth_getLogs": lambda: self._get_logs(params[0]),
+            "eth_newFilter": lambda: self._new_filter(params[0]),
+            "eth_getFilterLogs": lambda: self._get_logs(self.filters[params[0]]),
+            "eth_getFilterChanges": lambda: [],
+            "eth_uninstallFilter": lambda: self.filters.pop(params[0], None) is not None
+        }
+        return methods[method]()
+
+    def handle(self, request):
+        """
+        Get response for a single JSON RPC request
+        """
+        response = {"jsonrpc": "2.0", "id": request.get("id")}
+        try:
+            response["result"] = self.call(request["method"], request.get("params", []))
+        except KeyError:
+            response["error"] = {"code": -32601, "message": "Method not found"}
+        return response
+
+    def start(self, port=0):
+        """
+        Start server in a background thread
+
+        Parameters
+        ----------
+        port : int
+            Local port, any free port if not specified
+
+        Returns
+        -------
+        str
+            URL of JSON RPC API
+        """
+        node = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])).decode("utf-8"))
+                if isinstance(request, list):
+                    response = [node.handle(item) for item in request]
+                else:
+                    response = node.handle(request)
+                body = json.dumps(response).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("localhost", port), RequestHandler)
+        Thread(target=self.server.serve_forever, daemon=True).start()
+        return "http://localhost:{}/".format(self.server.server_port)
+
+    def stop(self):
+        """
+        Stop server
+        """
+        self.server.shutdown()
+        self.server.server_close()
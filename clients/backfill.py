@@ -0,0 +1,154 @@
+import os
+import gzip
+import json
+import time
+import uuid
+import requests
+from multiprocessing.pool import ThreadPool
+from clients.row_binary import encode_rows
+from config import CLICKHOUSE_HTTP_URL, BACKFILL_LOADING_THREADS
+
+DATA_EXTENSION = ".bin.gz"
+MANIFEST_EXTENSION = ".json"
+
+
+class BackfillWriter:
+    """
+    Save records to compressed RowBinary files instead of inserting them into a database
+
+    Each insert is saved to a separate file in a directory named by table
+    with a manifest that lists columns and marks barrier inserts, i.e. flags of processed blocks.
+    Manifest is written after data, so incomplete files are never loaded
+
+    Parameters
+    ----------
+    directory : str
+        Path to a directory with backfill files
+    """
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _get_file_name(self, index):
+        """
+        Get path to a new file without extension
+
+        Names start with a timestamp, so files are sorted in the order of writing
+        """
+        table_directory = os.path.join(self.directory, index)
+        os.makedirs(table_directory, exist_ok=True)
+        return os.path.join(table_directory, "{:020d}-{}".format(int(time.time() * 1e6), uuid.uuid4().hex))
+
+    def write(self, index, columns, docs, barrier=False, deduplication_token=None):
+        """
+        Save records to a file
+
+        Parameters
+        ----------
+        index : str
+            Name of table
+        columns : list
+            List of tuples with column names and types
+        docs : list
+            List of records
+        barrier : bool
+            Load records only after all other records
+        deduplication_token : str
+            Token used to ignore repeated loads of the same records
+        """
+        file_name = self._get_file_name(index)
+        with gzip.open(file_name + DATA_EXTENSION, "wb") as data_file:
+            data_file.write(encode_rows(docs, columns))
+        with open(file_name + MANIFEST_EXTENSION, "w") as manifest_file:
+            json.dump({
+                "index": index,
+                "columns": [name for name, _ in columns],
+                "rows": len(docs),
+                "barrier": barrier,
+                "deduplication_token": deduplication_token
+            }, manifest_file)
+
+
+class BackfillLoader:
+    """
+    Load backfill files into a database with INSERT ... FORMAT RowBinary queries over HTTP
+
+    Data files are loaded in parallel, barrier files are loaded one by one after all data files.
+    Loaded files are removed, so the loader can be restarted after a failure
+
+    Parameters
+    ----------
+    directory : str
+        Path to a directory with backfill files
+    url : str
+        URL of clickhouse HTTP interface
+    threads : int
+        Number of simultaneously loaded files
+    """
+    def __init__(self, directory, url=CLICKHOUSE_HTTP_URL, threads=BACKFILL_LOADING_THREADS):
+        self.directory = directory
+        self.url = url
+        self.threads = threads
+
+    def _get_manifests(self):
+        """
+        Get manifests of all files in directory
+
+        Returns
+        -------
+        list
+            List of tuples with file name without extension and manifest content, sorted by file name
+        """
+        manifests = []
+        for table in os.listdir(self.directory):
+            table_directory = os.path.join(self.directory, table)
+            if not os.path.isdir(table_directory):
+                continue
+            for file_name in os.listdir(table_directory):
+                if file_name.endswith(MANIFEST_EXTENSION):
+                    path = os.path.join(table_directory, file_name[:-len(MANIFEST_EXTENSION)])
+                    with open(path + MANIFEST_EXTENSION) as manifest_file:
+                        manifests.append((path, json.load(manifest_file)))
+        return sorted(manifests, key=lambda manifest: os.path.basename(manifest[0]))
+
+    def _load_file(self, file):
+        """
+        Send file to a database and remove it
+
+        Parameters
+        ----------
+        file : tuple
+            File name without extension and manifest content
+        """
+        path, manifest = file
+        query = "INSERT INTO {} ({}) FORMAT RowBinary".format(manifest["index"], ",".join(manifest["columns"]))
+        params = {"query": query, "insert_deduplicate": 0}
+        if manifest.get("deduplication_token"):
+            params = {"query": query, "insert_deduplication_token": manifest["deduplication_token"]}
+        with open(path + DATA_EXTENSION, "rb") as data_file:
+            response = requests.post(
+                self.url,
+                params=params,
+                data=data_file,
+                headers={"Content-Encoding": "gzip"}
+            )
+        response.raise_for_status()
+        os.remove(path + MANIFEST_EXTENSION)
+        os.remove(path + DATA_EXTENSION)
+
+    def load(self):
+        """
+        Load all files from directory
+
+        Barrier files are skipped if any data file can't be loaded
+        """
+        manifests = self._get_manifests()
+        data_files = [file for file in manifests if not file[1]["barrier"]]
+        barrier_files = [file for file in manifests if file[1]["barrier"]]
+        print("Loading {} backfill files...".format(len(manifests)))
+        pool = ThreadPool(self.threads)
+        try:
+            pool.map(self._load_file, data_files)
+        finally:
+            pool.close()
+        for file in barrier_files:
+            self._load_file(file)
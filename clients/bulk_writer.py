@@ -0,0 +1,187 @@
+from queue import Queue, Empty
+from threading import Thread, Condition
+from clients.metrics import METRICS
+from clients.query_profiler import PROFILER
+from clients.columns import ColumnBatch
+from config import INSERT_QUEUE_SIZE, INSERT_WRITER_THREADS, INSERT_COALESCE_SIZE
+
+# Stage of queries sent by writer threads in query profiler
+WRITER_STAGE = "bulk_writer"
+
+
+class BulkWriter:
+    """
+    Write records to a database in background threads
+
+    Inserts are taken from a bounded queue and coalesced into large blocks:
+    inserts to the same table are written within one bulk_index call.
+    Inserts with deduplication tokens are never coalesced, so a retried insert has the same token.
+    Barrier inserts are written only after all inserts queued before them are committed,
+    so flags can be saved strictly after related data.
+    A callback of a barrier insert is called once the insert is committed,
+    it is never called if any insert failed
+
+    Parameters
+    ----------
+    client_factory : function
+        Function without arguments that returns a new database client.
+        Each writer thread opens its own connection
+    threads : int
+        Number of writer threads
+    queue_size : int
+        Max number of inserts waiting in queue
+    coalesce_size : int
+        Max number of inserts written by a thread at once
+    """
+    def __init__(self, client_factory, threads=INSERT_WRITER_THREADS, queue_size=INSERT_QUEUE_SIZE,
+                 coalesce_size=INSERT_COALESCE_SIZE):
+        self.client_factory = client_factory
+        self.coalesce_size = coalesce_size
+        self.queue = Queue(maxsize=queue_size)
+        self.condition = Condition()
+        self.sequence = 0
+        self.unfinished = set()
+        self.exception = None
+        self.threads = [Thread(target=self._run, daemon=True) for _ in range(threads)]
+        for thread in self.threads:
+            thread.start()
+
+    def put(self, index, docs, barrier=False, deduplication_token=None, callback=None):
+        """
+        Add records to the queue
+
+        Blocks if the queue is full
+
+        Parameters
+        ----------
+        index : str
+            Name of table
+        docs : list or ColumnBatch
+            List of records with id field or records stored in columns
+        barrier : bool
+            Write records only after all previously added records are written
+        deduplication_token : str
+            Deterministic token of insert, see CustomClickhouse.bulk_index
+        callback : function
+            Function without arguments called after barrier records are written
+        """
+        if self.exception is not None:
+            self.flush()
+        with self.condition:
+            self.sequence += 1
+            sequence = self.sequence
+            self.unfinished.add(sequence)
+        self.queue.put((sequence, index, docs, barrier, deduplication_token, callback))
+        METRICS.set("extractor_queue_depth", self.queue.qsize(), queue="insert")
+
+    def flush(self):
+        """
+        Wait until all added records are written
+
+        Raises the first exception occurred in writer threads
+        """
+        self.queue.join()
+        if self.exception is not None:
+            exception = self.exception
+            self.exception = None
+            raise exception
+
+    def _take_items(self):
+        """
+        Take next item from the queue and all items available without waiting
+
+        Returns
+        -------
+        list
+            List of items in the order of addition
+        """
+        items = [self.queue.get()]
+        while len(items) < self.coalesce_size:
+            try:
+                items.append(self.queue.get_nowait())
+            except Empty:
+                break
+        METRICS.set("extractor_queue_depth", self.queue.qsize(), queue="insert")
+        return items
+
+    def _wait_for_previous(self, sequence):
+        """
+        Wait until all items added before item with given sequence number are written
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: min(self.unfinished) >= sequence)
+
+    def _finish(self, items):
+        """
+        Mark items as written
+        """
+        with self.condition:
+            for sequence, _, _, _, _, _ in items:
+                self.unfinished.discard(sequence)
+            self.condition.notify_all()
+        for _ in items:
+            self.queue.task_done()
+
+    def _write(self, client, items):
+        """
+        Write items to a database, coalescing items for the same table
+
+        Parameters
+        ----------
+        client : CustomClickhouse
+            Connection of current thread
+        items : list
+            Items without barriers
+        """
+        groups = {}
+        batches = {}
+        for _, index, docs, _, deduplication_token, _ in items:
+            if (self.exception is None) and deduplication_token:
+                client.bulk_index(index=index, docs=docs, deduplication_token=deduplication_token)
+            elif isinstance(docs, ColumnBatch):
+                batches.setdefault(index, []).append(docs)
+            else:
+                groups.setdefault(index, []).extend(docs)
+        for index, docs in groups.items():
+            if (self.exception is None) and docs:
+                client.bulk_index(index=index, docs=docs)
+        for index, index_batches in batches.items():
+            if self.exception is None:
+                client.bulk_index(index=index, docs=ColumnBatch.concat(index_batches))
+
+    def _process(self, client, items):
+        """
+        Write taken items keeping barrier semantics
+
+        If an exception occurred in any thread, barrier items are skipped and their callbacks are not called
+        """
+        pending = []
+        for item in items:
+            sequence, index, docs, barrier, _, callback = item
+            if barrier:
+                self._write(client, pending)
+                self._finish(pending)
+                pending = []
+                self._wait_for_previous(sequence)
+                self._write(client, [item])
+                if (self.exception is None) and callback:
+                    callback()
+                self._finish([item])
+            else:
+                pending.append(item)
+        self._write(client, pending)
+        self._finish(pending)
+
+    def _run(self):
+        client = self.client_factory()
+        with PROFILER.tag_stage(WRITER_STAGE):
+            while True:
+                items = self._take_items()
+                try:
+                    self._process(client, items)
+                except Exception as exception:
+                    with self.condition:
+                        if self.exception is None:
+                            self.exception = exception
+                        unfinished = [item for item in items if item[0] in self.unfinished]
+                    self._finish(unfinished)
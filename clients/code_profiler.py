@@ -0,0 +1,168 @@
+import os
+import cProfile
+import tracemalloc
+from threading import local
+from contextlib import contextmanager
+from functools import wraps
+
+TOP_ALLOCATIONS_NUMBER = 25
+TRACEMALLOC_FRAMES = 10
+
+
+class CodeProfiler:
+    """
+    Profile CPU time and memory allocations of operation stages
+
+    Stages are reported by QueryProfiler.profile_stage. Each stage has its own cProfile profile,
+    profiles of nested stages don't include time of each other. Statistics are saved to a directory
+    when a stage is finished: STAGE.pstats with accumulated cProfile statistics
+    and STAGE.malloc.txt with top allocation sites of each run of the stage
+
+    If a number of sampled chunks is specified, only first chunks of each stage are profiled,
+    see profile_chunk
+
+    Stack of started stages is kept for each thread, so chunks of threads without own stages,
+    i.e. pipeline stages, are not profiled as chunks of a stage started by another thread
+    """
+    def __init__(self):
+        self.directory = None
+        self.cpu = False
+        self.memory = False
+        self.sample = None
+        self.profiles = {}
+        self._local = local()
+
+    @property
+    def stages(self):
+        """
+        Stack of stages started in current thread
+        """
+        if not hasattr(self._local, "stages"):
+            self._local.stages = []
+        return self._local.stages
+
+    def configure(self, directory, cpu=False, memory=False, sample=None):
+        """
+        Enable profiling
+
+        Parameters
+        ----------
+        directory : str
+            Directory for statistics files
+        cpu : bool
+            Profile CPU time with cProfile
+        memory : bool
+            Trace memory allocations with tracemalloc
+        sample : int
+            Number of profiled chunks in each stage, or None to profile whole stages
+        """
+        self.directory = directory
+        self.cpu = cpu
+        self.memory = memory
+        self.sample = sample
+        if self.is_enabled():
+            os.makedirs(directory, exist_ok=True)
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+
+    def is_enabled(self):
+        return self.cpu or self.memory
+
+    def _resume(self, stage):
+        if stage["active"]:
+            return
+        stage["active"] = True
+        if self.cpu:
+            self.profiles[stage["name"]].enable()
+        if self.memory and stage["snapshot"] is None:
+            stage["snapshot"] = tracemalloc.take_snapshot()
+
+    def _pause(self, stage):
+        if not stage["active"]:
+            return
+        stage["active"] = False
+        if self.cpu:
+            self.profiles[stage["name"]].disable()
+
+    def start_stage(self, name):
+        """
+        Start profiling of a stage, profiling of outer stage is paused
+        """
+        if not self.is_enabled():
+            return
+        parent_active = bool(self.stages) and self.stages[-1]["active"]
+        if self.stages:
+            self._pause(self.stages[-1])
+        self.profiles.setdefault(name, cProfile.Profile())
+        stage = {
+            "name": name,
+            "active": False,
+            "chunks": 0,
+            "snapshot": None,
+            "last_snapshot": None,
+            "parent_active": parent_active
+        }
+        self.stages.append(stage)
+        if self.sample is None:
+            self._resume(stage)
+
+    def end_stage(self, name):
+        """
+        Stop profiling of a stage and save its statistics, profiling of outer stage is resumed
+        """
+        if not self.is_enabled() or not self.stages:
+            return
+        stage = self.stages.pop()
+        self._pause(stage)
+        self._save(stage)
+        if stage["parent_active"]:
+            self._resume(self.stages[-1])
+
+    @contextmanager
+    def chunk(self):
+        """
+        Mark a block of code as a chunk of current stage
+
+        In sampling mode the stage is profiled only within its first chunks
+        """
+        stage = self.stages[-1] if self.stages else None
+        if (stage is None) or (self.sample is None) or stage["active"] or (stage["chunks"] >= self.sample):
+            yield
+            return
+        stage["chunks"] += 1
+        self._resume(stage)
+        try:
+            yield
+        finally:
+            self._pause(stage)
+            if self.memory and (stage["chunks"] == self.sample):
+                stage["last_snapshot"] = tracemalloc.take_snapshot()
+
+    def profile_chunk(self, function):
+        """
+        Decorator that marks each call of a function as a chunk of current stage, see chunk
+        """
+        @wraps(function)
+        def wrapped(*args, **kwargs):
+            with self.chunk():
+                return function(*args, **kwargs)
+        return wrapped
+
+    def _save(self, stage):
+        """
+        Save CPU statistics and top allocation sites of a stage
+        """
+        path = os.path.join(self.directory, stage["name"])
+        if self.cpu:
+            self.profiles[stage["name"]].dump_stats(path + ".pstats")
+        if self.memory and stage["snapshot"] is not None:
+            last_snapshot = stage["last_snapshot"] or tracemalloc.take_snapshot()
+            differences = last_snapshot.compare_to(stage["snapshot"], "lineno")
+            with open(path + ".malloc.txt", "a") as malloc_file:
+                malloc_file.write("Top allocations of stage {}:\n".format(stage["name"]))
+                for difference in differences[:TOP_ALLOCATIONS_NUMBER]:
+                    malloc_file.write("{}\n".format(difference))
+                malloc_file.write("\n")
+
+
+CODE_PROFILER = CodeProfiler()
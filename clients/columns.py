@@ -0,0 +1,101 @@
+import json
+
+
+def _prepare_value(value):
+    if isinstance(value, dict):
+        return json.dumps(value)
+    return value
+
+
+class ColumnBatch:
+    """
+    Records stored column by column, ready for columnar insert
+
+    Batches are compact to pickle between processes and are inserted without conversion to rows,
+    see CustomClickhouse.bulk_index
+
+    Parameters
+    ----------
+    fields : list
+        Names of columns
+    columns : list
+        List of column values for each field, all columns have the same length
+    """
+    def __init__(self, fields, columns):
+        self.fields = list(fields)
+        self.columns = [list(column) for column in columns]
+
+    @classmethod
+    def from_docs(cls, docs, fields):
+        """
+        Create batch from records
+
+        Missing fields are filled with None, dict values are converted to JSON
+
+        Parameters
+        ----------
+        docs : list
+            List of records
+        fields : list
+            Names of columns
+
+        Returns
+        -------
+        ColumnBatch
+            Batch with given columns
+        """
+        return cls(fields, [[_prepare_value(document.get(field)) for document in docs] for field in fields])
+
+    @classmethod
+    def concat(cls, batches):
+        """
+        Join batches into one, columns missing in some batches are filled with None
+
+        Returns
+        -------
+        ColumnBatch
+            Batch with records of all batches in the order of batches
+        """
+        fields = []
+        for batch in batches:
+            fields += [field for field in batch.fields if field not in fields]
+        columns = [[] for _ in fields]
+        for batch in batches:
+            batch_columns = dict(zip(batch.fields, batch.columns))
+            for field, column in zip(fields, columns):
+                column.extend(batch_columns.get(field, [None] * len(batch)))
+        return cls(fields, columns)
+
+    def rename(self, field, new_field):
+        """
+        Rename column, i.e. field with record id
+        """
+        if field in self.fields:
+            self.fields[self.fields.index(field)] = new_field
+
+    def select(self, fields):
+        """
+        Get batch with specified columns only, missing columns are skipped
+
+        Returns
+        -------
+        ColumnBatch
+            Batch with selected columns in order of given fields
+        """
+        batch_columns = dict(zip(self.fields, self.columns))
+        selected_fields = [field for field in fields if field in batch_columns]
+        return ColumnBatch(selected_fields, [batch_columns[field] for field in selected_fields])
+
+    def to_docs(self):
+        """
+        Convert batch to records
+
+        Returns
+        -------
+        list
+            List of records in a form of dicts
+        """
+        return [dict(zip(self.fields, values)) for values in zip(*self.columns)]
+
+    def __len__(self):
+        return len(self.columns[0]) if self.columns else 0
@@ -2,10 +2,17 @@ from clickhouse_driver import Client
 from utils import split_on_chunks
 from config import NUMBER_OF_JOBS, MAX_CHUNK_SIZE
 from clients.custom_client import CustomClient
+from clients.bulk_writer import BulkWriter
+from clients.query_profiler import PROFILER
+from clients.metrics import METRICS
+from clients.rows import get_row_class
+from clients.backfill import BackfillWriter
+from clients.columns import ColumnBatch
 from tqdm import tqdm
 import json
-from config import MAX_MEMORY_USAGE
+from config import MAX_MEMORY_USAGE, BACKFILL_DIR
 import sys
+import time
 
 class CustomClickhouse(CustomClient):
     def _create_client(self):
@@ -22,12 +29,64 @@ class CustomClickhouse(CustomClient):
         client.execute("SET max_memory_usage = {}".format(MAX_MEMORY_USAGE))
         return client
 
-    def __init__(self):
+    def __init__(self, backfill_dir=BACKFILL_DIR):
         self.client = self._create_client()
+        self.writer = None
+        self.backfill = BackfillWriter(backfill_dir) if backfill_dir else None
+        self.columns = {}
 
     def __del__(self):
         self.client.disconnect()
 
+    def _execute(self, sql, *args, client=None, **kwargs):
+        """
+        Send query to a database and record its statistics in query profiler
+
+        Parameters
+        -------
+        sql : str
+            Query to send
+        client : clickhouse_driver.Client
+            Connection to use instead of the default one
+
+        Returns
+        -------
+        list
+            Result of query
+        """
+        client = client or self.client
+        query_id = PROFILER.create_query_id()
+        start_time = time.time()
+        result = client.execute(sql, *args, query_id=query_id, **kwargs)
+        PROFILER.record(query_id, sql, time.time() - start_time, getattr(client, "last_query", None))
+        return result
+
+    def _execute_iter(self, sql, client, **kwargs):
+        """
+        Send query to a database and iterate over returned rows
+
+        Statistics of query are recorded in query profiler when iteration is finished or stopped
+
+        Parameters
+        -------
+        sql : str
+            Query to send
+        client : clickhouse_driver.Client
+            Connection to use
+
+        Returns
+        -------
+        generator
+            Generator that returns rows
+        """
+        query_id = PROFILER.create_query_id()
+        start_time = time.time()
+        try:
+            for row in client.execute_iter(sql, query_id=query_id, **kwargs):
+                yield row
+        finally:
+            PROFILER.record(query_id, sql, time.time() - start_time, getattr(client, "last_query", None))
+
     def _create_sql_query(self, index, query, fields, final=True):
         fields_string = ",".join(fields)
         sql = 'SELECT {} FROM {}'.format(fields_string, index)
@@ -37,20 +96,65 @@ class CustomClickhouse(CustomClient):
             sql += ' ' + query
         return sql
 
-    def _convert_values_to_dict(self, values, fields):
-        converted_fields = [field.split(" AS ")[-1] for field in fields]
-        documents = [{"_source": dict(zip(converted_fields, value))} for value in values]
-        for document in documents:
-            if "id" in document["_source"]:
-                document["_id"] = document["_source"]["id"]
-                del document["_source"]["id"]
-        return documents
+    def _convert_values_to_rows(self, values, fields):
+        """
+        Convert values returned by a database to compact row objects
 
-    def search(self, index, fields, query=None, **kwargs):
+        Parameters
+        -------
+        values : list
+            List of tuples with values
+        fields : list
+            List of requested fields, can contain aliases, i.e. "x - 1 AS y"
+
+        Returns
+        -------
+        list
+            List of clients.rows.Row objects, id field is stored as _id attribute
+        """
+        converted_fields = [field.split(" AS ")[-1].strip() for field in fields]
+        indices = {field: index for index, field in enumerate(converted_fields)}
+        row_class = get_row_class(indices.keys())
+        if len(indices) == len(converted_fields):
+            return [row_class(*value) for value in values]
+        indices = list(indices.values())
+        return [row_class(*[value[index] for index in indices]) for value in values]
+
+    def make_external_table(self, name, structure, rows):
+        """
+        Create description of a temporary table sent with a query
+
+        Use it instead of long literal lists in SQL,
+        i.e. "WHERE address IN name" instead of "WHERE address IN('0x1', '0x2', ...)"
+
+        Parameters
+        -------
+        name : str
+            Name of table in query
+        structure : list
+            List of tuples with field names and types
+        rows : list
+            List of records as dicts
+
+        Returns
+        -------
+        dict
+            External table description for clickhouse_driver
+        """
+        return {
+            "name": name,
+            "structure": structure,
+            "data": rows
+        }
+
+    def search(self, index, fields, query=None, final=True, external_tables=None, **kwargs):
         """
         Search records in a given table
         Each record will be represented only with given fields
 
+        FINAL is used by default, so records updated or written twice are returned once.
+        Readers of tables that are only appended with deduplication tokens can skip it
+
         Parameters
         -------
         index : str
@@ -59,6 +163,10 @@ class CustomClickhouse(CustomClient):
             List with field names
         query : str
             Last part of query
+        final : bool
+            To skip or not to skip repeating records in tables with updated records
+        external_tables : list
+            Temporary tables used in query
 
         Returns
         -------
@@ -66,11 +174,11 @@ class CustomClickhouse(CustomClient):
             List of records returned by given conditions
         """
         fields += ["id"]
-        sql = self._create_sql_query(index, query, fields)
-        values = self.client.execute(sql)
-        return self._convert_values_to_dict(values, fields)
+        sql = self._create_sql_query(index, query, fields, final)
+        values = self._execute(sql, external_tables=external_tables)
+        return self._convert_values_to_rows(values, fields)
 
-    def count(self, index, query=None, final=True, **kwargs):
+    def count(self, index, query=None, final=True, external_tables=None, **kwargs):
         """
         Count records in a given table
 
@@ -82,6 +190,8 @@ class CustomClickhouse(CustomClient):
             Last part of query
         final : bool
             To skip or not to skip repeating records in tables with updated records
+        external_tables : list
+            Temporary tables used in query
 
         Returns
         -------
@@ -89,9 +199,10 @@ class CustomClickhouse(CustomClient):
             Number of records in database
         """
         sql = self._create_sql_query(index, query, ["COUNT(*)"], final)
-        return self.client.execute(sql)[0][0]
+        return self._execute(sql, external_tables=external_tables)[0][0]
 
-    def iterate(self, index, fields, query=None, per=NUMBER_OF_JOBS, return_id=True, final=True):
+    def iterate(self, index, fields, query=None, per=NUMBER_OF_JOBS, return_id=True, final=True,
+                external_tables=None):
         """
         Iterate over records in a table
 
@@ -109,6 +220,8 @@ class CustomClickhouse(CustomClient):
             To return id in _id field of document
         final : bool
             To skip or not to skip repeating records in tables with updated records
+        external_tables : list
+            Temporary tables used in query
 
         Returns
         -------
@@ -120,12 +233,12 @@ class CustomClickhouse(CustomClient):
             fields += ["id"]
         settings = {'max_block_size': per}
         sql = self._create_sql_query(index, query, fields, final)
-        generator = iterate_client.execute_iter(sql, settings=settings)
-        count = self.count(index, query, final)
+        generator = self._execute_iter(sql, iterate_client, settings=settings, external_tables=external_tables)
+        count = self.count(index, query, final, external_tables=external_tables)
         progress_bar = tqdm(total=count)
         for chunk in split_on_chunks(generator, per):
             progress_bar.update(per)
-            yield self._convert_values_to_dict(chunk, fields)
+            yield self._convert_values_to_rows(chunk, fields)
 
     def _prepare_fields(self, docs, fields):
         for document in docs:
@@ -142,13 +255,35 @@ class CustomClickhouse(CustomClient):
             document["id"] = id
 
     def _filter_schema(self, docs, index):
-        fields = self.client.execute("DESCRIBE TABLE {}".format(index))
+        fields = self._execute("DESCRIBE TABLE {}".format(index))
         whitelist = [field[0] for field in fields]
         for document in docs:
             blacklisted_keys = set([key for key in document if key not in whitelist])
             for key in blacklisted_keys:
                 del document[key]
 
+    def _get_columns(self, index):
+        """
+        Get insertable columns of a table
+
+        Parameters
+        -------
+        index : str
+            Name of table
+
+        Returns
+        -------
+        list
+            List of tuples with column names and types, materialized and alias columns are skipped
+        """
+        if index not in self.columns:
+            fields = self._execute("DESCRIBE TABLE {}".format(index))
+            self.columns[index] = [
+                (field[0], field[1]) for field in fields
+                if field[2] not in ("MATERIALIZED", "ALIAS")
+            ]
+        return self.columns[index]
+
     def _split_records(self, records, max_bytes=MAX_CHUNK_SIZE):
         buffer = []
         current_bytes = 0
@@ -164,7 +299,7 @@ class CustomClickhouse(CustomClient):
             buffer.append(record)
         yield buffer
 
-    def bulk_index(self, index, docs, id_field="id", **kwargs):
+    def bulk_index(self, index, docs, id_field="id", deduplication_token=None, **kwargs):
         """
         Add given records to a table within one query
 
@@ -172,23 +307,119 @@ class CustomClickhouse(CustomClient):
         -------
         index : str
             Name of table
-        docs : list
-            List of records
+        docs : list or ColumnBatch
+            List of records or records stored in columns, columns are inserted within one columnar query
         id_field : str
             Name of field with record id
+        deduplication_token : str
+            Deterministic token of inserted records, i.e. stage name with block range.
+            Each chunk is inserted with its own token derived from this one,
+            so a repeated insert of the same records is ignored by clickhouse.
+            Records without token are never deduplicated, i.e. ranges saved again after removal
         """
+        if isinstance(docs, ColumnBatch):
+            self._bulk_index_columns(index, docs, id_field, deduplication_token)
+            return
         self._set_id(docs, id_field)
         self._filter_schema(docs, index)
         fields = list(set([field for doc in docs for field in doc.keys()]))
         self._prepare_fields(docs, fields)
         fields_string = ",".join(fields)
-        for chunk in self._split_records(docs):
-            self.client.execute(
-                'INSERT INTO {} ({}) VALUES'.format(index, fields_string),
-                chunk
+        for chunk_index, chunk in enumerate(self._split_records(docs)):
+            settings = {"insert_deduplicate": 0}
+            if deduplication_token:
+                settings = {"insert_deduplication_token": "{}:{}".format(deduplication_token, chunk_index)}
+            with METRICS.timer("extractor_insert_seconds", table=index):
+                self._execute(
+                    'INSERT INTO {} ({}) VALUES'.format(index, fields_string),
+                    chunk,
+                    settings=settings
+                )
+            METRICS.inc("extractor_rows_inserted_total", len(chunk), table=index)
+
+    def _bulk_index_columns(self, index, batch, id_field="id", deduplication_token=None):
+        """
+        Add records stored in columns to a table within one columnar query
+
+        Columns missing in the table are skipped
+
+        Parameters
+        -------
+        index : str
+            Name of table
+        batch : ColumnBatch
+            Records
+        id_field : str
+            Name of column with record id
+        deduplication_token : str
+            Deterministic token of inserted records, see bulk_index
+        """
+        batch.rename(id_field, "id")
+        batch = batch.select([name for name, _ in self._get_columns(index)])
+        settings = {"insert_deduplicate": 0}
+        if deduplication_token:
+            settings = {"insert_deduplication_token": "{}:0".format(deduplication_token)}
+        with METRICS.timer("extractor_insert_seconds", table=index):
+            self._execute(
+                'INSERT INTO {} ({}) VALUES'.format(index, ",".join(batch.fields)),
+                batch.columns,
+                columnar=True,
+                settings=settings
             )
+        METRICS.inc("extractor_rows_inserted_total", len(batch), table=index)
+
+    def bulk_index_async(self, index, docs, id_field="id", barrier=False, deduplication_token=None, callback=None,
+                         **kwargs):
+        """
+        Add given records to a table in background
+
+        Records are queued and written by background threads,
+        so the caller can continue extraction while clickhouse ingests data.
+        Call flush() to wait for all queued records
+
+        In backfill mode records are saved to files instead, see clients.backfill
+
+        Parameters
+        -------
+        index : str
+            Name of table
+        docs : list or ColumnBatch
+            List of records or records stored in columns
+        id_field : str
+            Name of field with record id
+        barrier : bool
+            Write records only after all previously queued records are written,
+            i.e. to save flags for processed data
+        deduplication_token : str
+            Deterministic token of inserted records, see bulk_index
+        callback : function
+            Function without arguments called after barrier records are written
+        """
+        if not len(docs):
+            return
+        if isinstance(docs, ColumnBatch):
+            docs.rename(id_field, "id")
+        else:
+            self._set_id(docs, id_field)
+        if self.backfill:
+            if isinstance(docs, ColumnBatch):
+                docs = docs.to_docs()
+            self.backfill.write(index, self._get_columns(index), docs, barrier, deduplication_token)
+            if callback:
+                callback()
+            return
+        if self.writer is None:
+            self.writer = BulkWriter(CustomClickhouse)
+        self.writer.put(index, docs, barrier, deduplication_token, callback)
 
-    def send_sql_request(self, sql):
+    def flush(self):
+        """
+        Wait until all records queued by bulk_index_async are written
+        """
+        if self.writer is not None:
+            self.writer.flush()
+
+    def send_sql_request(self, sql, external_tables=None):
         """
         Send sql query and return result as scalar table
 
@@ -196,11 +427,61 @@ class CustomClickhouse(CustomClient):
         -------
         sql : str
             Query to send
+        external_tables : list
+            Temporary tables used in query
 
         Returns
         -------
         Content of the first cell of returned table
         """
-        result = self.client.execute(sql)
+        result = self._execute(sql, external_tables=external_tables)
         if result:
             return result[0][0]
+
+    def fetch_all(self, sql, external_tables=None):
+        """
+        Send sql query and return all rows of result
+
+        Parameters
+        -------
+        sql : str
+            Query to send
+        external_tables : list
+            Temporary tables used in query
+
+        Returns
+        -------
+        list
+            List of tuples with values
+        """
+        return self._execute(sql, external_tables=external_tables)
+
+    def load_query_log(self, query_ids):
+        """
+        Get server-side statistics of finished queries
+
+        Parameters
+        -------
+        query_ids : list
+            Ids of queries
+
+        Returns
+        -------
+        list
+            List of tuples with query_id, read_rows, memory_usage and query_duration_ms
+        """
+        self.client.execute("SYSTEM FLUSH LOGS")
+        query_ids_table = self.make_external_table(
+            "profiled_queries",
+            [("query_id", "String")],
+            [{"query_id": query_id} for query_id in query_ids]
+        )
+        return self.client.execute(
+            """
+            SELECT query_id, read_rows, memory_usage, query_duration_ms
+            FROM system.query_log
+            WHERE type = 'QueryFinish'
+            AND query_id IN profiled_queries
+            """,
+            external_tables=[query_ids_table]
+        )
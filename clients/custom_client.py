@@ -11,5 +11,14 @@ class CustomClient:
     def send_sql_request(self, sql):
         pass
 
-    def bulk_index(self, index, docs, id_field):
+    def fetch_all(self, sql):
+        pass
+
+    def bulk_index(self, index, docs, id_field, deduplication_token):
+        pass
+
+    def bulk_index_async(self, index, docs, id_field, barrier, deduplication_token, callback):
+        pass
+
+    def flush(self):
         pass
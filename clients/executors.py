@@ -0,0 +1,307 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from multiprocessing.pool import ThreadPool
+from threading import Thread, local
+from config import EXECUTOR_START_METHOD
+
+_worker = local()
+
+
+def _initialize_worker(initializer, initargs):
+    """
+    Call initializer once in current worker thread or process
+    """
+    if (initializer is not None) and not getattr(_worker, "initialized", False):
+        initializer(*initargs)
+        _worker.initialized = True
+
+
+def _call_initialized(initializer, initargs, function, arguments):
+    _initialize_worker(initializer, initargs)
+    return function(*arguments)
+
+
+def _release_results(results, release):
+    """
+    Release results of successful tasks after another task failed
+    """
+    if release is not None:
+        for result in results:
+            release(result)
+
+
+def _collect_results(getters, release=None):
+    """
+    Get results of all tasks, then raise the first exception if any task failed
+
+    Parameters
+    ----------
+    getters : list
+        Functions without arguments that return result of each task or raise its exception
+    release : function
+        Function called for each result of successful tasks if any task failed
+
+    Returns
+    -------
+    list
+        Results in the order of tasks
+    """
+    results = []
+    exception = None
+    for get in getters:
+        try:
+            results.append(get())
+        except Exception as task_exception:
+            exception = exception or task_exception
+    if exception is not None:
+        _release_results(results, release)
+        raise exception
+    return results
+
+
+def open_worker_clients(factories):
+    """
+    Open clients of current worker, i.e. HTTP sessions or database connections
+
+    Can be used as executor initializer, so workers don't share connections of a parent process
+
+    Parameters
+    ----------
+    factories : dict
+        Names of clients and picklable functions without arguments that create them
+    """
+    _worker.clients = {name: factory() for name, factory in factories.items()}
+
+
+def get_worker_client(name, factory):
+    """
+    Get client of current worker, the client is created on first call if it wasn't opened by initializer
+
+    Parameters
+    ----------
+    name : str
+        Name of client
+    factory : function
+        Function without arguments that creates the client
+
+    Returns
+    -------
+    object
+        Client of current worker
+    """
+    if not hasattr(_worker, "clients"):
+        _worker.clients = {}
+    if name not in _worker.clients:
+        _worker.clients[name] = factory()
+    return _worker.clients[name]
+
+
+class Executor:
+    """
+    Run a function for each set of arguments with a group of workers
+
+    Workers are started on first call and stopped by close(),
+    so an object that only sends queries never starts workers.
+    Executor can be used as a context manager that closes workers on exit
+
+    Parameters
+    ----------
+    workers : int
+        Number of workers
+    initializer : function
+        Function called once in each worker before its first task, i.e. open_worker_clients
+    initargs : tuple
+        Arguments of initializer
+    """
+    isolated = False
+
+    def __init__(self, workers=1, initializer=None, initargs=()):
+        self.workers = workers
+        self.initializer = initializer
+        self.initargs = initargs
+
+    def starmap(self, function, iterable, release=None):
+        """
+        Call function for each tuple of arguments
+
+        If any call fails, the first exception is raised after all calls are finished
+
+        Parameters
+        ----------
+        function : function
+            Function to call
+        iterable : iterable
+            Tuples of arguments
+        release : function
+            Function called for results of successful calls if any call failed,
+            i.e. to remove shared memory of returned batches, see shared_columns.release_batch
+
+        Returns
+        -------
+        list
+            Results in the order of arguments
+        """
+        raise NotImplementedError
+
+    def map(self, function, iterable):
+        """
+        Call function for each argument
+
+        Returns
+        -------
+        list
+            Results in the order of arguments
+        """
+        return self.starmap(function, [(argument,) for argument in iterable])
+
+    def close(self):
+        """
+        Stop workers, they are started again on the next call
+        """
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class SerialExecutor(Executor):
+    """
+    Run tasks one by one in the calling thread, remaining tasks are skipped after an exception
+    """
+    def starmap(self, function, iterable, release=None):
+        results = []
+        try:
+            for arguments in iterable:
+                results.append(_call_initialized(self.initializer, self.initargs, function, arguments))
+        except Exception:
+            _release_results(results, release)
+            raise
+        return results
+
+
+class ThreadExecutor(Executor):
+    """
+    Run tasks in a pool of threads, suitable for I/O-bound tasks
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = None
+
+    def _get_pool(self):
+        if self.pool is None:
+            self.pool = ThreadPool(self.workers, _initialize_worker, (self.initializer, self.initargs))
+        return self.pool
+
+    def starmap(self, function, iterable, release=None):
+        pool = self._get_pool()
+        tasks = [pool.apply_async(function, arguments) for arguments in iterable]
+        return _collect_results([task.get for task in tasks], release)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+
+class ProcessExecutor(ThreadExecutor):
+    """
+    Run tasks in a pool of processes, suitable for CPU-bound tasks
+
+    Workers are started with EXECUTOR_START_METHOD, by default from a clean server process,
+    so they don't inherit database connections of a parent. Functions and arguments should be picklable
+    """
+    isolated = True
+
+    def _get_pool(self):
+        if self.pool is None:
+            context = multiprocessing.get_context(EXECUTOR_START_METHOD)
+            self.pool = context.Pool(self.workers, _initialize_worker, (self.initializer, self.initargs))
+        return self.pool
+
+
+class AsyncExecutor(Executor):
+    """
+    Run tasks in an asyncio event loop of a background thread
+
+    Coroutine functions are awaited in the loop, other functions run in a thread pool of the loop.
+    At most "workers" tasks run at the same time
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.loop = None
+        self.thread = None
+
+    def _get_loop(self):
+        if self.loop is None:
+            self.loop = asyncio.new_event_loop()
+            self.loop.set_default_executor(ThreadPoolExecutor(self.workers))
+            self.thread = Thread(target=self.loop.run_forever, daemon=True)
+            self.thread.start()
+        return self.loop
+
+    async def _run_all(self, function, arguments_list):
+        semaphore = asyncio.Semaphore(self.workers)
+
+        async def run(arguments):
+            async with semaphore:
+                if asyncio.iscoroutinefunction(function):
+                    _initialize_worker(self.initializer, self.initargs)
+                    return await function(*arguments)
+                return await self.loop.run_in_executor(
+                    None, partial(_call_initialized, self.initializer, self.initargs, function, arguments)
+                )
+
+        return await asyncio.gather(*[run(arguments) for arguments in arguments_list], return_exceptions=True)
+
+    def _get_result(self, result):
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def starmap(self, function, iterable, release=None):
+        loop = self._get_loop()
+        results = asyncio.run_coroutine_threadsafe(self._run_all(function, list(iterable)), loop).result()
+        return _collect_results([partial(self._get_result, result) for result in results], release)
+
+    def close(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.loop.close()
+            self.loop = None
+            self.thread = None
+
+
+EXECUTOR_CLASSES = {
+    "serial": SerialExecutor,
+    "thread": ThreadExecutor,
+    "process": ProcessExecutor,
+    "async": AsyncExecutor
+}
+
+
+def create_executor(kind, workers=1, initializer=None, initargs=()):
+    """
+    Create executor of given kind
+
+    Parameters
+    ----------
+    kind : str
+        "serial", "thread", "process" or "async"
+    workers : int
+        Number of workers
+
+    Returns
+    -------
+    Executor
+        Executor with workers started on first call
+    """
+    if kind not in EXECUTOR_CLASSES:
+        raise ValueError("Unknown executor: {}".format(kind))
+    return EXECUTOR_CLASSES[kind](workers, initializer, initargs)
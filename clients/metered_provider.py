@@ -0,0 +1,16 @@
+from time import time
+from web3 import HTTPProvider
+from web3.utils.request import make_post_request
+from clients.metrics import record_rpc_request
+
+
+class MeteredHTTPProvider(HTTPProvider):
+    """
+    HTTP provider that saves latency and volume of each JSON RPC request to metrics
+    """
+    def make_request(self, method, params):
+        request_data = self.encode_rpc_request(method, params)
+        start = time()
+        raw_response = make_post_request(self.endpoint_uri, request_data, **self.get_request_kwargs())
+        record_rpc_request(method, self.endpoint_uri, time() - start, len(request_data), len(raw_response))
+        return self.decode_rpc_response(raw_response)
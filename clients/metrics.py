@@ -0,0 +1,253 @@
+import json
+from contextlib import contextmanager
+from copy import deepcopy
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from threading import Lock, Thread
+from time import time
+
+COUNTER = "counter"
+GAUGE = "gauge"
+HISTOGRAM = "histogram"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _format_labels(labels):
+    """
+    Format labels for text exposition format
+
+    Parameters
+    ----------
+    labels : tuple
+        Sorted tuple of label names and values
+
+    Returns
+    -------
+    str
+        Labels in a form of {name="value",...} or empty string
+    """
+    if not labels:
+        return ""
+    return "{" + ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels
+    ) + "}"
+
+
+class Metrics:
+    """
+    Collect counters, gauges and histograms of extraction
+
+    Each metric has a name and any number of label sets, i.e. table name of inserted rows.
+    Collected values can be exposed over HTTP in Prometheus text format or saved as JSON
+
+    Parameters
+    ----------
+    buckets : tuple
+        Upper bounds of histogram buckets
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.metrics = {}
+        self.lock = Lock()
+
+    def _get_samples(self, name, metric_type):
+        if name not in self.metrics:
+            self.metrics[name] = {"type": metric_type, "samples": {}}
+        return self.metrics[name]["samples"]
+
+    def inc(self, name, value=1, **labels):
+        """
+        Increase counter by value
+        """
+        with self.lock:
+            samples = self._get_samples(name, COUNTER)
+            key = tuple(sorted(labels.items()))
+            samples[key] = samples.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        """
+        Set current value of gauge
+        """
+        with self.lock:
+            self._get_samples(name, GAUGE)[tuple(sorted(labels.items()))] = value
+
+    def observe(self, name, value, **labels):
+        """
+        Add observed value, i.e. duration of request, to histogram
+        """
+        with self.lock:
+            samples = self._get_samples(name, HISTOGRAM)
+            key = tuple(sorted(labels.items()))
+            if key not in samples:
+                samples[key] = {"buckets": [0] * len(self.buckets), "sum": 0, "count": 0}
+            sample = samples[key]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    sample["buckets"][index] += 1
+            sample["sum"] += value
+            sample["count"] += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """
+        Observe duration of a code block in seconds
+        """
+        start = time()
+        try:
+            yield
+        finally:
+            self.observe(name, time() - start, **labels)
+
+    def get_state(self):
+        """
+        Get copy of collected values that can be passed between processes
+
+        Returns
+        -------
+        dict
+            Metric names with types and samples
+        """
+        with self.lock:
+            return deepcopy(self.metrics)
+
+    def merge(self, state):
+        """
+        Add values collected by another process
+
+        Counters and histograms are summed up, gauges are replaced
+
+        Parameters
+        ----------
+        state : dict
+            Values returned by get_state
+        """
+        with self.lock:
+            for name, metric in state.items():
+                samples = self._get_samples(name, metric["type"])
+                for key, value in metric["samples"].items():
+                    if metric["type"] == GAUGE or key not in samples:
+                        samples[key] = deepcopy(value)
+                    elif metric["type"] == COUNTER:
+                        samples[key] += value
+                    else:
+                        samples[key]["buckets"] = [a + b for a, b in zip(samples[key]["buckets"], value["buckets"])]
+                        samples[key]["sum"] += value["sum"]
+                        samples[key]["count"] += value["count"]
+
+    def reset(self):
+        """
+        Remove all collected values
+        """
+        with self.lock:
+            self.metrics = {}
+
+    def get_exposition(self):
+        """
+        Get collected values in Prometheus text exposition format
+
+        Returns
+        -------
+        str
+            Text with one line per sample, histograms have cumulative buckets
+        """
+        lines = []
+        for name, metric in sorted(self.get_state().items()):
+            lines.append("# TYPE {} {}".format(name, metric["type"]))
+            for key, value in sorted(metric["samples"].items()):
+                if metric["type"] != HISTOGRAM:
+                    lines.append("{}{} {}".format(name, _format_labels(key), value))
+                    continue
+                for bound, count in zip(self.buckets, value["buckets"]):
+                    lines.append("{}_bucket{} {}".format(name, _format_labels(key + (("le", bound),)), count))
+                lines.append("{}_bucket{} {}".format(name, _format_labels(key + (("le", "+Inf"),)), value["count"]))
+                lines.append("{}_sum{} {}".format(name, _format_labels(key), value["sum"]))
+                lines.append("{}_count{} {}".format(name, _format_labels(key), value["count"]))
+        return "\n".join(lines) + "\n"
+
+    def get_snapshot(self):
+        """
+        Get collected values in JSON-compatible form
+
+        Returns
+        -------
+        dict
+            Metric names with types and lists of samples with labels, histograms also have bucket bounds
+        """
+        snapshot = {}
+        for name, metric in self.get_state().items():
+            snapshot[name] = {
+                "type": metric["type"],
+                "samples": [
+                    {"labels": dict(key), "value": value}
+                    for key, value in sorted(metric["samples"].items())
+                ]
+            }
+            if metric["type"] == HISTOGRAM:
+                snapshot[name]["buckets"] = list(self.buckets)
+        return snapshot
+
+    def write_snapshot(self, path):
+        """
+        Save collected values to a JSON file
+        """
+        with open(path, "w") as snapshot_file:
+            json.dump(self.get_snapshot(), snapshot_file, indent=2)
+
+    def start_server(self, port, host="127.0.0.1"):
+        """
+        Expose collected values over HTTP in a background thread
+
+        Parameters
+        ----------
+        port : int
+            Local port of HTTP server
+        host : str
+            Interface of HTTP server, only local connections are accepted by default
+
+        Returns
+        -------
+        HTTPServer
+            Started server
+        """
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.get_exposition().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer((host, port), MetricsHandler)
+        Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+METRICS = Metrics()
+
+
+def record_rpc_request(method, host, elapsed, request_bytes, response_bytes):
+    """
+    Save latency and volume of JSON RPC request to parity
+
+    Parameters
+    ----------
+    method : str
+        Name of JSON RPC method, the first one for batch requests
+    host : str
+        URL of parity node
+    elapsed : float
+        Wall time of request in seconds
+    request_bytes : int
+        Size of request body
+    response_bytes : int
+        Size of response body
+    """
+    METRICS.observe("extractor_rpc_seconds", elapsed, method=method, host=host)
+    METRICS.inc("extractor_rpc_request_bytes_total", request_bytes, method=method, host=host)
+    METRICS.inc("extractor_rpc_response_bytes_total", response_bytes, method=method, host=host)
@@ -0,0 +1,241 @@
+import re
+import json
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import wraps
+from threading import Lock, local
+from config import QUERY_PROFILE_LOG
+
+MAX_FINGERPRINT_LENGTH = 200
+TOP_QUERIES_NUMBER = 10
+DEFAULT_STAGE = "default"
+# Max number of query ids kept to load server-side statistics, the oldest ids are removed first
+MAX_QUERY_IDS = 100000
+
+
+def _get_fingerprint(sql):
+    """
+    Get normalized form of SQL query without literals
+
+    Parameters
+    ----------
+    sql : str
+        SQL query
+
+    Returns
+    -------
+    str
+        Query with literals replaced by "?" and collapsed whitespaces
+    """
+    fingerprint = re.sub(r"'(?:[^'\\]|\\.)*'", "?", sql)
+    fingerprint = re.sub(r"\b\d+(\.\d+)?\b", "?", fingerprint)
+    fingerprint = re.sub(r"\?(\s*,\s*\?)+", "?, ...", fingerprint)
+    fingerprint = re.sub(r"\s+", " ", fingerprint).strip()
+    return fingerprint[:MAX_FINGERPRINT_LENGTH]
+
+
+class QueryProfiler:
+    """
+    Collect timings and volumes of database queries grouped by operation stage and query
+
+    Stack of stages is kept for each thread, queries of threads without own stages belong to default stage
+
+    Parameters
+    ----------
+    keep_query_ids : bool
+        Keep ids of recent queries to load server-side statistics, see add_query_log
+    """
+    def __init__(self, keep_query_ids=QUERY_PROFILE_LOG):
+        self.keep_query_ids = keep_query_ids
+        self.queries = {}
+        self.query_ids = OrderedDict()
+        self.listeners = []
+        self.lock = Lock()
+        self._local = local()
+
+    @property
+    def stages(self):
+        """
+        Stack of stages started in current thread
+        """
+        if not hasattr(self._local, "stages"):
+            self._local.stages = [DEFAULT_STAGE]
+        return self._local.stages
+
+    def get_stage(self):
+        """
+        Get name of current stage
+        """
+        return self.stages[-1]
+
+    @contextmanager
+    def tag_stage(self, name):
+        """
+        Assign all queries sent by current thread inside of a block to a stage
+
+        Listeners are not notified, so it can be used in threads working in parallel
+        """
+        self.stages.append(name)
+        try:
+            yield
+        finally:
+            self.stages.pop()
+
+    def profile_stage(self, function):
+        """
+        Decorator that assigns all queries sent inside of a function to a stage named by the function
+        """
+        @wraps(function)
+        def wrapped(*args, **kwargs):
+            with self.tag_stage(function.__name__):
+                for listener in self.listeners:
+                    listener.start_stage(function.__name__)
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    for listener in reversed(self.listeners):
+                        listener.end_stage(function.__name__)
+        return wrapped
+
+    def add_listener(self, listener):
+        """
+        Notify an object about started and finished stages
+
+        Parameters
+        ----------
+        listener : object
+            Object with start_stage(name) and end_stage(name) methods
+        """
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+
+    def create_query_id(self):
+        """
+        Create unique query id tagged with current stage name
+
+        Returns
+        -------
+        str
+            Query id in a form of STAGE:UUID
+        """
+        return "{}:{}".format(self.get_stage(), uuid.uuid4())
+
+    def record(self, query_id, sql, elapsed, query_info=None):
+        """
+        Save statistics of a finished query
+
+        Parameters
+        ----------
+        query_id : str
+            Id of query created by create_query_id
+        sql : str
+            Text of query
+        elapsed : float
+            Client-side wall time in seconds
+        query_info : clickhouse_driver.client.QueryInfo
+            Progress and profile info received from the database
+        """
+        stage = query_id.split(":")[0]
+        key = (stage, _get_fingerprint(sql))
+        progress = getattr(query_info, "progress", None)
+        profile_info = getattr(query_info, "profile_info", None)
+        with self.lock:
+            if key not in self.queries:
+                self.queries[key] = {
+                    "stage": stage,
+                    "query": key[1],
+                    "count": 0,
+                    "elapsed": 0.0,
+                    "result_rows": 0,
+                    "read_rows": 0,
+                    "read_bytes": 0,
+                    "written_rows": 0
+                }
+            stats = self.queries[key]
+            stats["count"] += 1
+            stats["elapsed"] += elapsed
+            stats["result_rows"] += getattr(profile_info, "rows", 0) or 0
+            stats["read_rows"] += getattr(progress, "rows", 0) or 0
+            stats["read_bytes"] += getattr(progress, "bytes", 0) or 0
+            stats["written_rows"] += getattr(progress, "written_rows", 0) or 0
+            if self.keep_query_ids:
+                self.query_ids[query_id] = key
+                if len(self.query_ids) > MAX_QUERY_IDS:
+                    self.query_ids.popitem(last=False)
+
+    def add_query_log(self, query_log):
+        """
+        Extend statistics with server-side info
+
+        Parameters
+        ----------
+        query_log : list
+            List of tuples with query_id, read_rows, memory_usage and query_duration_ms
+            from system.query_log
+        """
+        with self.lock:
+            for query_id, read_rows, memory_usage, duration in query_log:
+                key = self.query_ids.get(query_id)
+                if key is None:
+                    continue
+                stats = self.queries[key]
+                stats["server_read_rows"] = stats.get("server_read_rows", 0) + read_rows
+                stats["max_memory_usage"] = max(stats.get("max_memory_usage", 0), memory_usage)
+                stats["server_duration_ms"] = stats.get("server_duration_ms", 0) + duration
+
+    def get_summary(self):
+        """
+        Get statistics for all recorded queries
+
+        Returns
+        -------
+        dict
+            Stage names and lists of query statistics sorted by total wall time
+        """
+        summary = {}
+        with self.lock:
+            for stats in self.queries.values():
+                summary.setdefault(stats["stage"], []).append(dict(stats))
+        for stage_queries in summary.values():
+            stage_queries.sort(key=lambda stats: stats["elapsed"], reverse=True)
+        return summary
+
+    def write_summary(self, path=None):
+        """
+        Print the slowest queries of each stage and save full statistics
+
+        Parameters
+        ----------
+        path : str
+            Path to a file for statistics in JSON format.
+            Statistics of each run are appended to the file as a separate line
+        """
+        summary = self.get_summary()
+        for stage, stage_queries in summary.items():
+            print("Queries of stage {}:".format(stage))
+            for stats in stage_queries[:TOP_QUERIES_NUMBER]:
+                print("{:10.3f}s {:6d} calls {:12d} rows  {}".format(
+                    stats["elapsed"], stats["count"], stats["read_rows"], stats["query"]
+                ))
+        if path:
+            with open(path, "a") as profile_file:
+                profile_file.write(json.dumps(summary) + "\n")
+
+    def get_query_ids(self):
+        """
+        Get ids of recent recorded queries, if ids are kept
+        """
+        with self.lock:
+            return list(self.query_ids.keys())
+
+    def reset(self):
+        """
+        Remove all recorded statistics
+        """
+        with self.lock:
+            self.queries = {}
+            self.query_ids = OrderedDict()
+
+
+PROFILER = QueryProfiler()
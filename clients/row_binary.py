@@ -0,0 +1,153 @@
+import re
+import json
+import struct
+import calendar
+from datetime import datetime, date
+
+INTEGER_FORMATS = {
+    "UInt8": "<B",
+    "UInt16": "<H",
+    "UInt32": "<I",
+    "UInt64": "<Q",
+    "Int8": "<b",
+    "Int16": "<h",
+    "Int32": "<i",
+    "Int64": "<q",
+    "Float32": "<f",
+    "Float64": "<d"
+}
+BIG_INTEGER_SIZES = {
+    "UInt128": 16,
+    "UInt256": 32,
+    "Int128": 16,
+    "Int256": 32
+}
+EPOCH = date(1970, 1, 1)
+
+
+def _unwrap_type(column_type, wrapper):
+    """
+    Get inner type of parametrized type, i.e. String for Nullable(String)
+
+    Returns
+    -------
+    str
+        Inner type or None if type is not wrapped with given wrapper
+    """
+    match = re.match(r"^{}\((.*)\)$".format(wrapper), column_type)
+    if match:
+        return match.group(1)
+
+
+def _encode_length(length):
+    """
+    Encode number in LEB128 format used for lengths of strings and arrays
+    """
+    result = bytearray()
+    while True:
+        byte = length & 0x7f
+        length >>= 7
+        if length:
+            result.append(byte | 0x80)
+        else:
+            result.append(byte)
+            return bytes(result)
+
+
+def _encode_string(value):
+    if value is None:
+        value = b""
+    elif isinstance(value, (dict, list)):
+        value = json.dumps(value).encode("utf-8")
+    elif not isinstance(value, bytes):
+        value = str(value).encode("utf-8")
+    return _encode_length(len(value)) + value
+
+
+def _encode_datetime(value):
+    # Naive datetimes are treated as UTC, aware ones are converted to UTC
+    if isinstance(value, datetime):
+        value = calendar.timegm(value.utctimetuple())
+    return struct.pack("<I", int(value or 0))
+
+
+def _encode_date(value):
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        value = (value - EPOCH).days
+    return struct.pack("<H", int(value or 0))
+
+
+def encode_value(value, column_type):
+    """
+    Encode value in RowBinary format of clickhouse
+
+    Missing values of not nullable columns are replaced by default values of column type
+
+    Parameters
+    ----------
+    value
+        Value to encode
+    column_type : str
+        Type of column, i.e. Nullable(String) or Array(Int32)
+
+    Returns
+    -------
+    bytes
+        Encoded value
+    """
+    low_cardinality_type = _unwrap_type(column_type, "LowCardinality")
+    if low_cardinality_type:
+        return encode_value(value, low_cardinality_type)
+    nullable_type = _unwrap_type(column_type, "Nullable")
+    if nullable_type:
+        if value is None:
+            return b"\x01"
+        return b"\x00" + encode_value(value, nullable_type)
+    array_type = _unwrap_type(column_type, "Array")
+    if array_type:
+        value = value or []
+        return _encode_length(len(value)) + b"".join(encode_value(item, array_type) for item in value)
+    fixed_string_size = _unwrap_type(column_type, "FixedString")
+    if fixed_string_size:
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        return (value or b"")[:int(fixed_string_size)].ljust(int(fixed_string_size), b"\x00")
+    if column_type == "String":
+        return _encode_string(value)
+    if column_type in INTEGER_FORMATS:
+        value = value or 0
+        if not column_type.startswith("Float"):
+            value = int(value)
+        return struct.pack(INTEGER_FORMATS[column_type], value)
+    if column_type in BIG_INTEGER_SIZES:
+        return int(value or 0).to_bytes(BIG_INTEGER_SIZES[column_type], "little", signed=column_type.startswith("Int"))
+    if column_type == "DateTime":
+        return _encode_datetime(value)
+    if column_type == "Date":
+        return _encode_date(value)
+    raise ValueError("Type {} is not supported in RowBinary encoding".format(column_type))
+
+
+def encode_rows(docs, columns):
+    """
+    Encode records in RowBinary format of clickhouse
+
+    Parameters
+    ----------
+    docs : list
+        List of records
+    columns : list
+        List of tuples with column names and types in order of insertion
+
+    Returns
+    -------
+    bytes
+        Encoded records
+    """
+    return b"".join(
+        encode_value(document.get(name), column_type)
+        for document in docs
+        for name, column_type in columns
+    )
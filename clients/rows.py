@@ -0,0 +1,135 @@
+import re
+
+ID_FIELD = "id"
+
+_row_classes = {}
+
+
+def _get_attribute_name(field):
+    """
+    Convert field name to a valid attribute name, i.e. params.type to params_type
+    """
+    name = re.sub(r"\W", "_", field)
+    if not name or name[0].isdigit():
+        name = "_" + name
+    return name
+
+
+class Row:
+    """
+    Compact database record
+
+    Values are stored in slots and available as attributes, i.e. row.address, row._id.
+    Record id is stored in _id attribute.
+    Fields with names that are not valid identifiers are available with "_" instead of wrong symbols,
+    i.e. row.params_type for params.type field
+
+    For compatibility with old callers the row supports access in a form of
+    {"_id": RECORD_ID, "_source": {"field": "value"}}
+    """
+    __slots__ = ()
+    _fields = ()
+    _attributes = ()
+
+    def __init__(self, *values):
+        for attribute, value in zip(self.__slots__, values):
+            object.__setattr__(self, attribute, value)
+
+    def to_source(self):
+        """
+        Get record fields except id in a form of dict
+        """
+        return {
+            field: getattr(self, attribute, None)
+            for field, attribute in zip(self._fields, self._attributes)
+        }
+
+    def to_dict(self):
+        """
+        Get record in a form of {"_id": RECORD_ID, "_source": {"field": "value"}}
+        """
+        document = {"_source": self.to_source()}
+        if hasattr(self, "_id"):
+            document["_id"] = self._id
+        return document
+
+    def __getitem__(self, key):
+        if key == "_source":
+            return self.to_source()
+        if (key == "_id") and hasattr(self, "_id"):
+            return self._id
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return (key == "_source") or ((key == "_id") and hasattr(self, "_id"))
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __eq__(self, other):
+        if isinstance(other, Row):
+            other = other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "{}({})".format(self.__class__.__name__, self.to_dict())
+
+
+def get_row_class(fields):
+    """
+    Get row class for records with specified fields
+
+    Classes are created once for each set of fields
+
+    Parameters
+    ----------
+    fields : list
+        List of field names. Field "id" will be stored as _id attribute
+
+    Returns
+    -------
+    type
+        Subclass of Row
+    """
+    fields = tuple(fields)
+    if fields not in _row_classes:
+        source_fields = tuple(field for field in fields if field != ID_FIELD)
+        attributes = tuple(_get_attribute_name(field) for field in source_fields)
+        slots = tuple("_id" if field == ID_FIELD else _get_attribute_name(field) for field in fields)
+        _row_classes[fields] = type("Row", (Row,), {
+            "__slots__": slots,
+            "_fields": source_fields,
+            "_attributes": attributes
+        })
+    return _row_classes[fields]
+
+
+def create_row(source, id=None):
+    """
+    Create row from given fields
+
+    Parameters
+    ----------
+    source : dict
+        Record fields
+    id
+        Record id. Row will be created without _id attribute if not specified
+
+    Returns
+    -------
+    Row
+        Row with specified fields
+    """
+    fields = list(source.keys())
+    values = list(source.values())
+    if id is not None:
+        fields.append(ID_FIELD)
+        values.append(id)
+    return get_row_class(fields)(*values)
@@ -0,0 +1,215 @@
+from array import array
+from itertools import islice
+from config import SHARED_MEMORY_TRANSPORT
+from clients.columns import ColumnBatch
+
+try:
+    from multiprocessing import shared_memory, resource_tracker
+except ImportError:
+    shared_memory = None
+
+INT64_MIN = -2 ** 63
+INT64_MAX = 2 ** 63 - 1
+STRING_SEPARATOR = "\x00"
+
+
+def _is_int(value):
+    return (type(value) in (int, bool)) and (INT64_MIN <= value <= INT64_MAX)
+
+
+def _is_str(value):
+    return (type(value) == str) and (STRING_SEPARATOR not in value)
+
+
+def _encode_ints(values):
+    return [array("q", [value or 0 for value in values]).tobytes()]
+
+
+def _decode_ints(parts, length):
+    column = array("q")
+    column.frombytes(parts[0])
+    return column.tolist()
+
+
+def _encode_strings(values):
+    return [STRING_SEPARATOR.join(value or "" for value in values).encode("utf-8")]
+
+
+def _decode_strings(parts, length):
+    if not length:
+        return []
+    return parts[0].decode("utf-8").split(STRING_SEPARATOR)
+
+
+ENCODINGS = {
+    "int": (_is_int, _encode_ints, _decode_ints),
+    "str": (_is_str, _encode_strings, _decode_strings)
+}
+
+
+def _get_kind(values):
+    for kind, (check, _, _) in ENCODINGS.items():
+        if all((value is None) or check(value) for value in values):
+            return kind
+
+
+def _encode_column(column):
+    """
+    Encode column of integers, strings or arrays of them to binary parts
+
+    Integers are stored as int64 array, strings are joined with a separator, so they are split back at once
+
+    Returns
+    -------
+    tuple
+        Layout of column and list of binary parts or None if column can't be encoded
+    """
+    nulls = bytes(value is None for value in column)
+    if all(isinstance(value, (list, tuple)) for value in column):
+        items = [item for value in column for item in value]
+        kind = _get_kind(items)
+        if kind is None:
+            return None
+        lengths = array("Q", [len(value) for value in column]).tobytes()
+        return ("array", kind), [lengths] + ENCODINGS[kind][1](items)
+    kind = _get_kind(column)
+    if kind is None:
+        return None
+    return ("scalar", kind), [nulls] + ENCODINGS[kind][1](column)
+
+
+def _decode_column(layout, parts):
+    shape, kind = layout
+    if shape == "array":
+        lengths = array("Q")
+        lengths.frombytes(parts[0])
+        items = iter(ENCODINGS[kind][2](parts[1:], sum(lengths)))
+        return [list(islice(items, length)) for length in lengths]
+    nulls = parts[0]
+    values = ENCODINGS[kind][2](parts[1:], len(nulls))
+    if any(nulls):
+        return [None if is_null else value for value, is_null in zip(values, nulls)]
+    return values
+
+
+class SharedColumnBatch:
+    """
+    Column batch placed in a shared memory segment
+
+    Integer and string columns, and arrays of them, are stored in a segment as lengths plus data,
+    only a small description of the segment is pickled between processes.
+    Other columns, i.e. 256-bit integers, are pickled as usual.
+    The segment is read with one copy and removed when the batch is loaded by a receiver,
+    or released if the receiver won't load it, see release_batch
+
+    Parameters
+    ----------
+    batch : ColumnBatch
+        Batch to share
+    """
+    def __init__(self, batch):
+        self.fields = batch.fields
+        self.layouts = []
+        self.inline_columns = {}
+        parts = []
+        for field, column in zip(batch.fields, batch.columns):
+            encoded_column = _encode_column(column)
+            if encoded_column is None:
+                self.inline_columns[field] = column
+                self.layouts.append(None)
+                continue
+            layout, column_parts = encoded_column
+            self.layouts.append((layout, len(column_parts)))
+            parts += column_parts
+        self.sizes = [len(part) for part in parts]
+        memory = shared_memory.SharedMemory(create=True, size=max(sum(self.sizes), 1))
+        offset = 0
+        for part in parts:
+            memory.buf[offset:offset + len(part)] = part
+            offset += len(part)
+        self.name = memory.name
+        memory.close()
+        # Segment is removed by a receiver, not by the tracker of this worker
+        resource_tracker.unregister(memory._name, "shared_memory")
+
+    def release(self):
+        """
+        Remove the segment without reading the batch
+        """
+        memory = shared_memory.SharedMemory(name=self.name)
+        memory.close()
+        memory.unlink()
+
+    def load(self):
+        """
+        Read batch from the segment and remove the segment
+
+        Returns
+        -------
+        ColumnBatch
+            Shared batch
+        """
+        memory = shared_memory.SharedMemory(name=self.name)
+        try:
+            parts = []
+            offset = 0
+            for size in self.sizes:
+                parts.append(bytes(memory.buf[offset:offset + size]))
+                offset += size
+        finally:
+            memory.close()
+            memory.unlink()
+        columns = []
+        for field, layout in zip(self.fields, self.layouts):
+            if layout is None:
+                columns.append(self.inline_columns[field])
+                continue
+            column_layout, number_of_parts = layout
+            columns.append(_decode_column(column_layout, parts[:number_of_parts]))
+            parts = parts[number_of_parts:]
+        return ColumnBatch(self.fields, columns)
+
+
+def share_batch(batch):
+    """
+    Place batch in shared memory before returning it from a worker process
+
+    Batch is returned as is if shared memory is not available (Python < 3.8) or disabled in config
+
+    Parameters
+    ----------
+    batch : ColumnBatch
+        Batch to share
+
+    Returns
+    -------
+    SharedColumnBatch or ColumnBatch
+        Batch to return from a worker
+    """
+    if (shared_memory is None) or (not SHARED_MEMORY_TRANSPORT) or (not len(batch)):
+        return batch
+    return SharedColumnBatch(batch)
+
+
+def release_batch(batch):
+    """
+    Remove shared memory of a batch that won't be received, i.e. when another chunk of the same call failed
+
+    Can be used as release function of Executor.starmap
+    """
+    if isinstance(batch, SharedColumnBatch):
+        batch.release()
+
+
+def receive_batch(batch):
+    """
+    Get batch returned from a worker process, see share_batch
+
+    Returns
+    -------
+    ColumnBatch
+        Received batch
+    """
+    if isinstance(batch, SharedColumnBatch):
+        return batch.load()
+    return batch
@@ -16,11 +16,14 @@ INDICES = {
     "token_transaction": "eth_token_transaction",
     "transaction": "eth_transaction",
     "internal_transaction": "eth_internal_transaction",
+    "bytecode": "eth_bytecode",
     "listed_token": "eth_listed_token",
     "token_tx": "eth_token_transaction",
     "block": "eth_block",
     "price": "eth_token_price",
     "block_flag": "eth_block_flag",
+    "block_range": "eth_block_range",
+    "block_lease": "eth_block_lease",
     "contract_abi": "eth_contract_abi",
     "contract_block": "eth_contract_block",
     "transaction_input": "eth_transaction_input",
@@ -47,12 +50,96 @@ PARITY_EXTRACTION_PROCESSES = 3 # recommended
 # Number of chunks processed simultaneously during input parsing
 INPUT_PARSING_PROCESSES = 10 # recommended
 
+# Max number of compiled contract ABI kept by each input parsing worker
+DISPATCH_TABLES_CACHE_SIZE = 1000 # recommended
+
+# Executors of parallel stages: serial, thread, process or async
+EXECUTORS = {
+    "traces": "process",
+    "inputs": "process",
+    "contracts_abi": "thread"
+} # recommended
+
+# Start method of process executor workers, forkserver workers don't inherit connections of a parent process
+EXECUTOR_START_METHOD = "forkserver" # recommended, or spawn
+
+# Return column batches from process executor workers through shared memory segments, requires python 3.8+
+SHARED_MEMORY_TRANSPORT = True # recommended
+
 # Number of blocks processed simultaneously during events extraction
 EVENTS_RANGE_SIZE = 5 # recommended
 
+# Number of blocks copied by one query when materialized views are populated
+VIEW_POPULATE_BLOCKS = 1000000 # recommended
+
 # Max memory usage for clickhouse
 MAX_MEMORY_USAGE = 1000000000 # recommended
 
+# Number of recent inserts remembered by tables written with deduplication tokens to ignore repeated inserts
+INSERT_DEDUPLICATION_WINDOW = 1000 # recommended
+
+# Stages of run-pipeline operation in the order of processing
+PIPELINE_STAGES = ["blocks", "traces", "events", "tokens"]
+
+# Max number of blocks passed through pipeline stages at once
+PIPELINE_RANGE_SIZE = 1000 # recommended
+
+# Max number of block ranges waiting between pipeline stages
+PIPELINE_QUEUE_SIZE = 2 # recommended
+
+# Seconds between checks for new blocks in follow operation
+FOLLOW_POLL_INTERVAL = 1 # recommended
+
+# Number of blocks in each range claimed by workers in work operation
+LEASE_RANGE_SIZE = 10000 # recommended
+
+# Seconds before a lease of a stopped worker expires and its range is claimed again
+LEASE_TIMEOUT = 600 # recommended
+
+# Seconds between heartbeats that extend leases of running workers
+LEASE_HEARTBEAT_INTERVAL = 60 # recommended
+
+# Seconds between a claim of a range and a check of its owner
+LEASE_CLAIM_DELAY = 2 # recommended
+
+# Number of background threads writing records to clickhouse
+INSERT_WRITER_THREADS = 2 # recommended
+
+# Max number of inserts waiting for background writers
+INSERT_QUEUE_SIZE = 20 # recommended
+
+# Max number of queued inserts coalesced into one block by a background writer
+INSERT_COALESCE_SIZE = 10 # recommended
+
+# Directory for offline backfill.
+# If specified, extracted blocks, transactions and events are saved to compressed RowBinary files
+# in this directory instead of inserting. Use load-backfill operation to load them into database
+BACKFILL_DIR = None # or "backfill"
+
+# URL of clickhouse HTTP interface used to load backfill files
+CLICKHOUSE_HTTP_URL = "http://localhost:8123/"
+
+# Number of backfill files loaded simultaneously
+BACKFILL_LOADING_THREADS = 4 # recommended
+
+# File to append statistics of database queries after each operation
+QUERY_PROFILE_FILE = None # or "query_profile.log"
+
+# Extend query statistics with read rows, memory usage and duration from system.query_log
+QUERY_PROFILE_LOG = False
+
+# Directory for CPU and memory statistics of stages saved with --profile and --trace-malloc options
+PROFILE_DIR = "profiles"
+
+# Local port of HTTP endpoint with extraction metrics in Prometheus text format
+METRICS_PORT = None # or 9100
+
+# Interface of HTTP endpoint with extraction metrics, use "0.0.0.0" to expose it to other hosts
+METRICS_HOST = "127.0.0.1" # recommended
+
+# File to save snapshot of extraction metrics when process exits
+METRICS_FILE = "metrics.json" # or None
+
 # API key for etherscan.io ABI extraction
 ETHERSCAN_API_KEY = "YourApiKeyToken"
 
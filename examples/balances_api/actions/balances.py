@@ -1,49 +1,49 @@
 from actions.query import Query
 
 INCOME_SQL = """
-    SELECT to AS address, sum(value) AS income
-    FROM {}
+    SELECT to AS address, sum(value) / 1e18 AS income
+    FROM {} FINAL
     WHERE type != 'reward'
-    AND address IN({})
+    AND address IN {}
     GROUP BY address
 """
 
 OUTCOME_SQL = """
-    SELECT from AS address, sum(value) AS outcome
-    FROM {}
+    SELECT from AS address, sum(value) / 1e18 AS outcome
+    FROM {} FINAL
     WHERE type != 'reward'
-    AND address IN({})
+    AND address IN {}
     GROUP BY address
 """
 
 REWARD_SQL = """
-    SELECT author AS address, sum(value) AS reward
-    FROM {}
+    SELECT author AS address, sum(value) / 1e18 AS reward
+    FROM {} FINAL
     WHERE type = 'reward'
-    AND address IN ({})
+    AND address IN {}
     GROUP BY author
 """
 
 FEE_SQL = """
-    SELECT from AS address, sum(gasPrice * gasUsed) AS fee
-    FROM {}
-    WHERE address IN({})
+    SELECT from AS address, sum(gasPrice * gasUsed) / 1e18 AS fee
+    FROM {} FINAL
+    WHERE address IN {}
     GROUP BY from
 """
 
 FEE_REWARD_SQL = """
     SELECT address, sum(fee) AS fee_reward
     FROM (
-        SELECT blockNumber, sum(gasPrice * gasUsed) AS fee
-        FROM {0}
+        SELECT blockNumber, sum(gasPrice * gasUsed) / 1e18 AS fee
+        FROM {0} FINAL
         GROUP BY blockNumber
     )
     ANY INNER JOIN (
         SELECT author AS address, blockNumber
-        FROM {0}
+        FROM {0} FINAL
         WHERE type = 'reward'
         AND rewardType = 'block'
-        AND address IN({1})
+        AND address IN {1}
     )
     USING blockNumber
     GROUP BY address
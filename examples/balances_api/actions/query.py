@@ -1,16 +1,20 @@
 from clickhouse_driver import Client
 
+ADDRESSES_TABLE = "addresses"
+
 class Query():
     def __init__(self, table):
         self.client = Client('localhost')
         self.table = table
 
-    def _get_addresses_string(self, addresses):
-        addresses_string = ",".join(["'{}'".format(address) for address in addresses])
-        return addresses_string
+    def _get_addresses_table(self, addresses):
+        return {
+            "name": ADDRESSES_TABLE,
+            "structure": [("address", "String")],
+            "data": [{"address": address} for address in addresses]
+        }
 
     def _send_sql_request(self, addresses, sql):
-        addresses_string = self._get_addresses_string(addresses)
-        sql = sql.format(self.table, addresses_string) 
-        result = self.client.execute(sql)
+        sql = sql.format(self.table, ADDRESSES_TABLE)
+        result = self.client.execute(sql, external_tables=[self._get_addresses_table(addresses)])
         return dict(result)
\ No newline at end of file
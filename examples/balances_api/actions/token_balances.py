@@ -2,16 +2,16 @@ from actions.query import Query
 
 INCOME_SQL = """
     SELECT to AS address, sum(value) AS income
-    FROM {}
-    WHERE address IN({})
+    FROM {} FINAL
+    WHERE address IN {}
     AND token = '{}'
     GROUP BY address
 """
 
 OUTCOME_SQL = """
     SELECT from AS address, sum(value) AS outcome
-    FROM {}
-    WHERE address IN({})
+    FROM {} FINAL
+    WHERE address IN {}
     AND token = '{}'
     GROUP BY address
 """
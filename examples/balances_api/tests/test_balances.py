@@ -20,14 +20,14 @@ class BalancesTestCase(unittest.TestCase):
                 from Nullable(String), 
                 to Nullable(String), 
                 author Nullable(String), 
-                gasUsed Int64, 
-                gasPrice Float64, 
+                gasUsed UInt64, 
+                gasPrice UInt256, 
                 type String, 
                 rewardType Nullable(String),
                 blockNumber Int64,
-                value Float64
+                value UInt256
             )
-            ENGINE = MergeTree()
+            ENGINE = ReplacingMergeTree()
             ORDER BY id
         """.format(TEST_TABLE))
 
@@ -39,9 +39,9 @@ class BalancesTestCase(unittest.TestCase):
         "type": "call",
         "rewardType": None,
         "gasUsed": 10000,
-        "gasPrice": 0.01,
+        "gasPrice": 10 ** 16,
         "blockNumber": 1,
-        "value": 100
+        "value": 100 * 10 ** 18
     }, {
         "id": "2",
         "from": "0x2",
@@ -50,9 +50,9 @@ class BalancesTestCase(unittest.TestCase):
         "type": "call",
         "rewardType": None,
         "gasUsed": 20000,
-        "gasPrice": 0.02,
+        "gasPrice": 2 * 10 ** 16,
         "blockNumber": 1,
-        "value": 50
+        "value": 50 * 10 ** 18
     }, {
         "id": "3",
         "from": "0x4",
@@ -61,9 +61,9 @@ class BalancesTestCase(unittest.TestCase):
         "type": "call",
         "rewardType": None,
         "gasUsed": 30000,
-        "gasPrice": 0.03,
+        "gasPrice": 3 * 10 ** 16,
         "blockNumber": 1,
-        "value": 10
+        "value": 10 * 10 ** 18
     }, {
         "id": "4",
         "from": None,
@@ -74,7 +74,7 @@ class BalancesTestCase(unittest.TestCase):
         "gasUsed": 0,
         "gasPrice": 0,
         "blockNumber": 1,
-        "value": 1
+        "value": 10 ** 18
     }, {
         "id": "4",
         "from": None,
@@ -85,7 +85,7 @@ class BalancesTestCase(unittest.TestCase):
         "gasUsed": 0,
         "gasPrice": 0,
         "blockNumber": 1,
-        "value": 0.1
+        "value": 10 ** 17
     }]
 
     def test_get_income(self):
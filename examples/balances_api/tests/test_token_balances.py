@@ -22,7 +22,7 @@ class TokenBalancesTestCase(unittest.TestCase):
                 token String,
                 value Float64
             )
-            ENGINE = MergeTree()
+            ENGINE = ReplacingMergeTree()
             ORDER BY id
         """.format(TEST_TABLE))
 
@@ -67,6 +67,21 @@ class TokenBalancesTestCase(unittest.TestCase):
             "0x1": 500
         })
 
+    def test_get_income_of_repeated_transactions(self):
+        for _ in range(2):
+            self.client.execute("""
+                INSERT INTO {}
+                (id, to, token, value)
+                VALUES
+            """.format(TEST_TABLE), self.transactions)
+
+        result = self.balances.get_income(["0x1", "0x2"], "0x01")
+
+        self.assertSequenceEqual(result, {
+            "0x2": 100,
+            "0x1": 500
+        })
+
     def test_get_outcome(self):
         test_transactions = self.transactions
         self.client.execute("""
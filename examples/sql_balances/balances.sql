@@ -1,4 +1,4 @@
-SELECT address, balance_without_income + income AS balance
+SELECT address, (balance_without_income + income) / 1e18 AS balance
 FROM (
     SELECT address, balance_without_income_and_reward + reward AS balance_without_income
     FROM (
@@ -18,7 +18,7 @@ FROM (
             ANY LEFT JOIN (
                 SELECT address, sum(fee) AS fee_reward
                 FROM (
-                    SELECT blockNumber, sum(gasPrice * gasUsed) AS fee
+                    SELECT blockNumber, sum(toInt256(gasPrice * gasUsed)) AS fee
                     FROM eth_internal_transaction
                     WHERE id LIKE '%.0'
                     GROUP BY blockNumber
@@ -35,7 +35,7 @@ FROM (
             USING address
         )
         ANY LEFT JOIN (
-            SELECT from AS address, sum(gasPrice * gasUsed) AS fee, sum(value) AS outcome
+            SELECT from AS address, sum(toInt256(gasPrice * gasUsed)) AS fee, sum(toInt256(value)) AS outcome
             FROM eth_internal_transaction
             GROUP BY from
         )
@@ -44,7 +44,7 @@ FROM (
     ANY LEFT JOIN (
         SELECT address, reward
         FROM (
-            SELECT author AS address, sum(value) AS reward
+            SELECT author AS address, sum(toInt256(value)) AS reward
             FROM eth_internal_transaction
             WHERE type = 'reward'
             GROUP BY author
@@ -53,7 +53,7 @@ FROM (
     USING address
 )
 ANY LEFT JOIN (
-    SELECT to AS address, sum(value) AS income
+    SELECT to AS address, sum(toInt256(value)) AS income
     FROM eth_internal_transaction
     WHERE value > 0 AND type != 'reward'
     GROUP BY to
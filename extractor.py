@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 import click
+from functools import wraps
 from operations import clickhouse
-from config import DATABASE
+from config import DATABASE, PIPELINE_STAGES, PROFILE_DIR
 
 OPERATIONS = {
     "clickhouse": [
@@ -20,22 +21,56 @@ OPERATIONS = {
         ("parse-transactions-inputs", clickhouse.parse_transactions_inputs),
         ("parse-events-inputs", clickhouse.parse_events_inputs),
         ("download-prices", clickhouse.extract_prices),
+        ("load-backfill", clickhouse.load_backfill),
+        ("run-pipeline", clickhouse.run_pipeline),
+        ("follow", clickhouse.follow),
+        ("work", clickhouse.work),
         ("test", clickhouse.run_tests)
     ]
 }
 
 
+STAGES_OPTION = click.option("--stages", default=",".join(PIPELINE_STAGES), help="Comma-separated list of stages")
+OPTIONS = {
+    "run-pipeline": [STAGES_OPTION],
+    "follow": [STAGES_OPTION],
+    "work": [STAGES_OPTION]
+}
+
+
 @click.group()
-def start_process():
+@click.option("--profile", is_flag=True, help="Save cProfile statistics of each stage")
+@click.option("--trace-malloc", is_flag=True, help="Save top memory allocation sites of each stage")
+@click.option("--profile-sample", default=None, type=int, help="Profile only given number of chunks in each stage")
+@click.option("--profile-dir", default=PROFILE_DIR, help="Directory for profiling statistics")
+def start_process(profile, trace_malloc, profile_sample, profile_dir):
     """
     Ethereum extractor
     """
-    pass
+    clickhouse.start_metrics_server()
+    clickhouse.register_metrics_snapshot()
+    clickhouse.configure_code_profiler(profile_dir, profile, trace_malloc, profile_sample)
+
+
+def profile_queries(operation):
+    """
+    Write statistics of database queries when operation is finished
+    """
+    @wraps(operation)
+    def wrapped(*args, **kwargs):
+        try:
+            return operation(*args, **kwargs)
+        finally:
+            clickhouse.write_queries_profile()
+    return wrapped
 
 
 def wrap_operations():
     for name, operation in OPERATIONS[DATABASE]:
-        start_process.command(name)(operation)
+        command = profile_queries(operation)
+        for option in OPTIONS.get(name, []):
+            command = option(command)
+        start_process.command(name)(command)
 
 
 wrap_operations()
@@ -0,0 +1,333 @@
+from config import INDICES
+from clients.metrics import METRICS
+
+# Name of ranges of blocks saved to block table
+BLOCKS_EXTRACTED = "blocks_extracted"
+
+GAPS_SQL = """
+    SELECT previous, number FROM (
+        SELECT
+            number,
+            lagInFrame(number) OVER (ORDER BY number ROWS BETWEEN 1 PRECEDING AND CURRENT ROW) AS previous
+        FROM ({source})
+    )
+    WHERE number > previous + 1
+    ORDER BY number
+"""
+
+
+def merge_ranges(ranges):
+    """
+    Merge overlapping and adjacent ranges
+
+    Parameters
+    ----------
+    ranges : list
+        List of tuples with start and end of each range
+
+    Returns
+    -------
+    list
+        Sorted list of non-overlapping ranges
+    """
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and (start <= merged[-1][1]):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def get_gaps(ranges, start, end):
+    """
+    Get parts of [start, end) not covered by given ranges
+
+    Parameters
+    ----------
+    ranges : list
+        Sorted list of non-overlapping ranges
+    start : int
+        First block
+    end : int
+        Block after the last one
+
+    Returns
+    -------
+    list
+        List of tuples with start and end of each gap
+    """
+    gaps = []
+    for range_start, range_end in ranges:
+        if range_end <= start:
+            continue
+        if range_start >= end:
+            break
+        if range_start > start:
+            gaps.append((start, range_start))
+        start = max(start, range_end)
+    if start < end:
+        gaps.append((start, end))
+    return gaps
+
+
+class ClickhouseBlockRanges:
+    """
+    Store of processed block ranges for an extraction stage
+
+    Processed blocks are kept as a sorted list of non-overlapping ranges [start, end)
+    and saved to block_range table, one record per merged range.
+    Records are replaced by id, so a range that grows keeps a single record.
+    Ranges kept in memory are updated only after their records are written,
+    so blocks of a failed insert are processed again on retry
+
+    Parameters
+    ----------
+    name : str
+        Name of stage, i.e. traces_extracted
+    client : CustomClickhouse
+        Database client
+    indices : dict
+        Dictionary of table names
+    import_flags : bool
+        Import flags saved by previous versions if there are no saved ranges.
+        Stages that did not exist before should not scan old flags
+    """
+    def __init__(self, name, client, indices=INDICES, import_flags=True):
+        self.name = name
+        self.client = client
+        self.indices = indices
+        self.import_flags = import_flags
+        self.ranges = None
+
+    def _get_islands(self, source):
+        """
+        Get contiguous ranges of block numbers returned by a query
+
+        Gaps are found by a database in one ordered pass over block numbers, only bounds of gaps are returned.
+        Repeated numbers are allowed, so records are not deduplicated
+
+        Parameters
+        ----------
+        source : str
+            SQL query that returns block numbers in "number" column
+
+        Returns
+        -------
+        list
+            Sorted list of tuples with start and end of each range
+        """
+        bounds = self.client.fetch_all("SELECT count(), min(number), max(number) FROM ({})".format(source))
+        if not bounds or not bounds[0][0]:
+            return []
+        _, min_block, max_block = bounds[0]
+        islands = []
+        start = min_block
+        for previous, number in self.client.fetch_all(GAPS_SQL.format(source=source)):
+            # The first number has no previous one
+            if number == min_block:
+                continue
+            islands.append((start, previous + 1))
+            start = number
+        islands.append((start, max_block + 1))
+        return islands
+
+    def _import_flags(self):
+        """
+        Get ranges from per-block flags saved by previous versions
+
+        Ranges of extracted blocks are taken from block table
+
+        Returns
+        -------
+        list
+            List of tuples with start and end of each range
+        """
+        if self.name == BLOCKS_EXTRACTED:
+            return self._get_islands("SELECT number FROM {}".format(self.indices["block"]))
+        if "block_flag" not in self.indices:
+            return []
+        return self._get_islands(
+            "SELECT toInt64(id) AS number FROM {} FINAL WHERE name = '{}' AND value IS NOT NULL".format(
+                self.indices["block_flag"], self.name
+            )
+        )
+
+    def _create_range_doc(self, start, end):
+        return {
+            "id": "{}.{}".format(self.name, start),
+            "name": self.name,
+            "start_block": start,
+            "end_block": end
+        }
+
+    def _merge_range(self, start, end):
+        """
+        Add written range to ranges kept in memory
+
+        Called from a writer thread, so the list is replaced instead of being changed in place
+        """
+        if self.ranges is not None:
+            self.ranges = merge_ranges(self.ranges + [(start, end)])
+
+    def _save_range(self, start, end):
+        """
+        Save range to a database
+
+        Range is written only after all previously queued records,
+        then it is added to ranges kept in memory
+        """
+        self.client.bulk_index_async(
+            index=self.indices["block_range"],
+            docs=[self._create_range_doc(start, end)],
+            barrier=True,
+            callback=lambda: self._merge_range(start, end)
+        )
+
+    def load(self):
+        """
+        Load processed ranges from a database
+
+        Flags of processed blocks are imported if there are no saved ranges for this stage
+        and import of flags is enabled
+
+        Returns
+        -------
+        list
+            Sorted list of processed ranges
+        """
+        if self.ranges is None:
+            saved_ranges = self.client.search(
+                index=self.indices["block_range"],
+                fields=["start_block", "end_block"],
+                query="WHERE name = '{}'".format(self.name),
+                final=False
+            )
+            ranges = [(saved_range.start_block, saved_range.end_block) for saved_range in saved_ranges]
+            if (not ranges) and self.import_flags:
+                ranges = self._import_flags()
+                if ranges:
+                    docs = [self._create_range_doc(start, end) for start, end in ranges]
+                    self.client.bulk_index(index=self.indices["block_range"], docs=docs)
+            self.ranges = merge_ranges(ranges)
+        return self.ranges
+
+    def clear(self):
+        """
+        Remove all processed ranges of the stage, i.e. when its target table is recreated
+        """
+        self.client.flush()
+        self.client.send_sql_request("ALTER TABLE {} DELETE WHERE name = '{}' SETTINGS mutations_sync = 1".format(
+            self.indices["block_range"], self.name
+        ))
+        self.ranges = []
+
+    def add(self, start, end, count_blocks=True):
+        """
+        Mark blocks in range [start, end) as processed
+
+        Range is treated as processed once its record is written, i.e. after flush of the client
+
+        Parameters
+        ----------
+        start : int
+            First block of range
+        end : int
+            Block after the last block of range
+        count_blocks : bool
+            Add blocks to extractor_blocks_total metric, disabled for ranges that weren't processed by the stage
+        """
+        merged_start, merged_end = start, end
+        for range_start, range_end in self.load():
+            if (range_start <= merged_end) and (range_end >= merged_start):
+                merged_start, merged_end = min(merged_start, range_start), max(merged_end, range_end)
+        self._save_range(merged_start, merged_end)
+        if count_blocks:
+            METRICS.inc("extractor_blocks_total", end - start, stage=self.name)
+
+    def add_blocks(self, blocks):
+        """
+        Mark blocks as processed
+
+        Parameters
+        ----------
+        blocks : list
+            List of block numbers
+        """
+        for start, end in merge_ranges([(block, block + 1) for block in blocks]):
+            self.add(start, end)
+
+    def get_extracted(self):
+        """
+        Get ranges of blocks saved to block table
+
+        Ranges are read on each call, since blocks can be extracted by another process
+
+        Returns
+        -------
+        list
+            Sorted list of tuples with start and end of each range
+        """
+        return ClickhouseBlockRanges(BLOCKS_EXTRACTED, self.client, self.indices).load()
+
+    def get_unprocessed_extracted(self, start=0, end=None):
+        """
+        Get ranges of extracted blocks within [start, end) that are not processed yet
+
+        Parameters
+        ----------
+        start : int
+            First block
+        end : int
+            Block after the last one, or None for no limit
+
+        Returns
+        -------
+        list
+            List of tuples with start and end of each range
+        """
+        unprocessed = []
+        for extracted_start, extracted_end in self.get_extracted():
+            range_start = max(start, extracted_start)
+            range_end = min(end, extracted_end) if end is not None else extracted_end
+            if range_start < range_end:
+                unprocessed += self.get_unprocessed(range_start, range_end)
+        return unprocessed
+
+    def get_unprocessed(self, start, end):
+        """
+        Get unprocessed ranges within [start, end)
+
+        Parameters
+        ----------
+        start : int
+            First block
+        end : int
+            Block after the last one
+
+        Returns
+        -------
+        list
+            List of tuples with start and end of each unprocessed range
+        """
+        return get_gaps(self.load(), start, end)
+
+    def get_max_block(self, start=0):
+        """
+        Get the last block of processed blocks that follow the first block of the stage without holes
+
+        Blocks after a hole are skipped, since the hole can be processed later, i.e. by another worker
+
+        Parameters
+        ----------
+        start : int
+            First block of the stage
+
+        Returns
+        -------
+        int
+            Number of block or None if the first block is not processed
+        """
+        ranges = self.load()
+        if ranges and (ranges[0][0] <= start):
+            return ranges[0][1] - 1
@@ -1,10 +1,14 @@
 from config import INDICES, PARITY_HOSTS, NUMBER_OF_JOBS, ETHEREUM_START_DATE
 from clients.custom_clickhouse import CustomClickhouse
+from clients.metrics import METRICS
+from clients.code_profiler import CODE_PROFILER
+from operations.block_ranges import ClickhouseBlockRanges, BLOCKS_EXTRACTED
 import requests
 import json
 import utils
 from tqdm import tqdm
-from web3 import Web3, HTTPProvider
+from web3 import Web3
+from clients.metered_provider import MeteredHTTPProvider
 import datetime
 
 BLOCKS_PER_CHUNK = NUMBER_OF_JOBS
@@ -15,7 +19,8 @@ class Blocks:
         self.indices = indices
         self.client = client
         self.parity_host = parity_host
-        self.w3 = Web3(HTTPProvider(parity_host))
+        self.w3 = Web3(MeteredHTTPProvider(parity_host))
+        self.block_ranges = ClickhouseBlockRanges(BLOCKS_EXTRACTED, client, indices)
 
     def _get_max_parity_block(self):
         """
@@ -61,7 +66,7 @@ class Blocks:
         Returns
         -------
         datetime
-            Timestamp of a block
+            Timestamp of a block in UTC
             None if no such block in parity
         """
         if block_number == 0:
@@ -69,12 +74,14 @@ class Blocks:
         block = self.w3.eth.getBlock(block_number)
         if block != None:
             timestamp = block.timestamp
-            return datetime.datetime.fromtimestamp(timestamp)
+            return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).replace(tzinfo=None)
 
     def _create_blocks(self, start, end, max_blocks=NUMBER_OF_JOBS*10):
         """
         Create blocks from start to end. Extract timestamps for each block
 
+        Ranges of saved blocks are written after blocks, see ClickhouseBlockRanges.get_extracted
+
         Parameters
         ----------
         start : int
@@ -89,9 +96,16 @@ class Blocks:
         } for i in range(start, end + 1)]
         if docs:
             for chunk in tqdm(list(utils.split_on_chunks(docs, BLOCKS_PER_CHUNK))):
-                for doc in chunk:
-                    doc.update({'timestamp': self._extract_block_timestamp(doc['number'])})
-                self.client.bulk_index(docs=chunk, index=self.indices["block"], doc_type="b", refresh=True)
+                with CODE_PROFILER.chunk():
+                    for doc in chunk:
+                        doc.update({'timestamp': self._extract_block_timestamp(doc['number'])})
+                    self.client.bulk_index_async(
+                        docs=chunk, index=self.indices["block"], doc_type="b", refresh=True,
+                        deduplication_token="blocks:{}-{}".format(chunk[0]["number"], chunk[-1]["number"])
+                    )
+                    self.block_ranges.add(chunk[0]["number"], chunk[-1]["number"] + 1, count_blocks=False)
+                    METRICS.inc("extractor_blocks_total", len(chunk), stage="blocks")
+            self.client.flush()
 
     def create_blocks(self):
         """
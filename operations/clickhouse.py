@@ -1,55 +1,64 @@
-from operations.indices import ClickhouseIndices
-from operations.internal_transactions import ClickhouseInternalTransactions
-from operations.blocks import ClickhouseBlocks
-from operations.contract_transactions import ClickhouseContractTransactions
-from operations.contracts import ClickhouseContracts
-from operations.inputs import ClickhouseTransactionsInputs, ClickhouseEventsInputs
-from operations.events import ClickhouseEvents
-from operations.token_holders import ClickhouseTokenHolders
-from operations.token_prices import ClickhouseTokenPrices
-from operations.contract_methods import ClickhouseContractMethods
-from operations.bancor_trades import ClickhouseBancorTrades
+from clients.query_profiler import PROFILER
+from clients.metrics import METRICS
+from clients.code_profiler import CODE_PROFILER
+from config import QUERY_PROFILE_FILE, QUERY_PROFILE_LOG, BACKFILL_DIR, PIPELINE_STAGES, METRICS_PORT, METRICS_FILE, \
+    METRICS_HOST
 from time import sleep
 import os
+import sys
+import atexit
+import signal
 from utils import repeat_on_exception
 
+# Operation modules import web3, pyethereum, pandas and other heavy dependencies,
+# so they are imported inside operations to start only what a command needs
 
+
+@PROFILER.profile_stage
 def prepare_indices():
     """
     Prepare tables in database
     """
     print("Preparing indices...")
+    from operations.indices import ClickhouseIndices
     indices = ClickhouseIndices()
     indices.prepare_indices()
 
 
+@PROFILER.profile_stage
 def prepare_blocks():
     """
     Extract blocks with timestamps
     """
     print("Preparing blocks...")
+    from operations.blocks import ClickhouseBlocks
     blocks = ClickhouseBlocks()
     blocks.create_blocks()
 
 
+@PROFILER.profile_stage
 def prepare_contracts_view():
     """
     Prepare material view with contracts extracted from transactions table
     """
     print("Preparing contracts view...")
+    from operations.contract_transactions import ClickhouseContractTransactions
     contract_transactions = ClickhouseContractTransactions()
     contract_transactions.extract_contract_addresses()
 
 
+@PROFILER.profile_stage
 def extract_traces():
     """
     Extract internal transactions
     """
     print("Extracting internal transactions...")
+    from operations.internal_transactions import ClickhouseInternalTransactions
     internal_transactions = ClickhouseInternalTransactions()
     internal_transactions.extract_traces()
 
 
+@PROFILER.profile_stage
 def extract_contracts_abi():
     """
     Extract ABI description from etherscan.io
@@ -57,19 +66,23 @@ def extract_contracts_abi():
     Works only for contracts specified in config
     """
     print("Extracting ABIs...")
+    from operations.contracts import ClickhouseContracts
     contracts = ClickhouseContracts()
     contracts.save_contracts_abi()
 
 
+@PROFILER.profile_stage
 def extract_events():
     """
     Extract events
     """
     print("Extracting events...")
+    from operations.events import ClickhouseEvents
     events = ClickhouseEvents()
     events.extract_events()
 
 
+@PROFILER.profile_stage
 def parse_transactions_inputs():
     """
     Start input parsing for transactions.
@@ -77,10 +90,12 @@ def parse_transactions_inputs():
     The operation works only for contracts specified in config.
     """
     print("Parsing transactions inputs...")
+    from operations.inputs import ClickhouseTransactionsInputs
     contracts = ClickhouseTransactionsInputs()
     contracts.decode_inputs()
 
 
+@PROFILER.profile_stage
 def parse_events_inputs():
     """
     Start input parsing for events.
@@ -88,20 +103,24 @@ def parse_events_inputs():
     The operation works only for contracts specified in config
     """
     print("Parsing events inputs...")
+    from operations.inputs import ClickhouseEventsInputs
     contracts = ClickhouseEventsInputs()
     contracts.decode_inputs()
 
 
+@PROFILER.profile_stage
 def extract_token_transactions():
     """
     Prepare material view with erc20 transactions
     extracted from transactions table.
     """
     print("Preparing token transactions view...")
+    from operations.token_holders import ClickhouseTokenHolders
     contracts = ClickhouseTokenHolders()
     contracts.extract_token_transactions()
 
 
+@PROFILER.profile_stage
 def extract_prices():
     """
     Download exchange rates
@@ -110,28 +129,34 @@ def extract_prices():
     from cryptocompare.com and coinmarketcap.com
     """
     print("Extracting prices...")
+    from operations.token_prices import ClickhouseTokenPrices
     prices = ClickhouseTokenPrices()
     prices.get_prices_within_interval()
 
 
+@PROFILER.profile_stage
 def extract_tokens():
     """
     Extract ERC20 token names, symbols, total supply and etc.
     """
     print("Extracting tokens...")
+    from operations.contract_methods import ClickhouseContractMethods
     tokens = ClickhouseContractMethods()
     tokens.search_methods()
 
 
+@PROFILER.profile_stage
 def prepare_bancor_trades():
     """
     Prepare view with bancor trades
     """
     print("Extracting trades...")
+    from operations.bancor_trades import ClickhouseBancorTrades
     trades = ClickhouseBancorTrades()
     trades.extract_trades()
 
 
+@PROFILER.profile_stage
 def prepare_indices_and_views():
     """
     Prepare all indices and views in database
@@ -141,13 +166,86 @@ def prepare_indices_and_views():
     extract_token_transactions()
 
 
+@PROFILER.profile_stage
+def load_backfill():
+    """
+    Load files saved during extraction in backfill mode
+
+    Flags of processed blocks are loaded after all data
+    """
+    print("Loading backfill files...")
+    from clients.backfill import BackfillLoader
+    loader = BackfillLoader(BACKFILL_DIR)
+    loader.load()
+
+
+@PROFILER.profile_stage
+def run_pipeline(stages=",".join(PIPELINE_STAGES)):
+    """
+    Extract blocks, internal transactions, events and tokens in one pass
+
+    Each block range goes through all selected stages before the pipeline reaches the last parity block
+
+    Parameters
+    ----------
+    stages : str
+        Comma-separated names of stages, i.e. "traces,events"
+    """
+    print("Running pipeline...")
+    from operations.blocks import ClickhouseBlocks
+    from operations.pipeline import Pipeline, create_stages
+    blocks = ClickhouseBlocks()
+    pipeline = Pipeline(create_stages(stages.split(",")))
+    pipeline.run(0, blocks._get_max_parity_block() + 1)
+
+
+@PROFILER.profile_stage
+def follow(stages=",".join(PIPELINE_STAGES)):
+    """
+    Stay resident and process new blocks by pipeline stages as soon as they appear
+
+    Parameters
+    ----------
+    stages : str
+        Comma-separated names of stages, i.e. "blocks,traces"
+    """
+    print("Following new blocks...")
+    from operations.blocks import ClickhouseBlocks
+    from operations.pipeline import Follower, create_stages
+    blocks = ClickhouseBlocks()
+    follower = Follower(create_stages(stages.split(",")), blocks._get_max_parity_block)
+    follower.follow()
+
+
+@PROFILER.profile_stage
+def work(stages=",".join(PIPELINE_STAGES)):
+    """
+    Process blocks by pipeline stages together with other workers
+
+    Workers claim block ranges with leases, so any number of them can be started on one or many hosts
+
+    Parameters
+    ----------
+    stages : str
+        Comma-separated names of stages, i.e. "traces,events"
+    """
+    print("Working on leased block ranges...")
+    from operations.blocks import ClickhouseBlocks
+    from operations.pipeline import create_stages
+    from operations.leases import ClickhouseBlockLeases, Worker, create_owner_name
+    blocks = ClickhouseBlocks()
+    names = sorted(set(stages.split(",")))
+    # Leases are shared by workers with the same stages in any order
+    leases = ClickhouseBlockLeases(",".join(names), blocks.client, create_owner_name())
+    worker = Worker(create_stages(names), leases, blocks._get_max_parity_block)
+    worker.work()
+
+
 def _fill_database():
-    prepare_blocks()
-    extract_traces()
-    extract_events()
-    extract_tokens()
+    run_pipeline()
 
 
+@PROFILER.profile_stage
 def synchronize():
     """
     Run partial synchronization of the database.
@@ -159,6 +257,7 @@ def synchronize():
     sleep(10)
 
 
+@PROFILER.profile_stage
 def synchronize_full():
     """
     Run full synchronization of the database
@@ -172,8 +271,68 @@ def synchronize_full():
     sleep(10)
         
 
+def write_queries_profile():
+    """
+    Print statistics of queries sent during operation and save it to a file specified in config
+    """
+    if QUERY_PROFILE_LOG:
+        from clients.custom_clickhouse import CustomClickhouse
+        query_log = CustomClickhouse().load_query_log(PROFILER.get_query_ids())
+        PROFILER.add_query_log(query_log)
+    PROFILER.write_summary(QUERY_PROFILE_FILE)
+    PROFILER.reset()
+
+
 def run_tests():
     """
     Run tests
     """
     os.system("nosetests --nologcapture -v .")
+
+
+def start_metrics_server():
+    """
+    Expose extraction metrics over HTTP if metrics port is specified in config
+    """
+    if METRICS_PORT:
+        METRICS.start_server(METRICS_PORT, METRICS_HOST)
+
+
+def write_metrics():
+    """
+    Save snapshot of extraction metrics if metrics file is specified in config
+    """
+    if METRICS_FILE:
+        METRICS.write_snapshot(METRICS_FILE)
+
+
+def _exit_on_signal(signum, frame):
+    sys.exit(128 + signum)
+
+
+def register_metrics_snapshot():
+    """
+    Save snapshot of extraction metrics when process exits, including termination by SIGTERM
+    """
+    atexit.register(write_metrics)
+    signal.signal(signal.SIGTERM, _exit_on_signal)
+
+
+def configure_code_profiler(directory, cpu=False, memory=False, sample=None):
+    """
+    Save CPU and memory statistics of each stage to a directory
+
+    Parameters
+    ----------
+    directory : str
+        Directory for statistics files
+    cpu : bool
+        Profile CPU time with cProfile
+    memory : bool
+        Trace memory allocations with tracemalloc
+    sample : int
+        Number of profiled chunks in each stage, or None to profile whole stages
+    """
+    CODE_PROFILER.configure(directory, cpu, memory, sample)
+    if CODE_PROFILER.is_enabled():
+        PROFILER.add_listener(CODE_PROFILER)
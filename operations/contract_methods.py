@@ -1,21 +1,31 @@
 import re
-from web3 import Web3, HTTPProvider
+from web3 import Web3
+from clients.metered_provider import MeteredHTTPProvider
 from config import INDICES, PARITY_HOSTS
 import json
 import math
 from decimal import Decimal
 import os
 import utils
+from functools import lru_cache
 from clients.custom_clickhouse import CustomClickhouse
 
-CURRENT_DIR = os.getcwd()
+CURRENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 MAX_TOTAL_SUPPLY = 1 << 63 - 1
 
-if "tests" in CURRENT_DIR:
-    CURRENT_DIR = CURRENT_DIR[:-5]
 
-with open('{}/standard-token-abi.json'.format(CURRENT_DIR)) as json_file:
-    standard_token_abi = json.load(json_file)
+@lru_cache(maxsize=None)
+def load_standard_token_abi():
+    """
+    Load ABI of standard ERC20 token once per process
+
+    Returns
+    -------
+    list
+        List of token methods specifications
+    """
+    with open('{}/standard-token-abi.json'.format(CURRENT_DIR)) as json_file:
+        return json.load(json_file)
 
 
 class ClickhouseContractMethods:
@@ -53,8 +63,8 @@ class ClickhouseContractMethods:
     def __init__(self, indices=INDICES, parity_hosts=PARITY_HOSTS):
         self.indices = indices
         self.client = CustomClickhouse()
-        self.w3 = Web3(HTTPProvider(parity_hosts[0][2]))
-        self.standard_token_abi = standard_token_abi
+        self.w3 = Web3(MeteredHTTPProvider(parity_hosts[0][2]))
+        self.standard_token_abi = load_standard_token_abi()
         self._set_external_links()
 
     def _set_external_links(self):
@@ -218,11 +228,11 @@ class ClickhouseContractMethods:
 
         Parameters
         ----------
-        contract: dict
-            Dictionary with contract info
+        contract: Row
+            Contract info with address field
         """
-        name, symbol, decimals, total_supply, owner = self._get_constants(contract['_source']['address'])
-        website_slug, cmc_id = self._get_external_links(contract["_source"]["address"])
+        name, symbol, decimals, total_supply, owner = self._get_constants(contract.address)
+        website_slug, cmc_id = self._get_external_links(contract.address)
         update_body = {
             'token_name': name,
             'token_symbol': symbol,
@@ -232,7 +242,7 @@ class ClickhouseContractMethods:
             "website_slug": website_slug,
             "cmc_id": cmc_id
         }
-        self._update_contract_descr(contract['_id'], update_body)
+        self._update_contract_descr(contract._id, update_body)
 
     def search_methods(self):
         """
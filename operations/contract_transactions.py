@@ -1,7 +1,56 @@
 from clients.custom_clickhouse import CustomClickhouse
 from config import INDICES
+from operations.views import ClickhouseView
 from web3 import Web3
 
+# Method signatures of each standard, contract follows a standard if its bytecode contains all selectors
+STANDARDS = {
+    "erc20": [
+        "totalSupply()",
+        "balanceOf(address)",
+        "allowance(address,address)",
+        "transfer(address,uint256)",
+        "transferFrom(address,address,uint256)",
+        "approve(address,uint256)"
+    ],
+    "erc223": [
+        "tokenFallback(address,uint256,bytes)"
+    ],
+    "erc721": [
+        "balanceOf(address)",
+        "ownerOf(uint256)",
+        "safeTransferFrom(address,address,uint256)",
+        "safeTransferFrom(address,address,uint256,bytes)",
+        "transferFrom(address,address,uint256)",
+        "approve(address,uint256)",
+        "setApprovalForAll(address,bool)",
+        "getApproved(uint256)",
+        "isApprovedForAll(address,address)"
+    ],
+    "erc777": [
+        "granularity()",
+        "defaultOperators()",
+        "send(address,uint256,bytes)",
+        "burn(uint256,bytes)",
+        "isOperatorFor(address,address)",
+        "authorizeOperator(address)",
+        "revokeOperator(address)",
+        "operatorSend(address,address,uint256,bytes,bytes)",
+        "operatorBurn(address,uint256,bytes,bytes)"
+    ],
+    "erc1155": [
+        "balanceOf(address,uint256)",
+        "balanceOfBatch(address[],uint256[])",
+        "safeTransferFrom(address,address,uint256,uint256,bytes)",
+        "safeBatchTransferFrom(address,address,uint256[],uint256[],bytes)",
+        "setApprovalForAll(address,bool)",
+        "isApprovedForAll(address,address)"
+    ],
+    "bancor_converter": [
+        "convert(address,address,uint256,uint256)"
+    ]
+}
+
 
 class ClickhouseContractTransactions:
     def __init__(self, indices=INDICES):
@@ -34,26 +83,17 @@ class ClickhouseContractTransactions:
             Dictionary with first 4 bytes of methods signatures in hex format
         """
         return {
-            'erc20': {
-                'totalSupply': self._extract_first_bytes('totalSupply()'),
-                'balanceOf': self._extract_first_bytes('balanceOf(address)'),
-                'allowance': self._extract_first_bytes('allowance(address,address)'),
-                'transfer': self._extract_first_bytes('transfer(address,uint256)'),
-                'transferFrom': self._extract_first_bytes('transferFrom(address,address,uint256)'),
-                'approve': self._extract_first_bytes('approve(address,uint256)'),
-            },
-            'erc223': {
-                'tokenFallback': self._extract_first_bytes('tokenFallback(address,uint256,bytes)')
-            },
-            'bancor_converter': {
-                'convert': self._extract_first_bytes('convert(address,address,uint256,uint256)')
-            }
+            standard: {method: self._extract_first_bytes(method) for method in methods}
+            for standard, methods in STANDARDS.items()
         }
 
     def _get_standards(self):
         """
         Create dict with sql to create "standard_*" flag fields
 
+        Standards are defined by selectors parsed from contract bytecode during extraction,
+        contract follows a standard if it has all selectors of the standard, see STANDARDS
+
         Returns
         -------
         dict
@@ -62,9 +102,9 @@ class ClickhouseContractTransactions:
         """
         standards = self._extract_methods_signatures()
         return {
-            "standard_" + standard: " AND ".join([
-                "(bytecode LIKE '%{}%')".format(signature) for signature in signatures.values()
-            ])
+            "standard_" + standard: "hasAll(selectors, [{}])".format(", ".join([
+                "toFixedString(unhex('{}'), 4)".format(signature) for signature in signatures.values()
+            ]))
             for standard, signatures in standards.items()
         }
 
@@ -84,7 +124,8 @@ class ClickhouseContractTransactions:
             "blockNumber": "blockNumber",
             "address": "address",
             "owner": "from",
-            "bytecode": "code"
+            "code_hash": "code_hash",
+            "selectors": "selectors"
         }
         fields.update(standard_fields)
         fields_string = ", ".join([
@@ -97,16 +138,16 @@ class ClickhouseContractTransactions:
         """
         Create material view for contracts extracted from internal transactions table
 
+        Contracts hold only a hash of their bytecode and selectors used to define standards of contracts.
+        Contracts of existing transactions are copied by block ranges, see ClickhouseView
+
         This function is an entry point for prepare-erc-transactions-view operation
         """
-        fields_string = self._get_fields()
-        engine_string = 'ENGINE = ReplacingMergeTree() ORDER BY id'
-        condition = "type = 'create' AND error IS NULL AND parent_error IS NULL"
-        sql = "CREATE MATERIALIZED VIEW IF NOT EXISTS {} {} POPULATE AS (SELECT {} FROM {} WHERE {})".format(
-            self.indices["contract"],
-            engine_string,
-            fields_string,
-            self.indices["internal_transaction"],
-            condition
+        view = ClickhouseView(
+            "contract", "internal_transaction",
+            fields=self._get_fields(),
+            condition="type = 'create' AND error IS NULL AND parent_error IS NULL",
+            client=self.client,
+            indices=self.indices
         )
-        self.client.send_sql_request(sql)
+        view.create()
@@ -1,9 +1,9 @@
 import os
 import json
-from multiprocessing import Pool
-from config import PARITY_HOSTS, INDICES, ETHERSCAN_API_KEY, INPUT_PARSING_PROCESSES
+from config import PARITY_HOSTS, INDICES, ETHERSCAN_API_KEY, INPUT_PARSING_PROCESSES, EXECUTORS
 import utils
 from clients.custom_clickhouse import CustomClickhouse
+from clients.executors import create_executor, open_worker_clients, get_worker_client
 import requests
 
 ETHERSCAN_ABI_API = "https://api.etherscan.io/api?module=contract&action=getabi&address={}&apikey=" + ETHERSCAN_API_KEY
@@ -27,7 +27,7 @@ def _get_contracts_abi_sync(addresses):
     abis = {}
     for key, address in addresses.items():
         api_url = ETHERSCAN_ABI_API.format(address)
-        abi = requests.get(api_url).json()
+        abi = get_worker_client("etherscan", requests.Session).get(api_url).json()
         try:
             abis[key] = json.loads(abi["result"])
         except:
@@ -43,7 +43,9 @@ class ClickhouseContracts(utils.ClickhouseContractTransactionsIterator):
     def __init__(self, indices=INDICES, parity_hosts=PARITY_HOSTS):
         self.indices = indices
         self.client = CustomClickhouse()
-        self.pool = Pool(processes=NUMBER_OF_PROCESSES)
+        self.executor = create_executor(
+            EXECUTORS["contracts_abi"], NUMBER_OF_PROCESSES, open_worker_clients, ({"etherscan": requests.Session},)
+        )
         self.parity_hosts = parity_hosts
 
     def _split_on_chunks(self, iterable, size):
@@ -67,7 +69,7 @@ class ClickhouseContracts(utils.ClickhouseContractTransactionsIterator):
         """
         chunks = self._split_on_chunks(list(enumerate(all_addresses)), NUMBER_OF_PROCESSES)
         dict_chunks = [dict(chunk) for chunk in chunks]
-        abis = {key: abi for abis_dict in self.pool.map(_get_contracts_abi_sync, dict_chunks) for key, abi in
+        abis = {key: abi for abis_dict in self.executor.map(_get_contracts_abi_sync, dict_chunks) for key, abi in
                 abis_dict.items()}
         return [abis[key] for key in sorted(abis.keys())]
 
@@ -115,8 +117,9 @@ class ClickhouseContracts(utils.ClickhouseContractTransactionsIterator):
 
         This function is an entry point for download-contracts-abi operation
         """
-        for contracts in self._iterate_contracts_without_abi():
-            abis = self._get_contracts_abi([contract["_source"]["address"] for contract in contracts])
-            documents = [{'abi': self._convert_abi(abis[index]), 'abi_extracted': True, "id": contract["_id"]} for
-                         index, contract in enumerate(contracts)]
-            self.client.bulk_index(index=self.indices["contract_abi"], docs=documents)
+        with self.executor:
+            for contracts in self._iterate_contracts_without_abi():
+                abis = self._get_contracts_abi([contract.address for contract in contracts])
+                documents = [{'abi': self._convert_abi(abis[index]), 'abi_extracted': True, "id": contract._id} for
+                             index, contract in enumerate(contracts)]
+                self.client.bulk_index(index=self.indices["contract_abi"], docs=documents)
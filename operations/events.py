@@ -1,18 +1,24 @@
 from clients.custom_clickhouse import CustomClickhouse
+from operations.block_ranges import ClickhouseBlockRanges
+from clients.code_profiler import CODE_PROFILER
 from config import EVENTS_RANGE_SIZE, INDICES, PARITY_HOSTS
-from web3 import Web3, HTTPProvider
+from web3 import Web3
+from clients.metered_provider import MeteredHTTPProvider
 
 
 class ClickhouseEvents:
-    def __init__(self, indices=INDICES, parity_hosts=PARITY_HOSTS):
-        self.client = CustomClickhouse()
+    def __init__(self, indices=INDICES, parity_hosts=PARITY_HOSTS, client=None):
+        self.client = client if client is not None else CustomClickhouse()
         self.indices = indices
-        self.web3 = Web3(HTTPProvider(parity_hosts[0][-1], request_kwargs={'timeout': 100}))
+        self.web3 = Web3(MeteredHTTPProvider(parity_hosts[0][-1], request_kwargs={'timeout': 100}))
+        self.block_ranges = ClickhouseBlockRanges("events_extracted", self.client, self.indices)
 
     def _iterate_block_ranges(self, range_size=EVENTS_RANGE_SIZE):
         """
         Iterate over unprocessed block ranges with given size
 
+        Ranges are taken from gaps between processed ranges within extracted blocks
+
         Parameters
         ----------
         range_size : list
@@ -22,17 +28,9 @@ class ClickhouseEvents:
         generator
             Generator that iterates through unprocessed block ranges
         """
-        range_query = "distinct(toInt32(floor(number / {}))) AS range".format(range_size)
-        flags_query = "ANY LEFT JOIN (SELECT id, value FROM {} FINAL WHERE name = 'events_extracted') USING id WHERE value IS NULL".format(
-            self.indices["block_flag"])
-        for ranges_chunk in self.client.iterate(index=self.indices["block"], fields=[range_query], query=flags_query,
-                                                return_id=False):
-            for range in ranges_chunk:
-                range_bounds = (
-                    range["_source"]["range"] * range_size,
-                    (range["_source"]["range"] + 1) * range_size
-                )
-                yield range_bounds
+        for gap_start, gap_end in self.block_ranges.get_unprocessed_extracted():
+            for range_start in range(gap_start, gap_end, range_size):
+                yield (range_start, min(range_start + range_size, gap_end))
 
     def _get_events(self, block_range):
         """
@@ -51,7 +49,7 @@ class ClickhouseEvents:
         events = event_filter.get_all_entries()
         return events
 
-    def _save_events(self, events):
+    def _save_events(self, events, deduplication_token=None):
         """
         Prepare and save each event to a database
 
@@ -59,10 +57,13 @@ class ClickhouseEvents:
         ----------
         events : list
             Events extracted from parity
+        deduplication_token : str
+            Token of processed block range, repeated saves of the same range are ignored
         """
         events = [self._process_event(event) for event in events]
         if events:
-            self.client.bulk_index(index=self.indices["event"], docs=events)
+            self.client.bulk_index_async(index=self.indices["event"], docs=events,
+                                         deduplication_token=deduplication_token)
 
     def _process_event(self, event):
         """
@@ -89,19 +90,16 @@ class ClickhouseEvents:
 
     def _save_processed_blocks(self, block_range):
         """
-        Save events_extracted flag for processed blocks
+        Mark block range as processed by events extraction
+
+        Ranges are written only after all previously queued events
 
         Parameters
         ----------
         block_range : tuple
             Start and end of processed block range
         """
-        block_flags = [{
-            "id": block,
-            "name": "events_extracted",
-            "value": 1
-        } for block in range(*block_range)]
-        self.client.bulk_index(index=self.indices["block_flag"], docs=block_flags)
+        self.block_ranges.add(*block_range)
 
     def extract_events(self):
         """
@@ -110,6 +108,8 @@ class ClickhouseEvents:
         This function is an entry point for extract-events operation
         """
         for block_range in self._iterate_block_ranges():
-            events = self._get_events(block_range)
-            self._save_events(events)
-            self._save_processed_blocks(block_range)
+            with CODE_PROFILER.chunk():
+                events = self._get_events(block_range)
+                self._save_events(events, deduplication_token="events_extracted:{}-{}".format(*block_range))
+                self._save_processed_blocks(block_range)
+        self.client.flush()
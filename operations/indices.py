@@ -1,4 +1,4 @@
-from config import INDICES
+from config import INDICES, INSERT_DEDUPLICATION_WINDOW
 from clients.custom_clickhouse import CustomClickhouse
 from schema.schema import SCHEMA
 
@@ -6,19 +6,42 @@ INDEX_FIELDS = SCHEMA
 
 PRIMARY_KEYS = {
     "block_flag": ["id", "name"],
+    "block_range": ["name", "id"],
+    "block_lease": ["name", "start_block", "id"],
     "contract_block": ["id", "name"]
 }
 
+# Tables written with insert deduplication tokens, other tables don't deduplicate inserts
+DEDUPLICATED_INDICES = ["block", "internal_transaction", "bytecode", "miner_transaction", "event"]
+
+# Columns of internal transactions with bytecode of created contracts saved by previous versions
+BYTECODE_COLUMNS = ["code", "init"]
+
+# Columns of tables created by previous versions: old type and SQL expression that converts old values
+COLUMN_MIGRATIONS = {
+    "internal_transaction": {
+        "value": ("Nullable(Float64)", "toUInt256(round({} * 1e18))"),
+        "gasPrice": ("Nullable(Float64)", "toUInt256(round({} * 1e18))"),
+        "gas": ("Nullable(String)", "reinterpretAsUInt64(reverse(unhex(substring({}, 3))))"),
+        "gasUsed": ("Nullable(Int32)", "toUInt64({})"),
+        "balance": ("Nullable(String)", "reinterpretAsUInt256(reverse(unhex(substring({}, 3))))")
+    }
+}
+
 
 class ClickhouseIndices:
     def __init__(self, indices=INDICES):
         self.client = CustomClickhouse()
         self.indices = indices
 
-    def _create_index(self, index, fields={}, primary_key=["id"]):
+    def _create_index(self, index, fields={}, primary_key=["id"], deduplication_window=0):
         """
         Create specified index in database with specified field types and primary key
 
+        Tables written with deduplication tokens remember tokens of recent inserts,
+        so repeated inserts of the same chunk are ignored.
+        Window of other tables is reset, since identical inserts without tokens are ignored as well
+
         Parameters
         ----------
         index : str
@@ -27,21 +50,150 @@ class ClickhouseIndices:
             Fields and their types and index
         primary_key : list
             All possible primary keys in index
+        deduplication_window : int
+            Number of recent inserts remembered by the table
         """
         fields["id"] = "String"
         fields_string = ", ".join(["{} {}".format(name, type) for name, type in fields.items()])
         primary_key_string = ",".join(primary_key)
         create_sql = """
             CREATE TABLE IF NOT EXISTS {} ({}) ENGINE = ReplacingMergeTree() ORDER BY ({})
-        """.format(index, fields_string, primary_key_string)
+            SETTINGS non_replicated_deduplication_window = {}
+        """.format(index, fields_string, primary_key_string, deduplication_window)
         self.client.send_sql_request(create_sql)
+        self.client.send_sql_request("ALTER TABLE {} MODIFY SETTING non_replicated_deduplication_window = {}".format(
+            index, deduplication_window
+        ))
+
+    def _get_column_types(self, index):
+        """
+        Get types of existing columns of a table
+
+        Returns
+        -------
+        dict
+            Column names and attached types
+        """
+        return dict(self.client.fetch_all(
+            "SELECT name, type FROM system.columns WHERE database = currentDatabase() AND table = '{}'".format(index)
+        ))
+
+    def _migrate_columns(self, index, fields, migrations):
+        """
+        Convert columns of a table created by a previous version to types of schema
+
+        Converted values are written to a temporary column that replaces the old one,
+        so an interrupted migration is continued by the next run without converting values twice
+
+        Parameters
+        ----------
+        index : str
+            Name of index
+        fields : dict
+            Fields and their types
+        migrations : dict
+            Fields and attached tuples with old type and conversion of old values, see COLUMN_MIGRATIONS
+        """
+        column_types = self._get_column_types(index)
+        for column, (old_type, conversion) in migrations.items():
+            migrated_column = "{}_migrated".format(column)
+            if column_types.get(column) == old_type:
+                print("Migrating column {} of {}...".format(column, index))
+                self.client.send_sql_request("ALTER TABLE {} ADD COLUMN IF NOT EXISTS {} {}".format(
+                    index, migrated_column, fields[column]
+                ))
+                self.client.send_sql_request("ALTER TABLE {} UPDATE {} = {} WHERE 1 SETTINGS mutations_sync = 1".format(
+                    index, migrated_column, conversion.format(column)
+                ))
+                self.client.send_sql_request("ALTER TABLE {} DROP COLUMN {}".format(index, column))
+            elif (column in column_types) or (migrated_column not in column_types):
+                continue
+            self.client.send_sql_request("ALTER TABLE {} RENAME COLUMN {} TO {}".format(
+                index, migrated_column, column
+            ))
+
+    def _add_columns(self, index, fields):
+        """
+        Add columns of schema missing in a table created by a previous version
+
+        Parameters
+        ----------
+        index : str
+            Name of index
+        fields : dict
+            Fields and their types
+        """
+        column_types = self._get_column_types(index)
+        for column, column_type in fields.items():
+            nested_columns = [name for name in column_types if name.startswith(column + ".")]
+            if (column in column_types) or nested_columns:
+                continue
+            print("Adding column {} to {}...".format(column, index))
+            self.client.send_sql_request("ALTER TABLE {} ADD COLUMN IF NOT EXISTS {} {}".format(
+                index, column, column_type
+            ))
+
+    def _migrate_bytecode(self):
+        """
+        Move bytecode of created contracts saved by previous versions to bytecode table
+
+        Create traces with code and init columns are inserted again with hashes and selectors of bytecode,
+        newer records replace old ones by id. Old columns are removed after that,
+        so an interrupted migration is continued by the next run
+        """
+        from operations.internal_transactions import _extract_bytecode
+        index = self.indices["internal_transaction"]
+        column_types = self._get_column_types(index)
+        if "code" not in column_types:
+            return
+        print("Moving bytecode of {} to {}...".format(index, self.indices["bytecode"]))
+        fields = [column for column in column_types if column != "id"]
+        for transactions in self.client.iterate(
+            index=index,
+            fields=fields,
+            query="WHERE (code IS NOT NULL OR init IS NOT NULL) AND code_hash IS NULL AND init_hash IS NULL"
+        ):
+            docs = [dict(transaction.to_source(), id=transaction._id) for transaction in transactions]
+            bytecode = _extract_bytecode(docs)
+            self.client.bulk_index(index=self.indices["bytecode"], docs=bytecode)
+            self.client.bulk_index(index=index, docs=docs)
+        for column in BYTECODE_COLUMNS:
+            self.client.send_sql_request("ALTER TABLE {} DROP COLUMN IF EXISTS {}".format(index, column))
+
+    def _recreate_contract_view(self):
+        """
+        Recreate contract view created by a previous version
+
+        Contracts of previous versions are stored without selectors,
+        so the view and its target table are removed and created again from internal transactions
+        """
+        index = self.indices["contract"]
+        column_types = self._get_column_types(index)
+        if (not column_types) or ("selectors" in column_types):
+            return
+        from operations.contract_transactions import ClickhouseContractTransactions
+        print("Recreating {}...".format(index))
+        self.client.send_sql_request("DROP TABLE IF EXISTS {}_view".format(index))
+        self.client.send_sql_request("DROP TABLE IF EXISTS {}".format(index))
+        ClickhouseContractTransactions(self.indices).extract_contract_addresses()
 
     def prepare_indices(self):
         """
         Create all indices specified in schema/schema.py
 
+        Columns of existing tables are converted to current types, see COLUMN_MIGRATIONS,
+        missing columns are added. Bytecode saved in internal transactions by previous versions
+        is moved to bytecode table and contract view is recreated
+
         This function is an entry point for prepare-indices operation
         """
         for key, index in self.indices.items():
             if key in INDEX_FIELDS:
-                self._create_index(index, INDEX_FIELDS[key], PRIMARY_KEYS.get(key, ["id"]))
+                deduplication_window = INSERT_DEDUPLICATION_WINDOW if key in DEDUPLICATED_INDICES else 0
+                self._create_index(index, INDEX_FIELDS[key], PRIMARY_KEYS.get(key, ["id"]), deduplication_window)
+                self._migrate_columns(index, INDEX_FIELDS[key], COLUMN_MIGRATIONS.get(key, {}))
+                self._add_columns(index, INDEX_FIELDS[key])
+        if ("internal_transaction" in self.indices) and ("bytecode" in self.indices):
+            self._migrate_bytecode()
+        if "contract" in self.indices:
+            self._recreate_contract_view()
@@ -1,27 +1,113 @@
 import json
+from functools import lru_cache
 from ethereum.abi import (
     decode_abi,
     normalize_name as normalize_abi_method_name,
     method_id as get_abi_method_id)
 from ethereum.utils import encode_int, zpad, decode_hex
-from multiprocessing import Pool
-from config import PARITY_HOSTS, INDICES, INPUT_PARSING_PROCESSES
+from config import PARITY_HOSTS, INDICES, INPUT_PARSING_PROCESSES, EXECUTORS, DISPATCH_TABLES_CACHE_SIZE
 import utils
 from clients.custom_clickhouse import CustomClickhouse
+from clients.code_profiler import CODE_PROFILER
+from clients.executors import create_executor
+from clients.columns import ColumnBatch
+from clients.shared_columns import share_batch, receive_batch, release_batch
 
 NUMBER_OF_PROCESSES = INPUT_PARSING_PROCESSES
+INPUT_FIELDS = ["id", "name", "params.type", "params.value"]
 
+# Input of event restored from topics and data in the same format as a transaction input
+EVENT_INPUT_FIELD = """
+    concat(
+        substring(topics[1], 1, 10),
+        arrayStringConcat(arrayMap(topic -> substring(topic, 3), arraySlice(topics, 2))),
+        substring(data, 3)
+    ) AS input
+"""
 
-def _decode_input(contract_abi, call_data):
+
+def _compile_abi(contract_abi):
     """
-    Decode input data of a transaction according to a contract ABI
+    Compile contract ABI to a dispatch table
 
-    Solution from https://ethereum.stackexchange.com/questions/20897/how-to-decode-input-data-from-tx-using-python3?rq=1
+    Names, argument types and selectors of methods and events are computed once for a contract.
+    Events are found by the first 4 bytes of their topic, see EVENT_INPUT_FIELD
+
+    Parameters
+    ----------
+    contract_abi : list
+        List of contract methods specifications
+
+    Returns
+    -------
+    dict
+        4-byte selectors and attached lists of tuples with name and argument types
+        of each method with this selector, in order of ABI
+    """
+    dispatch_table = {}
+    for description in contract_abi:
+        if description.get('type') not in ['function', 'event']:
+            continue
+        method_name = normalize_abi_method_name(description['name'])
+        arg_types = [item['type'] for item in description['inputs']]
+        selector = zpad(encode_int(get_abi_method_id(method_name, arg_types)), 4)
+        dispatch_table.setdefault(selector, []).append((method_name, arg_types))
+    return dispatch_table
+
+
+@lru_cache(maxsize=DISPATCH_TABLES_CACHE_SIZE)
+def _compile_abi_json(address, abi_json):
+    """
+    Compile contract ABI in JSON format, see _compile_abi
+
+    Tables are cached in each worker by contract address and ABI text,
+    so ABI of a contract extracted again is compiled again instead of being taken from the cache.
+    Least recently used tables are removed from the cache
 
     Parameters
     ----------
+    address : str
+        Contract address
+    abi_json : str
+        Contract ABI in JSON format with sorted keys
+
+    Returns
+    -------
+    dict
+        Dispatch table of the contract
+    """
+    return _compile_abi(json.loads(abi_json))
+
+
+def _get_dispatch_table(address, contract_abi):
+    """
+    Get dispatch table of a contract compiled on first call, see _compile_abi_json
+
+    Parameters
+    ----------
+    address : str
+        Contract address
     contract_abi : list
         List of contract methods specifications
+
+    Returns
+    -------
+    dict
+        Dispatch table of the contract
+    """
+    return _compile_abi_json(address, json.dumps(contract_abi, sort_keys=True))
+
+
+def _decode_input(dispatch_table, call_data):
+    """
+    Decode input data of a transaction according to a compiled contract ABI
+
+    Solution from https://ethereum.stackexchange.com/questions/20897/how-to-decode-input-data-from-tx-using-python3?rq=1
+
+    Parameters
+    ----------
+    dispatch_table : dict
+        Contract ABI compiled with _compile_abi
     call_data : str
         Input of transaction in a form of 0x(4 bytes of method)(arguments),
         i.e. 0x12345678000000000000....
@@ -33,54 +119,83 @@ def _decode_input(contract_abi, call_data):
         None, if there is no such method in ABI, or there was a problem with method arguments
     """
     call_data_bin = decode_hex(call_data)
-    method_signature = call_data_bin[:4]
-    for description in contract_abi:
-        if description.get('type') not in ['function', 'event']:
+    for method_name, arg_types in dispatch_table.get(call_data_bin[:4], []):
+        try:
+            args = decode_abi(arg_types, call_data_bin[4:])
+        except AssertionError:
             continue
-        method_name = normalize_abi_method_name(description['name'])
-        arg_types = [item['type'] for item in description['inputs']]
-        method_id = get_abi_method_id(method_name, arg_types)
-        if zpad(encode_int(method_id), 4) == method_signature:
-            try:
-                args = decode_abi(arg_types, call_data_bin[4:])
-                args = [{'type': arg_types[index], 'value': str(value)} for index, value in enumerate(args)]
-            except AssertionError:
-                continue
-            return {
-                'name': method_name,
-                'params.type': [arg["type"] for arg in args],
-                'params.value': [arg["value"] for arg in args]
-            }
-
-
-def _decode_inputs_batch_sync(encoded_params):
+        return {
+            'name': method_name,
+            'params.type': arg_types,
+            'params.value': [str(value) for value in args]
+        }
+
+
+def _decode_inputs_batch_sync(encoded_params, contracts_abi):
     """
     Decode inputs for transactions inputs batch
 
     Parameters
     ----------
     encoded_params : dict
-        Transaction hashes and attached tuples with contract ABI and transaction input
+        Transaction hashes and attached tuples with contract address and transaction input
+    contracts_abi : dict
+        Contract addresses and attached ABI of contracts used in the batch
 
     Returns
     -------
     dict
-        Contract addresses and attached lists of parsed parameters
+        Transaction hashes and parsed inputs for each transaction
     """
+    dispatch_tables = {
+        address: _get_dispatch_table(address, contract_abi)
+        for address, contract_abi in contracts_abi.items()
+    }
     return {
-        hash: _decode_input(contract_abi, call_data)
-        for hash, (contract_abi, call_data) in encoded_params.items()
+        hash: _decode_input(dispatch_tables[address], call_data)
+        for hash, (address, call_data) in encoded_params.items()
     }
 
 
+def _decode_inputs_to_columns(encoded_params, contracts_abi, shared=False):
+    """
+    Decode inputs batch to columns of input index
+
+    Inputs that can't be decoded are skipped
+
+    Parameters
+    ----------
+    encoded_params : dict
+        Transaction hashes and attached tuples with contract address and transaction input
+    contracts_abi : dict
+        Contract addresses and attached ABI of contracts used in the batch
+    shared : bool
+        Place batch in shared memory, used when the batch is returned from a worker process, see share_batch
+
+    Returns
+    -------
+    ColumnBatch
+        Decoded inputs with transaction hashes as ids
+    """
+    decoded_inputs = [
+        dict(decoded_input, id=hash)
+        for hash, decoded_input in _decode_inputs_batch_sync(encoded_params, contracts_abi).items()
+        if decoded_input
+    ]
+    batch = ColumnBatch.from_docs(decoded_inputs, INPUT_FIELDS)
+    if shared:
+        return share_batch(batch)
+    return batch
+
+
 class ClickhouseInputs(utils.ClickhouseContractTransactionsIterator):
     _contracts_abi = {}
     block_prefix = "inputs_decoded"
 
-    def __init__(self, indices=INDICES, parity_hosts=PARITY_HOSTS):
+    def __init__(self, indices=INDICES, parity_hosts=PARITY_HOSTS, client=None):
         self.indices = indices
-        self.client = CustomClickhouse()
-        self.pool = Pool(processes=NUMBER_OF_PROCESSES)
+        self.client = client if client is not None else CustomClickhouse()
+        self.executor = create_executor(EXECUTORS["inputs"], NUMBER_OF_PROCESSES)
         self.parity_hosts = parity_hosts
 
     def _set_contracts_abi(self, abis):
@@ -96,6 +211,22 @@ class ClickhouseInputs(utils.ClickhouseContractTransactionsIterator):
         """
         return utils.split_on_chunks(iterable, size)
 
+    def _get_chunk_abi(self, chunk):
+        """
+        Get ABI of contracts used in a chunk of inputs, so each ABI is sent to a worker once per chunk
+
+        Parameters
+        ----------
+        chunk : list
+            List of tuples with transaction hash and tuple with contract address and transaction input
+
+        Returns
+        -------
+        dict
+            Contract addresses and attached ABI
+        """
+        return {address: self._contracts_abi[address] for _, (address, _) in chunk}
+
     def _decode_inputs_batch(self, encoded_params):
         """
         Decode inputs in parallel mode
@@ -103,17 +234,20 @@ class ClickhouseInputs(utils.ClickhouseContractTransactionsIterator):
         Parameters
         ----------
         encoded_params : dict
-            Transaction hashes and attached tuples with contract ABI and transaction input
+            Transaction hashes and attached tuples with contract address and transaction input
 
         Returns
         -------
-        dict
-            Transaction hashes and parsed inputs for each transaction
+        ColumnBatch
+            Parsed inputs with transaction hashes as ids, see _decode_inputs_to_columns
         """
         chunks = list(self._split_on_chunks(list(encoded_params.items()), NUMBER_OF_PROCESSES))
-        chunks = [dict(chunk) for chunk in chunks]
-        decoded_inputs = self.pool.map(_decode_inputs_batch_sync, chunks)
-        return {hash: input for chunk in decoded_inputs for hash, input in chunk.items()}
+        arguments = [
+            (dict(chunk), self._get_chunk_abi(chunk), self.executor.isolated)
+            for chunk in chunks
+        ]
+        batches = self.executor.starmap(_decode_inputs_to_columns, arguments, release=release_batch)
+        return ColumnBatch.concat([receive_batch(batch) for batch in batches])
 
     def _get_range_query(self):
         """
@@ -150,20 +284,7 @@ class ClickhouseInputs(utils.ClickhouseContractTransactionsIterator):
         )
         return self._iterate_contracts(max_block, query, fields=["abi", "address"])
 
-    def _add_id_to_inputs(self, decoded_inputs):
-        """
-        Add transaction hash as id to decoded_inputs
-
-        Parameters
-        ----------
-        decoded_inputs : dict
-            Dictionary with transaction hashes and input info dicts
-        """
-        for hash, input in decoded_inputs.items():
-            input.update({
-                "id": hash
-            })
-
+    @CODE_PROFILER.profile_chunk
     def _decode_inputs_for_contracts(self, contracts, max_block):
         """
         Decode inputs for specified contracts before specified block
@@ -181,15 +302,11 @@ class ClickhouseInputs(utils.ClickhouseContractTransactionsIterator):
         for transactions in self._iterate_transactions_by_targets(contracts, max_block):
             try:
                 inputs = {
-                    transaction["_id"]: (
-                        self._contracts_abi[transaction["_source"][self.contract_field]],
-                        transaction["_source"]["input"]
-                    )
+                    transaction._id: (getattr(transaction, self.contract_field), transaction.input)
                     for transaction in transactions
                 }
                 decoded_inputs = self._decode_inputs_batch(inputs)
-                self._add_id_to_inputs(decoded_inputs)
-                self.client.bulk_index(index=self.indices[self.input_index], docs=list(decoded_inputs.values()))
+                self.client.bulk_index(index=self.indices[self.input_index], docs=decoded_inputs)
             except Exception as exception:
                 print(exception)
 
@@ -200,11 +317,11 @@ class ClickhouseInputs(utils.ClickhouseContractTransactionsIterator):
         This function is an entry point for parse-*-inputs operation
         """
         max_block = self._get_max_block({self.block_flag_name: 1})
-        for contracts in self._iterate_contracts_with_abi(max_block):
-            self._set_contracts_abi(
-                {contract["_source"]["address"]: contract["_source"]["abi"] for contract in contracts})
-            self._decode_inputs_for_contracts(contracts, max_block)
-            self._save_max_block([contract["_id"] for contract in contracts], max_block)
+        with self.executor:
+            for contracts in self._iterate_contracts_with_abi(max_block):
+                self._set_contracts_abi({contract.address: contract.abi for contract in contracts})
+                self._decode_inputs_for_contracts(contracts, max_block)
+                self._save_max_block([contract._id for contract in contracts], max_block)
 
 
 class ClickhouseTransactionsInputs(ClickhouseInputs):
@@ -231,12 +348,8 @@ class ClickhouseEventsInputs(ClickhouseInputs):
         """
         Iterate through all events with an id
 
-        Converts it to a supported format for _decode_input method
+        Input field is restored from topics and data on database side
+        in a supported format for _decode_input method
         """
-        for transactions in self._iterate_transactions(contracts, max_block, "WHERE id IS NOT NULL",
-                                                       fields=["topics", "data", "address"]):
-            for transaction in transactions:
-                transaction = transaction["_source"]
-                transaction["input"] = transaction["topics"][0][0:10] + "".join(
-                    [topic[2:] for topic in transaction["topics"][1:]]) + transaction["data"][2:]
-            yield transactions
+        return self._iterate_transactions(contracts, max_block, "WHERE id IS NOT NULL",
+                                          fields=[EVENT_INPUT_FIELD, "address"])
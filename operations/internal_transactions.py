@@ -1,15 +1,32 @@
 import requests
 import json
-from multiprocessing import Pool
+import hashlib
+from time import time
+from decimal import Decimal
 from itertools import repeat
-from config import PARITY_HOSTS, GENESIS, INDICES, PARITY_EXTRACTION_PROCESSES
+from collections import OrderedDict
+from config import PARITY_HOSTS, GENESIS, INDICES, PARITY_EXTRACTION_PROCESSES, NUMBER_OF_JOBS, EXECUTORS
 from clients.custom_clickhouse import CustomClickhouse
-import pygtrie as trie
+from operations.block_ranges import ClickhouseBlockRanges
+from clients.metrics import METRICS, record_rpc_request
+from clients.code_profiler import CODE_PROFILER
+from clients.executors import create_executor, open_worker_clients, get_worker_client
+from clients.columns import ColumnBatch
+from clients.shared_columns import share_batch, receive_batch, release_batch
+from schema.schema import SCHEMA
 import utils
-from pyelasticsearch import bulk_chunks
 import pdb
 
-BYTES_PER_CHUNK = 1000000
+NUMERIC_FIELDS = ["value", "gas", "gasPrice", "gasUsed", "balance"]
+BYTECODE_FIELDS = {"code": "code_hash", "init": "init_hash"}
+PUSH1 = 0x60
+PUSH32 = 0x7f
+# Selectors with a leading zero byte are pushed with PUSH3 by the compiler
+SELECTOR_PUSH_SIZES = [3, 4]
+SELECTOR_SIZE = 4
+TRACE_FIELDS = ["hash"] + list(SCHEMA["internal_transaction"].keys())
+BYTECODE_COLUMNS = ["id"] + list(SCHEMA["bytecode"].keys())
+WEI_IN_ETHER = 10 ** 18
 NUMBER_OF_PROCESSES = PARITY_EXTRACTION_PROCESSES
 
 INPUT_TRANSACTION = 0
@@ -18,6 +35,7 @@ OUTPUT_TRANSACTION = 2
 OTHER_TRANSACTION = 3
 
 MAX_BLOCKS_NUMBER = 10000000
+NUMBER_OF_BLOCKS_PER_CHUNK = NUMBER_OF_JOBS
 
 
 def _get_parity_url_by_block(parity_hosts, block):
@@ -151,11 +169,15 @@ def _send_jsonrpc_request(parity_url, request, getter):
         Responses with errors will be skipped
     """
     request_string = json.dumps(request)
-    responses = requests.post(
+    start = time()
+    raw_response = get_worker_client("parity", requests.Session).post(
         parity_url,
         data=request_string,
         headers={"content-type": "application/json"}
-    ).json()
+    )
+    method = request[0]["method"] if request else None
+    record_rpc_request(method, parity_url, time() - start, len(request_string), len(raw_response.content))
+    responses = raw_response.json()
     full_response = []
     assert type(responses) == list
     for response in responses:
@@ -203,11 +225,265 @@ def _get_traces_sync(parity_hosts, blocks):
     return traces
 
 
+def _set_trace_hashes(trace):
+    """
+    Set hash for each transaction in trace based on Ethereum transaction hash
+    and position in trace for this transaction
+
+    Parameters
+    ----------
+    trace : list
+        List of transactions
+    """
+    traces_size = {}
+    for transaction in trace:
+        transaction_hash = transaction["transactionHash"] or transaction["blockHash"]
+        if transaction_hash not in traces_size.keys():
+            traces_size[transaction_hash] = 0
+        transaction["hash"] = "{}.{}".format(transaction_hash, traces_size[transaction_hash])
+        traces_size[transaction_hash] += 1
+
+
+def _set_parent_errors(trace):
+    """
+    Set parent_error flag for all transactions in branches finished with error in trace
+
+    Traces of each transaction are expected in depth-first order as returned by parity,
+    so errors of ancestors are kept in a stack while the trace is passed once
+
+    Parameters
+    ----------
+    trace : list
+        List of transactions
+    """
+    current_hash = None
+    errors = []
+    for transaction in trace:
+        address = transaction["traceAddress"]
+        if transaction["transactionHash"] != current_hash:
+            current_hash = transaction["transactionHash"]
+            errors = []
+        while errors and (address[:len(errors[-1])] != errors[-1]):
+            errors.pop()
+        if "error" in transaction:
+            errors.append(address)
+        elif errors:
+            transaction["parent_error"] = True
+
+
+def _preprocess_internal_transaction(transaction):
+    """
+    Preprocess specified transaction
+
+    Flattens array fields. Numeric fields are converted for a whole chunk, see _unhex_fields
+
+    Parameters
+    ----------
+    transaction : dict
+        Transactions to process
+
+    Returns
+    -------
+    dict
+        Processed transaction
+    """
+    transaction = transaction.copy()
+    for field in ["action", "result"]:
+        if (field in transaction.keys()) and (transaction[field]):
+            transaction.update(transaction[field])
+            del transaction[field]
+    return transaction
+
+
+def _unhex_fields(transactions, fields):
+    """
+    Convert hex numeric fields of transactions to exact integers, i.e. values in Wei
+
+    Conversion is done column by column for a whole chunk. Repeated values, like gas prices
+    of all calls in a transaction or zero values, are parsed only once
+
+    Parameters
+    ----------
+    transactions : list
+        List of transactions, modified in place
+    fields : list
+        Names of numeric fields
+    """
+    for field in fields:
+        column = [transaction.get(field) for transaction in transactions]
+        parsed_values = {
+            value: int(value[2:] or "0", 16)
+            for value in set(column)
+            if isinstance(value, str) and value
+        }
+        for transaction, value in zip(transactions, column):
+            if value in parsed_values:
+                transaction[field] = parsed_values[value]
+
+
+def _get_bytecode_hash(bytecode):
+    """
+    Get content hash of bytecode used as its id in bytecode table
+
+    Returns
+    -------
+    str
+        SHA-256 of bytecode in hex format
+    """
+    return "0x" + hashlib.sha256(bytecode.encode("ascii")).hexdigest()
+
+
+def _get_selectors(bytecode):
+    """
+    Get method selectors used in dispatcher of a contract
+
+    Runtime bytecode is walked instruction by instruction, so arguments of other PUSH instructions
+    are not mistaken for selectors. Values of PUSH4 (and PUSH3 for selectors with a leading zero byte)
+    are collected
+
+    Parameters
+    ----------
+    bytecode : str
+        Runtime bytecode in hex format
+
+    Returns
+    -------
+    list
+        Unique 4-byte values in order of appearance
+    """
+    if bytecode.startswith("0x"):
+        bytecode = bytecode[2:]
+    try:
+        code = bytes.fromhex(bytecode)
+    except ValueError:
+        return []
+    selectors = []
+    position = 0
+    while position < len(code):
+        opcode = code[position]
+        position += 1
+        if PUSH1 <= opcode <= PUSH32:
+            size = opcode - PUSH1 + 1
+            value = code[position:position + size]
+            if (size in SELECTOR_PUSH_SIZES) and (len(value) == size):
+                selectors.append(value.rjust(SELECTOR_SIZE, b"\x00"))
+            position += size
+    return list(OrderedDict.fromkeys(selectors))
+
+
+def _extract_bytecode(transactions):
+    """
+    Replace bytecode of created contracts with its hash
+
+    Code and init fields are replaced with code_hash and init_hash,
+    each unique bytecode is returned once to be saved to bytecode table.
+    Selectors of runtime code are parsed once for each unique code, see _get_selectors
+
+    Parameters
+    ----------
+    transactions : list
+        List of transactions, modified in place
+
+    Returns
+    -------
+    list
+        Unique bytecode records with hashes as ids
+    """
+    bytecode = {}
+    selectors = {}
+    for transaction in transactions:
+        for field, hash_field in BYTECODE_FIELDS.items():
+            value = transaction.pop(field, None)
+            if value is not None:
+                transaction[hash_field] = _get_bytecode_hash(value)
+                bytecode[transaction[hash_field]] = value
+        code_hash = transaction.get("code_hash")
+        if code_hash is None:
+            transaction["selectors"] = []
+            continue
+        if code_hash not in selectors:
+            selectors[code_hash] = _get_selectors(bytecode[code_hash])
+        transaction["selectors"] = selectors[code_hash]
+    return [{"id": hash, "code": value} for hash, value in bytecode.items()]
+
+
+def _transform_traces(trace):
+    """
+    Prepare traces of blocks for insert
+
+    Sets hashes and parent errors, flattens and converts fields of each transaction,
+    moves bytecode of created contracts to a separate batch,
+    then splits transactions onto internal ones and rewards
+
+    Parameters
+    ----------
+    trace : list
+        List of transactions of whole blocks as returned by parity
+
+    Returns
+    -------
+    tuple
+        Column batches with internal transactions, with transactions
+        that are not attached to any ethereum transaction and with unique bytecode
+    """
+    _set_trace_hashes(trace)
+    _set_parent_errors(trace)
+    docs = [_preprocess_internal_transaction(transaction) for transaction in trace]
+    _unhex_fields(docs, NUMERIC_FIELDS)
+    bytecode = _extract_bytecode(docs)
+    internal_transactions = [transaction for transaction in docs if transaction["transactionHash"]]
+    miner_transactions = [transaction for transaction in docs if not transaction["transactionHash"]]
+    return (
+        ColumnBatch.from_docs(internal_transactions, TRACE_FIELDS),
+        ColumnBatch.from_docs(miner_transactions, TRACE_FIELDS),
+        ColumnBatch.from_docs(bytecode, BYTECODE_COLUMNS)
+    )
+
+
+def _get_transformed_traces_sync(parity_hosts, blocks):
+    """
+    Get traces for specified blocks prepared for insert, see _transform_traces
+    """
+    return _transform_traces(_get_traces_sync(parity_hosts, blocks))
+
+
+def _get_transformed_traces_with_metrics(parity_hosts, blocks):
+    """
+    Get traces for specified blocks prepared for insert in a worker process together with metrics of requests
+
+    Parameters
+    ----------
+    parity_hosts : list
+        List of tuples with each parity JSON RPC url and used block range
+    blocks : list
+        Block numbers
+    Returns
+    -------
+    tuple
+        Column batches placed in shared memory, see _transform_traces and share_batch,
+        and metrics collected by this call, see Metrics.get_state
+    """
+    METRICS.reset()
+    batches = _get_transformed_traces_sync(parity_hosts, blocks)
+    return tuple(share_batch(batch) for batch in batches), METRICS.get_state()
+
+
+def _release_transformed_traces(result):
+    """
+    Remove shared memory of traces returned by _get_transformed_traces_with_metrics, see release_batch
+    """
+    batches, _ = result
+    for batch in batches:
+        release_batch(batch)
+
+
 class InternalTransactions:
     def __init__(self, indices, client, parity_hosts):
         self.indices = indices
         self.client = client
-        self.pool = Pool(processes=NUMBER_OF_PROCESSES)
+        self.executor = create_executor(
+            EXECUTORS["traces"], NUMBER_OF_PROCESSES, open_worker_clients, ({"parity": requests.Session},)
+        )
         self.parity_hosts = parity_hosts
 
     def _split_on_chunks(self, iterable, size):
@@ -218,126 +494,83 @@ class InternalTransactions:
         """
         Get traces for specified blocks in parallel mode
 
+        Traces are transformed in workers, see _transform_traces
+
         Parameters
         ----------
         blocks : list
             Block numbers
         Returns
         -------
-        list
-            List of transactions inside of specified blocks
+        tuple
+            Column batches with internal transactions, rewards and unique bytecode inside of specified blocks
         """
         chunks = self._split_on_chunks(blocks, NUMBER_OF_PROCESSES)
         arguments = list(zip(repeat(self.parity_hosts), chunks))
-        traces = self.pool.starmap(_get_traces_sync, arguments)
-        return [transaction for trace in traces for transaction in trace]
-
-    def _set_trace_hashes(self, trace):
+        if self.executor.isolated:
+            results = self.executor.starmap(_get_transformed_traces_with_metrics, arguments,
+                                            release=_release_transformed_traces)
+            for _, metrics_state in results:
+                METRICS.merge(metrics_state)
+            results = [[receive_batch(batch) for batch in batches] for batches, _ in results]
+        else:
+            results = self.executor.starmap(_get_transformed_traces_sync, arguments)
+        internal_transactions = ColumnBatch.concat([internal_batch for internal_batch, _, _ in results])
+        miner_transactions = ColumnBatch.concat([miner_batch for _, miner_batch, _ in results])
+        bytecode = ColumnBatch.concat([bytecode_batch for _, _, bytecode_batch in results])
+        return internal_transactions, miner_transactions, bytecode
+
+    def _save_internal_transactions(self, internal_transactions, deduplication_token=None):
         """
-        Set hash for each transaction in trace based on Ethereum transaction hash
-        and position in trace for this transaction
+        Save transactions attached to an ethereum transaction to the database
 
         Parameters
         ----------
-        trace : list
-            List of transactions
+        internal_transactions : ColumnBatch
+            Transactions to save
+        deduplication_token : str
+            Token of processed blocks chunk, repeated saves of the same chunk are ignored
         """
-        traces_size = {}
-        for transaction in trace:
-            transaction_hash = transaction["transactionHash"] or transaction["blockHash"]
-            if transaction_hash not in traces_size.keys():
-                traces_size[transaction_hash] = 0
-            transaction["hash"] = "{}.{}".format(transaction_hash, traces_size[transaction_hash])
-            traces_size[transaction_hash] += 1
-
-    def _set_parent_errors(self, trace):
-        """
-        Set parent_error flag for all transactions in branches finished with error in trace
+        if deduplication_token:
+            deduplication_token = "{}:internal".format(deduplication_token)
+        self.client.bulk_index_async(docs=internal_transactions, index=self.indices["internal_transaction"],
+                                     doc_type="itx", id_field="hash", refresh=True,
+                                     deduplication_token=deduplication_token)
 
-        Parameters
-        ----------
-        trace : list
-            List of transactions
+    def _save_miner_transactions(self, miner_transactions, deduplication_token=None):
         """
-        errors = {}
-        for transaction in trace:
-            if "error" in transaction.keys():
-                if transaction["transactionHash"] not in errors.keys():
-                    errors[transaction["transactionHash"]] = trie.Trie()
-                errors[transaction["transactionHash"]][transaction["traceAddress"]] = True
-        for transaction in trace:
-            if transaction["transactionHash"] in errors.keys():
-                prefix_exists = bool(
-                    errors[transaction["transactionHash"]].shortest_prefix(transaction["traceAddress"]))
-                is_node = errors[transaction["transactionHash"]].has_key(transaction["traceAddress"])
-                if prefix_exists and not is_node:
-                    transaction["parent_error"] = True
-
-    def _preprocess_internal_transaction(self, transaction):
-        """
-        Preprocess specified transaction
-
-        Flattens array fields, unhexes numeric fields
+        Save transactions which are not attached to any ethereum transaction to the database
 
         Parameters
         ----------
-        transaction : dict
-            Transactions to process
-
-        Returns
-        -------
-        dict
-            Processed transaction
-        """
-        transaction = transaction.copy()
-        for field in ["action", "result"]:
-            if (field in transaction.keys()) and (transaction[field]):
-                transaction.update(transaction[field])
-                del transaction[field]
-        for field in ["value", "gasPrice", "gasUsed"]:
-            if (field in transaction.keys()) and (transaction[field]):
-                value_string = transaction[field][0:2] + "0" + transaction[field][2:]
-                transaction[field] = int(value_string, 0) / 1e18
-        if "gasUsed" in transaction:
-            transaction["gasUsed"] = int(transaction["gasUsed"] * 1e18)
-        return transaction
-
-    def _save_internal_transactions(self, blocks_traces):
+        miner_transactions : ColumnBatch
+            Transactions to save
+        deduplication_token : str
+            Token of processed blocks chunk, repeated saves of the same chunk are ignored
         """
-        Save specified transactions to the database in multiple chunks
-
-        Save only those which are attached to an ethereum transaction
+        if deduplication_token:
+            deduplication_token = "{}:miner".format(deduplication_token)
+        self.client.bulk_index_async(docs=miner_transactions, index=self.indices["miner_transaction"],
+                                     doc_type="tx", id_field="hash", refresh=True,
+                                     deduplication_token=deduplication_token)
 
-        Parameters
-        ----------
-        blocks_traces : list
-            List of transactions to save
+    def _save_bytecode(self, bytecode, deduplication_token=None):
         """
-        docs = [
-            self._preprocess_internal_transaction(transaction)
-            for transaction in blocks_traces
-            if transaction["transactionHash"]
-        ]
-        if docs:
-            for chunk in bulk_chunks(docs, None, BYTES_PER_CHUNK):
-                self.client.bulk_index(docs=chunk, index=self.indices["internal_transaction"], doc_type="itx",
-                                       id_field="hash", refresh=True)
-
-    def _save_miner_transactions(self, blocks_traces):
-        """
-        Save transactions to ElasticSearch.
+        Save bytecode of created contracts to the database
 
-        Save only those which are not attached to any ethereum transaction
+        Repeated bytecode is merged by its hash
 
         Parameters
         ----------
-        blocks_traces : list
-            List of transactions to save
+        bytecode : ColumnBatch
+            Unique bytecode with hashes as ids
+        deduplication_token : str
+            Token of processed blocks chunk, repeated saves of the same chunk are ignored
         """
-        docs = [self._preprocess_internal_transaction(transaction) for transaction in blocks_traces if
-                not transaction["transactionHash"]]
-        self.client.bulk_index(docs=docs, index=self.indices["miner_transaction"], doc_type="tx", id_field="hash",
-                               refresh=True)
+        if deduplication_token:
+            deduplication_token = "{}:bytecode".format(deduplication_token)
+        self.client.bulk_index_async(docs=bytecode, index=self.indices["bytecode"], doc_type="code", refresh=True,
+                                     deduplication_token=deduplication_token)
 
     def _save_genesis_block(self, genesis_file=GENESIS):
         """
@@ -357,15 +590,19 @@ class InternalTransactions:
             }
         """
         genesis = json.load(open(genesis_file))
+        for transaction in genesis:
+            transaction["value"] = int(Decimal(str(transaction["value"])) * WEI_IN_ETHER)
         self.client.bulk_index(docs=genesis, index=self.indices["internal_transaction"], doc_type="itx",
                                id_field="hash", refresh=True)
 
+    @CODE_PROFILER.profile_chunk
     def _extract_traces_chunk(self, blocks):
         """
         Extract transactions from specified block numbers list
 
-        Add trace hashes for each one, parent_error field
-        Saves transactions as internal or miner (without ethereum transaction hash)
+        Traces are prepared for insert in workers, see _transform_traces
+        Saves bytecode of created contracts,
+        then saves transactions as internal or miner (without ethereum transaction hash)
         Then saves a flag for processed blocks to ElasticSearch
 
         Parameters
@@ -375,57 +612,59 @@ class InternalTransactions:
         """
         if 0 in blocks:
             self._save_genesis_block()
-        blocks_traces = self._get_traces(blocks)
-        self._set_trace_hashes(blocks_traces)
-        self._set_parent_errors(blocks_traces)
-        self._save_internal_transactions(blocks_traces)
-        self._save_miner_transactions(blocks_traces)
+        deduplication_token = "traces_extracted:{}-{}".format(blocks[0], blocks[-1])
+        internal_transactions, miner_transactions, bytecode = self._get_traces(blocks)
+        self._save_bytecode(bytecode, deduplication_token=deduplication_token)
+        self._save_internal_transactions(internal_transactions, deduplication_token=deduplication_token)
+        self._save_miner_transactions(miner_transactions, deduplication_token=deduplication_token)
         self._save_traces(blocks)
 
     def extract_traces(self):
         """
         Extract traces to elasticsearch for all unprocessed blocks
 
+        Records are written in background while next chunk is extracted
+
         This function is an entry point for extract-traces operation
         """
-        for blocks in self._iterate_blocks():
-            blocks = [block["_source"]["number"] for block in blocks]
-            self._extract_traces_chunk(blocks)
+        with self.executor:
+            for blocks in self._iterate_blocks():
+                self._extract_traces_chunk(blocks)
+        self.client.flush()
 
 
 class ClickhouseInternalTransactions(InternalTransactions):
     def __init__(self, indices=INDICES, parity_hosts=PARITY_HOSTS):
         super().__init__(indices, CustomClickhouse(), parity_hosts)
         self.indices["miner_transaction"] = self.indices["internal_transaction"]
+        self.block_ranges = ClickhouseBlockRanges("traces_extracted", self.client, self.indices)
 
     def _iterate_blocks(self):
         """
         Iterate through unprocessed blocks
 
+        Blocks are taken from gaps between processed ranges
+        within block ranges of parity hosts and extracted blocks
+
         Returns
         -------
         generator
-            Generator that returns next chunk of unprocessed blocks
+            Generator that returns next chunk of unprocessed block numbers
         """
-        ranges = [host_tuple[0:2] for host_tuple in self.parity_hosts]
-        flags_sql = "SELECT id, value FROM {} FINAL WHERE name = 'traces_extracted'".format(self.indices["block_flag"])
-        return self.client.iterate(
-            index=self.indices["block"],
-            fields=["number"],
-            query="ANY LEFT JOIN ({}) USING id WHERE value IS NULL AND {}".format(
-                flags_sql,
-                utils.make_range_query('number', *ranges)
-            ),
-        )
+        for start, end, _ in self.parity_hosts:
+            for gap_start, gap_end in self.block_ranges.get_unprocessed_extracted(start or 0, end):
+                for chunk_start in range(gap_start, gap_end, NUMBER_OF_BLOCKS_PER_CHUNK):
+                    yield list(range(chunk_start, min(chunk_start + NUMBER_OF_BLOCKS_PER_CHUNK, gap_end)))
 
     def _save_traces(self, blocks):
         """
-        Save traces_extracted flag for specified block to a database
+        Mark specified blocks as processed by traces extraction
+
+        Ranges are written only after all previously queued transactions
 
         Parameters
         ----------
         blocks :
             List of blocks numbers
         """
-        docs = [{"id": block, "name": "traces_extracted", "value": True} for block in blocks]
-        self.client.bulk_index(index=self.indices["block_flag"], docs=docs)
+        self.block_ranges.add_blocks(blocks)
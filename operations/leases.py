@@ -0,0 +1,221 @@
+import os
+import random
+import socket
+import uuid
+from threading import Thread, Event
+from time import time, sleep
+from config import INDICES, LEASE_RANGE_SIZE, LEASE_TIMEOUT, LEASE_HEARTBEAT_INTERVAL, LEASE_CLAIM_DELAY
+from operations.pipeline import Pipeline
+from operations.block_ranges import get_gaps
+
+LEASE_CANDIDATES_NUMBER = 10
+
+
+def create_owner_name():
+    """
+    Create unique name of worker process
+
+    Returns
+    -------
+    str
+        Name in a form of HOST:PID:RANDOM_SUFFIX
+    """
+    return "{}:{}:{}".format(socket.gethostname(), os.getpid(), uuid.uuid4().hex[:8])
+
+
+class ClickhouseBlockLeases:
+    """
+    Coordinate workers processing the same stages with block range leases
+
+    Lease events (claims, heartbeats and completions) are appended to block_lease table.
+    A range belongs to the worker with the earliest claim among claims that are not expired,
+    so all workers agree on the owner once they see the same claims
+
+    Parameters
+    ----------
+    name : str
+        Name of leased work, i.e. "traces,events"
+    client : CustomClickhouse
+        Database client
+    owner : str
+        Name of current worker
+    indices : dict
+        Dictionary of table names
+    timeout : float
+        Seconds before a lease without heartbeats expires
+    """
+    def __init__(self, name, client, owner, indices=INDICES, timeout=LEASE_TIMEOUT):
+        self.name = name
+        self.client = client
+        self.owner = owner
+        self.indices = indices
+        self.timeout = timeout
+        self.claims = {}
+
+    def _save_event(self, start, end, claimed, expires, done=0):
+        self.client.bulk_index(index=self.indices["block_lease"], docs=[{
+            "id": uuid.uuid4().hex,
+            "name": self.name,
+            "start_block": start,
+            "end_block": end,
+            "owner": self.owner,
+            "claimed": claimed,
+            "expires": expires,
+            "done": done
+        }])
+
+    def get_state(self):
+        """
+        Get current state of leases
+
+        Each claim is a separate lease, heartbeats and completion of a claim keep its claim time.
+        A range is done up to the end of its completed lease, so the tail range completed
+        before the last parity block moved on is processed again up to the new end
+
+        Returns
+        -------
+        dict
+            Start blocks of leased ranges and tuples with the end of completed lease and current owner.
+            End is 0 if the range was not completed, owner is None if there are no active claims
+        """
+        rows = self.client.fetch_all("""
+            SELECT start_block, owner, claimed, max(expires), maxIf(end_block, done = 1)
+            FROM {}
+            WHERE name = '{}'
+            GROUP BY start_block, owner, claimed
+        """.format(self.indices["block_lease"], self.name))
+        now = time()
+        claims = {}
+        done = {}
+        for start, owner, claimed, expires, done_end in rows:
+            if done_end:
+                done[start] = max(done.get(start, 0), done_end)
+            elif expires > now:
+                claims.setdefault(start, []).append((claimed, owner))
+        return {
+            start: (done.get(start, 0), min(claims[start])[1] if start in claims else None)
+            for start in set(claims.keys()) | set(done.keys())
+        }
+
+    def claim(self, start, end):
+        """
+        Try to get a lease for block range
+
+        Claim is saved, then the owner is checked after a delay to see claims of other workers
+
+        Returns
+        -------
+        bool
+            True if current worker owns the range
+        """
+        claimed = time()
+        self._save_event(start, end, claimed, claimed + self.timeout)
+        sleep(LEASE_CLAIM_DELAY)
+        done_end, owner = self.get_state().get(start, (0, None))
+        if owner == self.owner and done_end < end:
+            self.claims[start] = claimed
+            return True
+        return False
+
+    def heartbeat(self, start, end):
+        """
+        Extend lease of a claimed range
+        """
+        claimed = self.claims[start]
+        self._save_event(start, end, claimed, time() + self.timeout)
+
+    def done(self, start, end):
+        """
+        Mark claimed range as processed
+        """
+        claimed = self.claims.pop(start)
+        self._save_event(start, end, claimed, time(), done=1)
+
+
+class Worker:
+    """
+    Process block ranges claimed with leases by pipeline stages
+
+    Any number of workers on different hosts can work on the same stages,
+    each range of blocks is processed by one worker at a time.
+    Ranges of workers that stopped sending heartbeats are claimed again after lease timeout
+
+    Parameters
+    ----------
+    stages : list
+        Stage objects in the order of processing
+    leases : ClickhouseBlockLeases
+        Lease store for these stages
+    get_head : function
+        Function without arguments that returns number of the last block in parity
+    range_size : int
+        Number of blocks in each lease
+    """
+    def __init__(self, stages, leases, get_head, range_size=LEASE_RANGE_SIZE,
+                 heartbeat_interval=LEASE_HEARTBEAT_INTERVAL):
+        self.stages = stages
+        self.leases = leases
+        self.get_head = get_head
+        self.range_size = range_size
+        self.heartbeat_interval = heartbeat_interval
+
+    def _get_candidates(self, end):
+        """
+        Get ranges that are not processed, not done up to their end and not leased by active workers
+
+        Returns
+        -------
+        list
+            List of tuples with start and end of each range
+        """
+        for stage in self.stages:
+            stage.prepare(0, end)
+        state = self.leases.get_state()
+        candidates = []
+        for start in range(0, end, self.range_size):
+            range_end = min(start + self.range_size, end)
+            done_end, owner = state.get(start, (0, None))
+            if (done_end >= range_end) or (owner is not None) or self._is_processed(start, range_end):
+                continue
+            candidates.append((start, range_end))
+        return candidates
+
+    def _is_processed(self, start, end):
+        """
+        Check if all stages processed given range before
+        """
+        return all(get_gaps(stage.unprocessed, start, end) == [(start, end)] for stage in self.stages)
+
+    def _send_heartbeats(self, start, end, stop):
+        while not stop.wait(self.heartbeat_interval):
+            try:
+                self.leases.heartbeat(start, end)
+            except Exception as exception:
+                print("Exception while sending heartbeat: ", exception)
+
+    def _process(self, start, end):
+        """
+        Process claimed range while sending heartbeats
+        """
+        stop = Event()
+        heartbeat_thread = Thread(target=self._send_heartbeats, args=(start, end, stop), daemon=True)
+        heartbeat_thread.start()
+        try:
+            Pipeline(self.stages).run(start, end)
+        finally:
+            stop.set()
+            heartbeat_thread.join()
+        self.leases.done(start, end)
+
+    def work(self):
+        """
+        Claim and process ranges until all ranges before the last parity block are done or leased
+        """
+        while True:
+            candidates = self._get_candidates(self.get_head() + 1)
+            if not candidates:
+                break
+            start, end = random.choice(candidates[:LEASE_CANDIDATES_NUMBER])
+            if self.leases.claim(start, end):
+                print("Processing blocks {}-{}".format(start, end))
+                self._process(start, end)
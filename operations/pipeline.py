@@ -0,0 +1,387 @@
+from queue import Queue
+from threading import Thread
+from time import sleep
+from config import INDICES, PARITY_HOSTS, EVENTS_RANGE_SIZE, PIPELINE_RANGE_SIZE, PIPELINE_QUEUE_SIZE, \
+    FOLLOW_POLL_INTERVAL
+from operations.block_ranges import ClickhouseBlockRanges, merge_ranges
+from clients.metrics import METRICS
+from clients.query_profiler import PROFILER
+
+# Name of ranges of blocks with contracts searched for token methods
+TOKENS_SEARCHED = "tokens_searched"
+
+
+class Stage:
+    """
+    Step of block pipeline
+
+    Stage processes only parts of given block ranges that it hasn't processed before.
+    Records of a range are written and flagged before the range is passed to the next stage
+    """
+    name = None
+
+    def __init__(self):
+        self.unprocessed = []
+
+    def get_unprocessed(self, start, end):
+        """
+        Get unprocessed block ranges within [start, end)
+
+        Returns
+        -------
+        list
+            Sorted list of tuples with start and end of each range
+        """
+        return [(start, end)]
+
+    def prepare(self, start, end):
+        """
+        Find unprocessed block ranges before the pipeline is started
+
+        Returns
+        -------
+        list
+            Sorted list of tuples with start and end of each range
+        """
+        self.unprocessed = self.get_unprocessed(start, end)
+        return self.unprocessed
+
+    def extend(self, start, end):
+        """
+        Add new blocks in [start, end) to unprocessed ranges kept in memory, without reading processed ranges
+
+        Returns
+        -------
+        list
+            List with the added range
+        """
+        self.unprocessed = merge_ranges(self.unprocessed + [(start, end)])
+        return [(start, end)]
+
+    def process(self, start, end):
+        """
+        Extract, save and flag blocks in [start, end)
+        """
+        pass
+
+    def finish(self):
+        """
+        Complete processing after all ranges of a pipeline run
+        """
+        pass
+
+    def run(self, start, end):
+        """
+        Process unprocessed parts of block range [start, end)
+        """
+        for gap_start, gap_end in self.unprocessed:
+            gap_start, gap_end = max(gap_start, start), min(gap_end, end)
+            if gap_start < gap_end:
+                self.process(gap_start, gap_end)
+
+
+class BlocksStage(Stage):
+    name = "blocks"
+
+    def __init__(self, indices=INDICES, parity_hosts=PARITY_HOSTS):
+        super().__init__()
+        from operations.blocks import ClickhouseBlocks
+        self.blocks = ClickhouseBlocks(indices, parity_hosts[0][-1])
+
+    def get_unprocessed(self, start, end):
+        return self.blocks.block_ranges.get_unprocessed(start, end)
+
+    def process(self, start, end):
+        self.blocks._create_blocks(start, end - 1, max_blocks=end - start)
+
+
+class TracesStage(Stage):
+    name = "traces"
+
+    def __init__(self, indices=INDICES, parity_hosts=PARITY_HOSTS):
+        super().__init__()
+        from operations.internal_transactions import ClickhouseInternalTransactions
+        self.internal_transactions = ClickhouseInternalTransactions(indices, parity_hosts)
+
+    def _get_host_ranges(self, start, end):
+        """
+        Get parts of [start, end) served by parity hosts
+        """
+        host_ranges = []
+        for host_start, host_end, _ in self.internal_transactions.parity_hosts:
+            host_start = max(host_start or 0, start)
+            host_end = min(host_end, end) if host_end is not None else end
+            if host_start < host_end:
+                host_ranges.append((host_start, host_end))
+        return host_ranges
+
+    def get_unprocessed(self, start, end):
+        unprocessed = []
+        for host_start, host_end in self._get_host_ranges(start, end):
+            unprocessed += self.internal_transactions.block_ranges.get_unprocessed(host_start, host_end)
+        return sorted(unprocessed)
+
+    def extend(self, start, end):
+        host_ranges = self._get_host_ranges(start, end)
+        self.unprocessed = merge_ranges(self.unprocessed + host_ranges)
+        return host_ranges
+
+    def process(self, start, end):
+        self.internal_transactions._extract_traces_chunk(list(range(start, end)))
+        self.internal_transactions.client.flush()
+
+
+class EventsStage(Stage):
+    name = "events"
+
+    def __init__(self, indices=INDICES, parity_hosts=PARITY_HOSTS):
+        super().__init__()
+        from operations.events import ClickhouseEvents
+        self.events = ClickhouseEvents(indices, parity_hosts)
+
+    def get_unprocessed(self, start, end):
+        return self.events.block_ranges.get_unprocessed(start, end)
+
+    def process(self, start, end):
+        for range_start in range(start, end, EVENTS_RANGE_SIZE):
+            block_range = (range_start, min(range_start + EVENTS_RANGE_SIZE, end))
+            events = self.events._get_events(block_range)
+            self.events._save_events(events, deduplication_token="events_extracted:{}-{}".format(*block_range))
+            self.events._save_processed_blocks(block_range)
+        self.events.client.flush()
+
+
+class TokensStage(Stage):
+    name = "tokens"
+
+    def __init__(self, indices=INDICES, parity_hosts=PARITY_HOSTS):
+        super().__init__()
+        from operations.contract_methods import ClickhouseContractMethods
+        self.contract_methods = ClickhouseContractMethods(indices, parity_hosts)
+        self.block_ranges = ClickhouseBlockRanges(TOKENS_SEARCHED, self.contract_methods.client, indices,
+                                                  import_flags=False)
+        self.processed = []
+
+    def get_unprocessed(self, start, end):
+        return self.block_ranges.get_unprocessed(start, end)
+
+    def process(self, start, end):
+        self.processed.append((start, end))
+
+    def finish(self):
+        """
+        Search token methods of new contracts once for all processed ranges, then save the ranges
+        """
+        if not self.processed:
+            return
+        self.contract_methods.search_methods()
+        for start, end in merge_ranges(self.processed):
+            self.block_ranges.add(start, end)
+        self.block_ranges.client.flush()
+        self.processed = []
+
+
+STAGES = [BlocksStage, TracesStage, EventsStage, TokensStage]
+
+
+class Pipeline:
+    """
+    Run stages for block ranges at once
+
+    Each stage works in a separate thread and passes processed ranges to the next one through a bounded queue,
+    so a range goes through all stages while next ranges are extracted by previous stages
+
+    Parameters
+    ----------
+    stages : list
+        Stage objects in the order of processing
+    range_size : int
+        Max number of blocks in each range
+    queue_size : int
+        Max number of ranges waiting between stages
+    """
+    def __init__(self, stages, range_size=PIPELINE_RANGE_SIZE, queue_size=PIPELINE_QUEUE_SIZE):
+        self.stages = stages
+        self.range_size = range_size
+        self.queue_size = queue_size
+        self.exception = None
+
+    def _get_ranges(self, start, end, prepare=True):
+        """
+        Split blocks unprocessed by any stage into ranges
+
+        Parameters
+        ----------
+        start : int
+            First block
+        end : int
+            Block after the last one
+        prepare : bool
+            Find unprocessed ranges of stages, otherwise all blocks are added to unprocessed ranges kept in memory
+
+        Returns
+        -------
+        list
+            List of tuples with start and end of each range
+        """
+        merged = merge_ranges([
+            block_range
+            for stage in self.stages
+            for block_range in (stage.prepare(start, end) if prepare else stage.extend(start, end))
+        ])
+        return [
+            (range_start, min(range_start + self.range_size, merged_end))
+            for merged_start, merged_end in merged
+            for range_start in range(merged_start, merged_end, self.range_size)
+        ]
+
+    def _run_stage(self, stage, input_queue, output_queue):
+        """
+        Process ranges from input queue and pass them to output queue, then finish the stage
+
+        After an exception in any stage remaining ranges are skipped.
+        Queries of the stage are assigned to a stage with its name in query profiler
+        """
+        with PROFILER.tag_stage(stage.name):
+            while True:
+                block_range = input_queue.get()
+                METRICS.set("extractor_queue_depth", input_queue.qsize(), queue=stage.name)
+                if block_range is None:
+                    break
+                if self.exception is None:
+                    try:
+                        stage.run(*block_range)
+                    except Exception as exception:
+                        print("Exception in stage {}: ".format(stage.name), exception)
+                        self.exception = exception
+                if (output_queue is not None) and (self.exception is None):
+                    output_queue.put(block_range)
+            if self.exception is None:
+                try:
+                    stage.finish()
+                except Exception as exception:
+                    print("Exception in stage {}: ".format(stage.name), exception)
+                    self.exception = exception
+            if output_queue is not None:
+                output_queue.put(None)
+
+    def run(self, start, end, prepare=True):
+        """
+        Process blocks in [start, end) by all stages
+
+        Raises the first exception occurred in stages
+
+        Parameters
+        ----------
+        start : int
+            First block
+        end : int
+            Block after the last one
+        prepare : bool
+            Find unprocessed ranges of stages, see _get_ranges
+        """
+        if not self.stages:
+            return
+        queues = [Queue(maxsize=self.queue_size) for _ in self.stages] + [None]
+        threads = [
+            Thread(target=self._run_stage, args=(stage, queues[index], queues[index + 1]), daemon=True)
+            for index, stage in enumerate(self.stages)
+        ]
+        for thread in threads:
+            thread.start()
+        for block_range in self._get_ranges(start, end, prepare):
+            if self.exception is not None:
+                break
+            queues[0].put(block_range)
+        queues[0].put(None)
+        for thread in threads:
+            thread.join()
+        if self.exception is not None:
+            raise self.exception
+
+
+class Follower:
+    """
+    Process new blocks by pipeline stages as soon as they appear in parity
+
+    Stages, connections and processed ranges are kept in memory between polls,
+    so each poll processes only blocks added since the previous one.
+    Unprocessed ranges are found once, new blocks are added to them in memory.
+    After an exception they are found again, so blocks of failed inserts are processed on retry
+
+    Parameters
+    ----------
+    stages : list
+        Stage objects in the order of processing
+    get_head : function
+        Function without arguments that returns number of the last block in parity
+    poll_interval : float
+        Seconds between polls when there are no new blocks
+    """
+    def __init__(self, stages, get_head, poll_interval=FOLLOW_POLL_INTERVAL):
+        self.stages = stages
+        self.get_head = get_head
+        self.poll_interval = poll_interval
+        self.start = 0
+        self.prepared = False
+
+    def poll(self):
+        """
+        Process blocks added since the previous poll
+
+        Returns
+        -------
+        bool
+            True if there were new blocks
+        """
+        end = self.get_head() + 1
+        if end <= self.start:
+            return False
+        prepare = not self.prepared
+        self.prepared = False
+        Pipeline(self.stages).run(self.start, end, prepare)
+        self.prepared = True
+        self.start = end
+        return True
+
+    def follow(self, iterations=None):
+        """
+        Poll parity for new blocks
+
+        Exceptions are printed and the same blocks are processed again after a pause
+
+        Parameters
+        ----------
+        iterations : int
+            Number of polls, infinite if not specified
+        """
+        iteration = 0
+        while (iterations is None) or (iteration < iterations):
+            iteration += 1
+            try:
+                if self.poll():
+                    continue
+            except Exception as exception:
+                print("Exception while following blocks: ", exception)
+                METRICS.inc("extractor_retries_total", operation="follow")
+            sleep(self.poll_interval)
+
+
+def create_stages(names, indices=INDICES, parity_hosts=PARITY_HOSTS):
+    """
+    Create stages with given names in the order of processing
+
+    Parameters
+    ----------
+    names : list
+        Names of stages, i.e. ["traces", "events"]
+
+    Returns
+    -------
+    list
+        Stage objects
+    """
+    unknown_names = set(names) - set(stage_class.name for stage_class in STAGES)
+    if unknown_names:
+        raise ValueError("Unknown stages: {}".format(", ".join(sorted(unknown_names))))
+    return [stage_class(indices, parity_hosts) for stage_class in STAGES if stage_class.name in names]
@@ -1,5 +1,6 @@
 from config import INDICES
 from clients.custom_clickhouse import CustomClickhouse
+from operations.views import ClickhouseView
 import utils
 
 TRANSFER_EVENT = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
@@ -14,16 +15,12 @@ class ClickhouseTokenHolders():
         """
         Creates materialized view with token transactions extracted from Transfer events
 
+        Transactions of existing events are copied by block ranges, see ClickhouseView
+
         This function is an entry point for prepare-erc-transactions-view operation
         """
         value_sql = utils.generate_sql_for_value("data")
-        sql = """
-      CREATE MATERIALIZED VIEW IF NOT EXISTS {index} 
-      ENGINE = ReplacingMergeTree() ORDER BY id
-      POPULATE
-      AS 
-      (
-        SELECT 
+        fields = """
           concat('0x', substring(topics[2], 27, 40)) AS from,
           concat('0x', substring(topics[3], 27, 40)) AS to,
           {value_sql},
@@ -32,20 +29,20 @@ class ClickhouseTokenHolders():
           address AS token,
           transactionHash,
           blockNumber
-        FROM {event}
+        """.format(value_sql=value_sql)
+        join = """
         ANY INNER JOIN (
           SELECT id AS address, decimals
-          FROM {contract} 
+          FROM {contract}
         )
         USING address
-        WHERE
-          topics[1] = '{transfer_topic}'
-      )
-    """.format(
-            index=self.indices["token_transaction"],
-            value_sql=value_sql,
-            transfer_topic=TRANSFER_EVENT,
-            event=self.indices["event"],
-            contract=self.indices["contract_description"],
+        """.format(contract=self.indices["contract_description"])
+        view = ClickhouseView(
+            "token_transaction", "event",
+            fields=fields,
+            condition="topics[1] = '{}'".format(TRANSFER_EVENT),
+            join=join,
+            client=self.client,
+            indices=self.indices
         )
-        self.client.send_sql_request(sql)
+        view.create()
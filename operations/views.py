@@ -0,0 +1,152 @@
+from config import INDICES, VIEW_POPULATE_BLOCKS
+from operations.block_ranges import ClickhouseBlockRanges
+
+MAX_BLOCK = 2 ** 63 - 1
+
+
+class ClickhouseView:
+    """
+    Materialized view that writes to an explicit target table
+
+    The view is attached to the source table first, so all records inserted after that are written
+    to the target by the view. Then records of older blocks are copied by block ranges,
+    one INSERT ... SELECT per range, instead of a single POPULATE query.
+    Copied ranges are saved as watermarks, so an interrupted population continues from the last range.
+    Records copied both by the view and by population are merged by id in the target table.
+    To rebuild a view, drop both the view (TARGET_view) and the target table
+
+    Parameters
+    ----------
+    name : str
+        Key of target table in indices, i.e. contract
+    source : str
+        Key of source table in indices, i.e. internal_transaction
+    fields : str
+        Fields of target table in SQL format
+    condition : str
+        Condition for records of source table
+    join : str
+        Join with other tables in SQL format
+    client : CustomClickhouse
+        Database client
+    indices : dict
+        Dictionary of table names
+    """
+    def __init__(self, name, source, fields, condition, join="", client=None, indices=INDICES):
+        self.name = name
+        self.source = source
+        self.fields = fields
+        self.condition = condition
+        self.join = join
+        self.client = client
+        self.indices = indices
+        self.block_ranges = ClickhouseBlockRanges("{}_populated".format(name), client, indices, import_flags=False)
+
+    def _get_select(self, block_condition="1"):
+        """
+        Get query for records of target table
+
+        Parameters
+        ----------
+        block_condition : str
+            Additional condition, i.e. range of blocks
+
+        Returns
+        -------
+        str
+            SQL query
+        """
+        return "SELECT {} FROM {} {} WHERE ({}) AND ({})".format(
+            self.fields,
+            self.indices[self.source],
+            self.join,
+            self.condition,
+            block_condition
+        )
+
+    def _get_target_engine(self):
+        """
+        Get engine of existing target table
+
+        Returns
+        -------
+        str
+            Engine name or None if there is no such table
+        """
+        return self.client.send_sql_request(
+            "SELECT engine FROM system.tables WHERE database = currentDatabase() AND name = '{}'".format(
+                self.indices[self.name]
+            )
+        )
+
+    def _create_target(self):
+        """
+        Create empty target table with columns of the view
+
+        Watermarks of a previous target table are removed, so a recreated table is populated again.
+        Previous versions created materialized views with POPULATE under the name of the target table,
+        such a view should be dropped before
+        """
+        engine = self._get_target_engine()
+        if engine == "MaterializedView":
+            raise ValueError(
+                "{} is a materialized view created by a previous version, drop it to create the table".format(
+                    self.indices[self.name]
+                )
+            )
+        if engine:
+            return
+        self.block_ranges.clear()
+        self.client.send_sql_request(
+            "CREATE TABLE {} ENGINE = ReplacingMergeTree() ORDER BY id AS {}".format(
+                self.indices[self.name],
+                self._get_select("0")
+            )
+        )
+
+    def _attach_view(self):
+        """
+        Create materialized view that writes new records of source table to target table
+        """
+        self.client.send_sql_request("CREATE MATERIALIZED VIEW IF NOT EXISTS {}_view TO {} AS {}".format(
+            self.indices[self.name],
+            self.indices[self.name],
+            self._get_select()
+        ))
+
+    def _get_max_block(self):
+        """
+        Get the last block of source table
+
+        Returns
+        -------
+        int
+            Block number
+        """
+        return self.client.send_sql_request("SELECT max(blockNumber) FROM {}".format(self.indices[self.source]))
+
+    def _populate_range(self, start, end):
+        """
+        Copy records of blocks within [start, end) to target table and save a watermark
+        """
+        self.client.send_sql_request("INSERT INTO {} {}".format(
+            self.indices[self.name],
+            self._get_select("blockNumber >= {} AND blockNumber < {}".format(start, end))
+        ))
+        self.block_ranges.add(start, end)
+        self.client.flush()
+
+    def create(self):
+        """
+        Create target table and view, then populate target table with records of existing blocks
+
+        Blocks after the last existing block are marked as populated, since the view is attached before
+        """
+        self._create_target()
+        self._attach_view()
+        max_block = self._get_max_block()
+        self.block_ranges.add(max_block + 1, MAX_BLOCK, count_blocks=False)
+        self.client.flush()
+        for start, end in self.block_ranges.get_unprocessed(0, max_block + 1):
+            for range_start in range(start, end, VIEW_POPULATE_BLOCKS):
+                self._populate_range(range_start, min(range_start + VIEW_POPULATE_BLOCKS, end))
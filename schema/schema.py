@@ -7,12 +7,12 @@ SCHEMA = {
         "blockNumber": "Int64",
         "from": "Nullable(String)",
         "to": "Nullable(String)",
-        "value": "Nullable(Float64)",
+        "value": "Nullable(UInt256)",
         "input": "Nullable(String)",
         "output": "Nullable(String)",
-        "gas": "Nullable(String)",
-        "gasUsed": "Nullable(Int32)",
-        "gasPrice": "Nullable(Float64)",
+        "gas": "Nullable(UInt64)",
+        "gasUsed": "Nullable(UInt64)",
+        "gasPrice": "Nullable(UInt256)",
         "blockHash": "String",
         "transactionHash": "Nullable(String)",
         "transactionPosition": "Nullable(Int32)",
@@ -21,20 +21,38 @@ SCHEMA = {
         "type": "String",
         "callType": "Nullable(String)",
         "address": "Nullable(String)",
-        "code": "Nullable(String)",
-        "init": "Nullable(String)",
+        "code_hash": "Nullable(String)",
+        "init_hash": "Nullable(String)",
+        "selectors": "Array(FixedString(4))",
         "refundAddress": "Nullable(String)",
         "error": "Nullable(String)",
         "parent_error": "Nullable(UInt8)",
-        "balance": "Nullable(String)",
+        "balance": "Nullable(UInt256)",
         "author": "Nullable(String)",
         "rewardType": "Nullable(String)",
         "result": "Nullable(String)"
     },
+    "bytecode": {
+        "code": "String"
+    },
     "block_flag": {
         "name": "String",
         "value": "Nullable(UInt8)"
     },
+    "block_range": {
+        "name": "String",
+        "start_block": "Int64",
+        "end_block": "Int64"
+    },
+    "block_lease": {
+        "name": "String",
+        "start_block": "Int64",
+        "end_block": "Int64",
+        "owner": "String",
+        "claimed": "Float64",
+        "expires": "Float64",
+        "done": "UInt8"
+    },
     "contract_abi": {
         "abi_extracted": "Nullable(UInt8)",
         "abi": "Nullable(String)"
@@ -0,0 +1,85 @@
+import os
+import gzip
+import json
+import shutil
+import time
+import struct
+import tempfile
+import unittest
+from datetime import datetime, timezone, timedelta
+from unittest.mock import MagicMock, patch
+from clients.backfill import BackfillWriter, BackfillLoader
+from clients.row_binary import encode_rows, encode_value
+
+
+class RowBinaryTestCase(unittest.TestCase):
+    def test_encode_value(self):
+        assert encode_value("abc", "String") == b"\x03abc"
+        assert encode_value(1, "UInt8") == b"\x01"
+        assert encode_value(None, "Nullable(Int32)") == b"\x01"
+        assert encode_value(1, "Nullable(Int32)") == b"\x00\x01\x00\x00\x00"
+        assert encode_value(["a", None], "Array(Nullable(String))") == b"\x02\x00\x01a\x01"
+        assert encode_value("a" * 200, "String")[:2] == b"\xc8\x01"
+        assert encode_value(2 ** 255 + 1, "UInt256") == b"\x01" + b"\x00" * 30 + b"\x80"
+        assert encode_value(-1, "Int128") == b"\xff" * 16
+
+    def test_encode_datetime_in_utc(self):
+        self.addCleanup(time.tzset)
+        with patch.dict(os.environ, {"TZ": "Europe/Moscow"}):
+            time.tzset()
+            encoded = encode_value(datetime(1970, 1, 2), "DateTime")
+            aware_encoded = encode_value(datetime(1970, 1, 2, 3, tzinfo=timezone(timedelta(hours=3))), "DateTime")
+        assert encoded == aware_encoded == struct.pack("<I", 86400)
+
+    def test_encode_missing_values(self):
+        rows = encode_rows([{"id": "1"}], [("id", "String"), ("value", "Int64"), ("name", "Nullable(String)")])
+        assert rows == b"\x011" + b"\x00" * 8 + b"\x01"
+
+    def test_encode_unsupported_type(self):
+        with self.assertRaises(ValueError):
+            encode_value(1, "Decimal(10, 2)")
+
+
+class BackfillTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_write(self):
+        writer = BackfillWriter(self.directory)
+        writer.write("test_table", [("id", "String")], [{"id": "1"}, {"id": "2"}], barrier=True)
+        files = os.listdir(os.path.join(self.directory, "test_table"))
+        manifest_file = [file for file in files if file.endswith(".json")][0]
+        data_file = [file for file in files if file.endswith(".bin.gz")][0]
+        with open(os.path.join(self.directory, "test_table", manifest_file)) as file:
+            self.assertSequenceEqual(json.load(file), {
+                "index": "test_table",
+                "columns": ["id"],
+                "rows": 2,
+                "barrier": True,
+                "deduplication_token": None
+            })
+        with gzip.open(os.path.join(self.directory, "test_table", data_file)) as file:
+            assert file.read() == b"\x011\x012"
+
+    def test_load_barriers_last(self):
+        writer = BackfillWriter(self.directory)
+        writer.write("test_flags", [("id", "String")], [{"id": "1"}], barrier=True)
+        writer.write("test_data", [("id", "String")], [{"id": "1"}])
+        loader = BackfillLoader(self.directory, threads=1)
+        loader._load_file = MagicMock()
+        loader.load()
+        indices = [file[1]["index"] for (file,), _ in loader._load_file.call_args_list]
+        self.assertSequenceEqual(indices, ["test_data", "test_flags"])
+
+    def test_skip_barriers_after_exception(self):
+        writer = BackfillWriter(self.directory)
+        writer.write("test_data", [("id", "String")], [{"id": "1"}])
+        writer.write("test_flags", [("id", "String")], [{"id": "1"}], barrier=True)
+        loader = BackfillLoader(self.directory, threads=1)
+        loader._load_file = MagicMock(side_effect=Exception("Test"))
+        with self.assertRaises(Exception):
+            loader.load()
+        assert loader._load_file.call_count == 1
@@ -0,0 +1,96 @@
+import unittest
+import requests
+from importlib.util import find_spec
+from unittest.mock import patch
+from config import INDICES
+from benchmarks.fixtures import generate_fixture
+from benchmarks.stub_node import StubNode
+from benchmarks.stand_in import MemoryClickhouse
+from clients.metrics import METRICS
+from benchmarks.run import DRIVERS, BENCHMARK_TABLE_PREFIX, run_driver
+
+
+class FixturesTestCase(unittest.TestCase):
+    def test_generate_fixture(self):
+        fixture = generate_fixture("byzantium", 3, seed=1)
+        self.assertSequenceEqual(sorted(fixture["blocks"].keys()), ["5000000", "5000001", "5000002"])
+        assert fixture == generate_fixture("byzantium", 3, seed=1)
+        for number, traces in fixture["traces"].items():
+            block = fixture["blocks"][number]
+            hashes = set(transaction["hash"] for transaction in block["transactions"])
+            assert all(trace["transactionHash"] in hashes for trace in traces if trace["type"] == "call")
+            assert traces[-1]["type"] == "reward"
+
+
+class StubNodeTestCase(unittest.TestCase):
+    def setUp(self):
+        self.fixture = generate_fixture("byzantium", 5)
+        self.node = StubNode(self.fixture)
+        self.url = self.node.start()
+
+    def tearDown(self):
+        self.node.stop()
+
+    def _request(self, method, *params):
+        return {"jsonrpc": "2.0", "id": method, "method": method, "params": list(params)}
+
+    def test_batch_request(self):
+        responses = requests.post(self.url, json=[
+            self._request("eth_blockNumber"),
+            self._request("trace_block", hex(5000001)),
+            self._request("eth_getBlockByNumber", hex(5000002), False)
+        ]).json()
+        assert responses[0]["result"] == hex(5000004)
+        assert responses[1]["result"] == self.fixture["traces"]["5000001"]
+        transactions = self.fixture["blocks"]["5000002"]["transactions"]
+        assert responses[2]["result"]["transactions"] == [transaction["hash"] for transaction in transactions]
+
+    def test_filter_logs(self):
+        filter_id = requests.post(self.url, json=self._request(
+            "eth_newFilter", {"fromBlock": hex(5000001), "toBlock": hex(5000002)}
+        )).json()["result"]
+        logs = requests.post(self.url, json=self._request("eth_getFilterLogs", filter_id)).json()["result"]
+        assert logs == self.fixture["logs"]["5000001"] + self.fixture["logs"]["5000002"]
+
+    def test_unknown_method(self):
+        response = requests.post(self.url, json=self._request("eth_unknown")).json()
+        assert response["error"]["code"] == -32601
+
+
+class MemoryClickhouseTestCase(unittest.TestCase):
+    def test_bulk_index(self):
+        METRICS.reset()
+        client = MemoryClickhouse({"block": "test_block", "transaction_input": "test_transaction_input"})
+        client.bulk_index_async(index="test_block", docs=[{"id": 1, "number": 1, "timestamp": 0}])
+        client.bulk_index(index="test_transaction_input", docs=[
+            {"id": "0x1", "name": "transfer", "params.type": ["uint256"], "params.value": ["1"]}
+        ])
+        self.assertSequenceEqual(client._get_columns("test_transaction_input"), [
+            ("id", "String"), ("name", "String"), ("params.type", "Array(String)"), ("params.value", "Array(String)")
+        ])
+        samples = METRICS.get_state()["extractor_rows_inserted_total"]["samples"]
+        self.assertDictEqual(samples, {(("table", "test_block"),): 1, (("table", "test_transaction_input"),): 1})
+
+
+@unittest.skipIf((find_spec("web3") is None) or (find_spec("ethereum") is None), "Drivers require web3 and pyethereum")
+class DriversTestCase(unittest.TestCase):
+    def setUp(self):
+        self.fixture = generate_fixture("byzantium", 3, seed=1)
+        self.node = StubNode(self.fixture)
+        self.url = self.node.start()
+        self.indices = {name: BENCHMARK_TABLE_PREFIX + table for name, table in INDICES.items() if name != "block_flag"}
+
+    def tearDown(self):
+        self.node.stop()
+
+    def test_run_drivers_without_server(self):
+        connection_error = ConnectionRefusedError("Drivers should not connect to clickhouse")
+        with patch("operations.blocks.CustomClickhouse", side_effect=connection_error), \
+                patch("operations.internal_transactions.CustomClickhouse", side_effect=connection_error), \
+                patch("operations.events.CustomClickhouse", side_effect=connection_error), \
+                patch("operations.inputs.CustomClickhouse", side_effect=connection_error):
+            for name, driver in DRIVERS.items():
+                kwargs = {"fixture": self.fixture} if name == "inputs" else {}
+                client = MemoryClickhouse(self.indices)
+                result = run_driver(driver, self.url, client, dict(self.indices), 5000000, 5000003, **kwargs)
+                assert result["rows"] > 0, name
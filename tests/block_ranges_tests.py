@@ -0,0 +1,146 @@
+import unittest
+from unittest.mock import MagicMock
+from clients.bulk_writer import BulkWriter
+from operations.block_ranges import ClickhouseBlockRanges, merge_ranges
+
+
+class BlockRangesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.client = MagicMock()
+        self.client.bulk_index_async = MagicMock(side_effect=lambda callback=None, **kwargs: callback())
+        self.block_ranges = ClickhouseBlockRanges("test_stage", self.client, {"block_range": "test_block_range"})
+        self.block_ranges.ranges = [(0, 10), (20, 30), (40, 50)]
+
+    def test_merge(self):
+        merged = merge_ranges([(5, 7), (0, 3), (3, 4), (6, 10)])
+        self.assertSequenceEqual(merged, [(0, 4), (5, 10)])
+
+    def test_add_adjacent_range(self):
+        self.block_ranges.add(10, 15)
+        self.assertSequenceEqual(self.block_ranges.ranges, [(0, 15), (20, 30), (40, 50)])
+        saved_docs = self.client.bulk_index_async.call_args[1]["docs"]
+        self.assertSequenceEqual(saved_docs, [{
+            "id": "test_stage.0",
+            "name": "test_stage",
+            "start_block": 0,
+            "end_block": 15
+        }])
+
+    def test_add_range_covering_several_ranges(self):
+        self.block_ranges.add(15, 45)
+        self.assertSequenceEqual(self.block_ranges.ranges, [(0, 10), (15, 50)])
+
+    def test_add_separate_range(self):
+        self.block_ranges.add(60, 70)
+        self.block_ranges.add(32, 35)
+        self.assertSequenceEqual(self.block_ranges.ranges, [(0, 10), (20, 30), (32, 35), (40, 50), (60, 70)])
+
+    def test_add_blocks(self):
+        self.block_ranges.add_blocks([11, 10, 13])
+        self.assertSequenceEqual(self.block_ranges.ranges, [(0, 12), (13, 14), (20, 30), (40, 50)])
+
+    def test_add_range_after_write(self):
+        self.client.bulk_index_async = MagicMock()
+        self.block_ranges.add(10, 15)
+        self.assertSequenceEqual(self.block_ranges.ranges, [(0, 10), (20, 30), (40, 50)])
+        self.client.bulk_index_async.call_args[1]["callback"]()
+        self.assertSequenceEqual(self.block_ranges.ranges, [(0, 15), (20, 30), (40, 50)])
+
+    def test_retry_after_failed_write(self):
+        failures = [Exception("Test")]
+
+        def bulk_index(index, docs, **kwargs):
+            if failures:
+                raise failures.pop()
+
+        writer_client = MagicMock()
+        writer_client.bulk_index = MagicMock(side_effect=bulk_index)
+        writer = BulkWriter(lambda: writer_client, threads=1, coalesce_size=1)
+        self.client.bulk_index_async = MagicMock(side_effect=lambda index, docs, **kwargs: writer.put(
+            index, docs, **kwargs
+        ))
+        self.client.flush = writer.flush
+
+        writer.put("test_trace", [{"id": 1}])
+        self.block_ranges.add(10, 15)
+        with self.assertRaises(Exception):
+            self.client.flush()
+        self.assertSequenceEqual(self.block_ranges.get_unprocessed(0, 20), [(10, 20)])
+
+        writer.put("test_trace", [{"id": 1}])
+        self.block_ranges.add(10, 15)
+        self.client.flush()
+        self.assertSequenceEqual(self.block_ranges.get_unprocessed(0, 20), [(15, 20)])
+
+    def test_clear(self):
+        self.block_ranges.clear()
+        self.client.send_sql_request.assert_called_once_with(
+            "ALTER TABLE test_block_range DELETE WHERE name = 'test_stage' SETTINGS mutations_sync = 1"
+        )
+        self.assertSequenceEqual(self.block_ranges.get_unprocessed(0, 10), [(0, 10)])
+
+    def test_get_unprocessed(self):
+        self.assertSequenceEqual(self.block_ranges.get_unprocessed(5, 45), [(10, 20), (30, 40)])
+        self.assertSequenceEqual(self.block_ranges.get_unprocessed(0, 60), [(10, 20), (30, 40), (50, 60)])
+        self.assertSequenceEqual(self.block_ranges.get_unprocessed(22, 28), [])
+
+    def test_get_islands_without_holes(self):
+        self.client.fetch_all = MagicMock(side_effect=[[(12, 5, 14)], []])
+        islands = self.block_ranges._get_islands("SELECT number FROM test")
+        self.assertSequenceEqual(islands, [(5, 15)])
+        self.client.fetch_all.assert_any_call(
+            "SELECT count(), min(number), max(number) FROM (SELECT number FROM test)"
+        )
+
+    def test_get_islands_with_holes(self):
+        self.client.fetch_all = MagicMock(side_effect=[
+            [(6, 2, 10)],
+            [(0, 2), (2, 5), (5, 8)]
+        ])
+        islands = self.block_ranges._get_islands("SELECT number FROM test")
+        self.assertSequenceEqual(islands, [(2, 3), (5, 6), (8, 11)])
+
+    def test_get_islands_empty(self):
+        self.client.fetch_all = MagicMock(return_value=[(0, 0, 0)])
+        assert self.block_ranges._get_islands("SELECT number FROM test") == []
+
+    def test_import_extracted_blocks(self):
+        block_ranges = ClickhouseBlockRanges("blocks_extracted", self.client, {"block": "test_block"})
+        block_ranges._get_islands = MagicMock(return_value=[(0, 10)])
+        self.assertSequenceEqual(block_ranges._import_flags(), [(0, 10)])
+        block_ranges._get_islands.assert_called_with("SELECT number FROM test_block")
+
+    def test_load_without_import(self):
+        block_ranges = ClickhouseBlockRanges("test_populated", self.client, {
+            "block_range": "test_block_range",
+            "block_flag": "test_block_flag"
+        }, import_flags=False)
+        block_ranges._import_flags = MagicMock()
+        self.client.search = MagicMock(return_value=[])
+        assert block_ranges.load() == []
+        block_ranges._import_flags.assert_not_called()
+
+    def test_get_extracted(self):
+        self.client.search = MagicMock(return_value=[MagicMock(start_block=0, end_block=10)])
+        self.assertSequenceEqual(self.block_ranges.get_extracted(), [(0, 10)])
+        self.client.search.assert_called_with(
+            index="test_block_range",
+            fields=["start_block", "end_block"],
+            query="WHERE name = 'blocks_extracted'",
+            final=False
+        )
+
+    def test_get_unprocessed_extracted(self):
+        self.block_ranges.get_extracted = MagicMock(return_value=[(0, 25), (35, 60)])
+        self.assertSequenceEqual(self.block_ranges.get_unprocessed_extracted(), [(10, 20), (35, 40), (50, 60)])
+        self.assertSequenceEqual(self.block_ranges.get_unprocessed_extracted(15, 38), [(15, 20), (35, 38)])
+
+    def test_get_max_block(self):
+        assert self.block_ranges.get_max_block() == 9
+        self.block_ranges.ranges = []
+        assert self.block_ranges.get_max_block() is None
+
+    def test_get_max_block_before_hole(self):
+        self.block_ranges.ranges = [(5, 10), (20, 30)]
+        assert self.block_ranges.get_max_block(5) == 9
+        assert self.block_ranges.get_max_block() is None
@@ -1,5 +1,6 @@
 import unittest
 from operations.blocks import ClickhouseBlocks
+from operations.block_ranges import merge_ranges
 from operations.indices import ClickhouseIndices
 from tests.test_utils import mockify, TestClickhouse, parity
 import httpretty
@@ -10,6 +11,7 @@ from web3 import Web3, HTTPProvider
 from pprint import pprint
 from config import ETHEREUM_START_DATE, TEST_PARITY_NODE
 
+TEST_BLOCK_RANGES_INDEX = "test_ethereum_block_ranges"
 TEST_BLOCKS_INDEX = "test_ethereum_blocks"
 TEST_PARITY_URL = TEST_PARITY_NODE
 
@@ -17,12 +19,13 @@ TEST_PARITY_URL = TEST_PARITY_NODE
 class ClickhouseBlocksTestCase(unittest.TestCase):
     def setUp(self):
         self.blocks = ClickhouseBlocks(
-            {"block": TEST_BLOCKS_INDEX},
+            {"block": TEST_BLOCKS_INDEX, "block_range": TEST_BLOCK_RANGES_INDEX},
             parity_host=TEST_PARITY_URL
         )
         self.client = TestClickhouse()
         self.client.send_sql_request("DROP TABLE IF EXISTS {}".format(TEST_BLOCKS_INDEX))
-        ClickhouseIndices({"block": TEST_BLOCKS_INDEX}).prepare_indices()
+        self.client.send_sql_request("DROP TABLE IF EXISTS {}".format(TEST_BLOCK_RANGES_INDEX))
+        ClickhouseIndices({"block": TEST_BLOCKS_INDEX, "block_range": TEST_BLOCK_RANGES_INDEX}).prepare_indices()
 
     @httpretty.activate
     def test_get_max_parity_block(self):
@@ -90,6 +93,13 @@ class ClickhouseBlocksTestCase(unittest.TestCase):
         blocks = [block["_source"]["number"] for block in blocks]
         self.assertCountEqual(blocks, [1, 2, 3])
 
+    def test_create_blocks_save_ranges(self):
+        mockify(self.blocks, {}, "_create_blocks")
+        self.blocks._create_blocks(1, 5)
+        ranges = self.client.search(index=TEST_BLOCK_RANGES_INDEX, query="WHERE name = 'blocks_extracted'",
+                                    fields=["start_block", "end_block"])
+        self.assertSequenceEqual(merge_ranges([(r.start_block, r.end_block) for r in ranges]), [(1, 6)])
+
     def test_create_unique_blocks(self):
         mockify(self.blocks, {}, "_create_blocks")
         self.blocks._create_blocks(1, 1)
@@ -0,0 +1,86 @@
+import unittest
+from threading import Event
+from unittest.mock import MagicMock
+from clients.bulk_writer import BulkWriter
+from clients.columns import ColumnBatch
+
+
+class BulkWriterTestCase(unittest.TestCase):
+    def setUp(self):
+        self.written = []
+        self.client = MagicMock()
+        self.client.bulk_index = MagicMock(side_effect=lambda index, docs, **kwargs: self.written.append((index, docs)))
+
+    def test_flush(self):
+        writer = BulkWriter(lambda: self.client, threads=2)
+        for i in range(10):
+            writer.put("test", [{"id": i}])
+        writer.flush()
+        written_ids = [doc["id"] for index, docs in self.written for doc in docs]
+        self.assertCountEqual(written_ids, list(range(10)))
+
+    def test_coalesce_inserts(self):
+        writer = BulkWriter(lambda: self.client, threads=1, coalesce_size=10)
+        items = [(i, "test" if i % 2 else "other", [{"id": i}], False, None, None) for i in range(4)]
+        writer._write(self.client, items)
+        self.assertCountEqual(self.written, [
+            ("test", [{"id": 1}, {"id": 3}]),
+            ("other", [{"id": 0}, {"id": 2}])
+        ])
+
+    def test_coalesce_column_batches(self):
+        writer = BulkWriter(lambda: self.client, threads=1, coalesce_size=10)
+        items = [(i, "test", ColumnBatch(["id"], [[i]]), False, None, None) for i in range(3)]
+        writer._write(self.client, items)
+        index, batch = self.written[0]
+        assert index == "test"
+        self.assertSequenceEqual(batch.columns, [[0, 1, 2]])
+
+    def test_skip_coalescing_for_deduplicated_inserts(self):
+        writer = BulkWriter(lambda: self.client, threads=1, coalesce_size=10)
+        items = [(i, "test", [{"id": i}], False, "token{}".format(i) if i < 2 else None, None) for i in range(4)]
+        writer._write(self.client, items)
+        self.client.bulk_index.assert_any_call(index="test", docs=[{"id": 0}], deduplication_token="token0")
+        self.client.bulk_index.assert_any_call(index="test", docs=[{"id": 1}], deduplication_token="token1")
+        self.client.bulk_index.assert_any_call(index="test", docs=[{"id": 2}, {"id": 3}])
+
+    def test_barrier(self):
+        unlock = Event()
+
+        def slow_bulk_index(index, docs, **kwargs):
+            if index == "data":
+                unlock.wait()
+            self.written.append((index, docs))
+
+        self.client.bulk_index = MagicMock(side_effect=slow_bulk_index)
+        writer = BulkWriter(lambda: self.client, threads=2, coalesce_size=1)
+        writer.put("data", [{"id": 1}])
+        writer.put("flags", [{"id": 1}], barrier=True, callback=lambda: self.written.append(("callback", None)))
+        unlock.set()
+        writer.flush()
+        self.assertSequenceEqual([index for index, docs in self.written], ["data", "flags", "callback"])
+
+    def test_skip_barrier_after_exception(self):
+        def failed_bulk_index(index, docs, **kwargs):
+            if index == "data":
+                raise Exception("Test")
+            self.written.append((index, docs))
+
+        self.client.bulk_index = MagicMock(side_effect=failed_bulk_index)
+        writer = BulkWriter(lambda: self.client, threads=1, coalesce_size=1)
+        writer.put("data", [{"id": 1}])
+        writer.put("flags", [{"id": 1}], barrier=True, callback=lambda: self.written.append(("callback", None)))
+        with self.assertRaises(Exception):
+            writer.flush()
+        assert not self.written
+
+    def test_raise_first_exception_from_flush(self):
+        exceptions = [ValueError("First"), ValueError("Second")]
+        self.client.bulk_index = MagicMock(side_effect=exceptions)
+        writer = BulkWriter(lambda: self.client, threads=2, coalesce_size=1)
+        writer.put("data", [{"id": 1}])
+        writer.put("data", [{"id": 2}])
+        with self.assertRaises(ValueError) as context:
+            writer.flush()
+        assert context.exception in exceptions
+        writer.flush()
@@ -1,6 +1,7 @@
 import unittest
 from clickhouse_driver import Client
 from clients.custom_clickhouse import CustomClickhouse
+from clients.query_profiler import PROFILER
 import json
 import sys
 from unittest.mock import MagicMock, ANY, call
@@ -34,6 +35,14 @@ class ClickhouseTestCase(unittest.TestCase):
         result = self.new_client.search(index="test", query="WHERE x < 3", fields=["x"])
         self.assertSequenceEqual(formatted_documents, result)
 
+    def test_search_with_external_table(self):
+        formatted_documents = self._add_records()
+        formatted_documents = [doc for doc in formatted_documents if doc["_source"]['x'] in [1, 100]]
+        external_table = self.new_client.make_external_table("test_x", [("x", "Int32")], [{"x": 1}, {"x": 100}])
+        result = self.new_client.search(index="test", query="WHERE x IN test_x", fields=["x"],
+                                        external_tables=[external_table])
+        self.assertCountEqual(formatted_documents, result)
+
     def test_count(self):
         formatted_documents = self._add_records()
         formatted_documents = [doc for doc in formatted_documents if doc["_source"]['x'] < 3]
@@ -69,6 +78,25 @@ class ClickhouseTestCase(unittest.TestCase):
         result_without_final = self.new_client.iterate(index="test", fields=[], final=False)
         assert len(next(result_without_final)) > len(next(result_with_final))
 
+    def test_bulk_index_with_deduplication_token(self):
+        self.client.execute('ALTER TABLE test MODIFY SETTING non_replicated_deduplication_window = 100')
+        documents = [{"x": i} for i in range(10)]
+        for _ in range(2):
+            self.new_client.bulk_index(index="test", docs=[d.copy() for d in documents], id_field="x",
+                                       deduplication_token="test:0-10")
+        self.new_client.bulk_index(index="test", docs=[d.copy() for d in documents], id_field="x",
+                                   deduplication_token="test:10-20")
+        result = self.client.execute('SELECT count() FROM test')
+        assert result[0][0] == 2 * len(documents)
+
+    def test_bulk_index_without_deduplication_token(self):
+        self.client.execute('ALTER TABLE test MODIFY SETTING non_replicated_deduplication_window = 100')
+        documents = [{"x": i} for i in range(10)]
+        for _ in range(2):
+            self.new_client.bulk_index(index="test", docs=[d.copy() for d in documents], id_field="x")
+        result = self.client.execute('SELECT count() FROM test')
+        assert result[0][0] == 2 * len(documents)
+
     def test_iterate_with_derived_fields(self):
         self._add_records()
         result = self.new_client.iterate(index="test", fields=["x - 1 AS y"])
@@ -106,9 +134,26 @@ class ClickhouseTestCase(unittest.TestCase):
         self.new_client.bulk_index(index="test_index", docs=test_docs)
 
         self.new_client._split_records.assert_called_with(test_docs)
-        calls = [call(ANY, records) for records in test_chunks]
+        calls = [call(ANY, records, query_id=ANY) for records in test_chunks]
         self.new_client.client.execute.assert_has_calls(calls)
 
+    def test_bulk_index_async(self):
+        documents = [{"x": i} for i in range(10)]
+        self.new_client.bulk_index_async(index="test", docs=[d.copy() for d in documents], id_field="x")
+        self.new_client.flush()
+        result = self.client.execute('SELECT id FROM test')
+        self.assertCountEqual(result, [(str(doc["x"]),) for doc in documents])
+
+    def test_profile_queries(self):
+        self._add_records()
+        PROFILER.reset()
+        self.new_client.search(index="test", query="WHERE x < 3", fields=["x"])
+        self.new_client.search(index="test", query="WHERE x < 4", fields=["x"])
+        queries = PROFILER.get_summary()["default"]
+        assert len(queries) == 1
+        assert queries[0]["count"] == 2
+        assert queries[0]["query"] == "SELECT x,id FROM test WHERE x < ?"
+
     def test_send_sql_request(self):
         formatted_documents = self._add_records()
         result = self.new_client.send_sql_request("SELECT max(x) FROM test")
@@ -0,0 +1,90 @@
+import unittest
+import os
+import pstats
+import tempfile
+import tracemalloc
+from threading import Thread
+from clients.code_profiler import CodeProfiler
+from clients.query_profiler import QueryProfiler
+
+
+def cpu_function():
+    return sum(range(1000))
+
+
+def chunk_function():
+    return sum(range(1000))
+
+
+class CodeProfilerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.profiler = CodeProfiler()
+        self.query_profiler = QueryProfiler()
+        self.query_profiler.add_listener(self.profiler)
+
+    def tearDown(self):
+        tracemalloc.stop()
+
+    def _get_calls(self, stage):
+        stats = pstats.Stats(os.path.join(self.directory, stage + ".pstats"))
+        return {function[2]: stat[0] for function, stat in stats.stats.items()}
+
+    def test_profile_nested_stages(self):
+        self.profiler.configure(self.directory, cpu=True)
+
+        @self.query_profiler.profile_stage
+        def inner_stage():
+            cpu_function()
+
+        @self.query_profiler.profile_stage
+        def outer_stage():
+            inner_stage()
+            cpu_function()
+            cpu_function()
+
+        outer_stage()
+        assert self._get_calls("inner_stage")["cpu_function"] == 1
+        assert self._get_calls("outer_stage")["cpu_function"] == 2
+
+    def test_profile_sample(self):
+        self.profiler.configure(self.directory, cpu=True, memory=True, sample=2)
+        chunk = self.profiler.profile_chunk(chunk_function)
+
+        @self.query_profiler.profile_stage
+        def test_stage():
+            for _ in range(5):
+                chunk()
+                cpu_function()
+
+        test_stage()
+        calls = self._get_calls("test_stage")
+        assert calls["chunk_function"] == 2
+        assert "cpu_function" not in calls
+        with open(os.path.join(self.directory, "test_stage.malloc.txt")) as malloc_file:
+            assert malloc_file.readline() == "Top allocations of stage test_stage:\n"
+
+    def test_disabled(self):
+        self.profiler.configure(self.directory)
+
+        @self.query_profiler.profile_stage
+        def test_stage():
+            cpu_function()
+
+        test_stage()
+        assert not os.listdir(self.directory)
+
+    def test_chunks_of_other_thread(self):
+        self.profiler.configure(self.directory, cpu=True, sample=2)
+        chunk = self.profiler.profile_chunk(chunk_function)
+
+        @self.query_profiler.profile_stage
+        def test_stage():
+            thread = Thread(target=chunk)
+            thread.start()
+            thread.join()
+            assert self.profiler.stages[-1]["chunks"] == 0
+            chunk()
+
+        test_stage()
+        assert self._get_calls("test_stage")["chunk_function"] == 1
@@ -0,0 +1,20 @@
+import unittest
+from clients.columns import ColumnBatch
+
+
+class ColumnBatchTestCase(unittest.TestCase):
+    def test_from_docs(self):
+        batch = ColumnBatch.from_docs([{"id": 1, "name": "a"}, {"id": 2, "abi": {"x": 1}}], ["id", "name", "abi"])
+        self.assertSequenceEqual(batch.columns, [[1, 2], ["a", None], [None, '{"x": 1}']])
+        assert len(batch) == 2
+
+    def test_concat(self):
+        batch = ColumnBatch.concat([ColumnBatch(["id"], [[1]]), ColumnBatch(["id", "name"], [[2], ["b"]])])
+        self.assertSequenceEqual(batch.fields, ["id", "name"])
+        self.assertSequenceEqual(batch.columns, [[1, 2], [None, "b"]])
+
+    def test_select(self):
+        batch = ColumnBatch(["hash", "name"], [["0x1"], ["a"]])
+        batch.rename("hash", "id")
+        batch = batch.select(["name", "id", "missing"])
+        self.assertSequenceEqual(batch.to_docs(), [{"name": "a", "id": "0x1"}])
@@ -4,6 +4,7 @@ import os
 import unittest
 from tests.test_utils import mockify, TestClickhouse
 from tqdm import *
+from clients.rows import create_row
 from unittest.mock import MagicMock, call, Mock, patch, ANY
 import multiprocessing
 import json
@@ -45,8 +46,8 @@ class ClickhouseContractABITestCase(unittest.TestCase):
         self.client.prepare_indices(self.indices)
 
     def test_pool(self):
-        """Test pool size"""
-        assert self.contracts.pool._processes == INPUT_PARSING_PROCESSES
+        """Test executor size"""
+        assert self.contracts.executor.workers == INPUT_PARSING_PROCESSES
 
     def test_get_contract_abi(self):
         """Test getting contract ABI by address"""
@@ -76,13 +77,13 @@ class ClickhouseContractABITestCase(unittest.TestCase):
         abis = [{1: "abi2"}, {0: "abi1"}]
 
         self.contracts._split_on_chunks = MagicMock(return_value=chunks)
-        self.contracts.pool.map = MagicMock(return_value=abis)
+        self.contracts.executor.map = MagicMock(return_value=abis)
 
         response = self.contracts._get_contracts_abi(addresses)
 
         self.contracts._split_on_chunks.assert_called_with(
             [(index, address) for index, address in enumerate(addresses)], INPUT_PARSING_PROCESSES)
-        self.contracts.pool.map.assert_called_with(contracts._get_contracts_abi_sync, [dict(chunk) for chunk in chunks])
+        self.contracts.executor.map.assert_called_with(contracts._get_contracts_abi_sync, [dict(chunk) for chunk in chunks])
         self.assertSequenceEqual(["abi1", "abi2"], response)
 
     def test_iterate_contracts_without_abi(self):
@@ -133,7 +134,7 @@ class ClickhouseContractABITestCase(unittest.TestCase):
         assert contracts_count == 10
 
     def test_save_contracts_empty_abi(self):
-        test_contracts = [[{"_id": 1, "_source": {"address": 1}}]]
+        test_contracts = [[create_row({"address": 1}, id=1)]]
         test_abis = [[]]
         test_contracts_abi = [{'abi': None, 'abi_extracted': True, "id": 1}]
         self.contracts._iterate_contracts_without_abi = MagicMock(return_value=test_contracts)
@@ -1,6 +1,7 @@
 import unittest
 from operations.contract_methods import ClickhouseContractMethods as ContractMethods, CURRENT_DIR, MAX_TOTAL_SUPPLY
 import json
+from clients.rows import create_row
 from unittest.mock import MagicMock, ANY
 from tests.test_utils import TestClickhouse
 from tests.test_utils import parity
@@ -134,7 +135,7 @@ class ContractMethodsTestCase(unittest.TestCase):
         test_website = "website"
         test_cmc = "cmc"
         test_contract_address = "0x1"
-        test_contract = {"_id": test_contract_address, "_source": {"address": test_contract_address}}
+        test_contract = create_row({"address": test_contract_address}, id=test_contract_address)
         self.contract_methods._get_constants = MagicMock(return_value=(None, None, None, None, None))
         self.contract_methods._get_external_links = MagicMock(return_value=(test_website, test_cmc))
         self.contract_methods._update_contract_descr = MagicMock()
@@ -1,5 +1,6 @@
 import unittest
 from operations.contract_transactions import ClickhouseContractTransactions
+from operations.internal_transactions import _get_selectors
 from time import sleep
 from tqdm import *
 from tests.test_utils import TestClickhouse
@@ -13,17 +14,21 @@ class ClickhouseContractTransactionsTestCase(unittest.TestCase):
     def setUp(self):
         self.indices = {
             "internal_transaction": TEST_TRANSACTIONS_INDEX,
-            "contract": TEST_CONTRACTS_INDEX
+            "contract": TEST_CONTRACTS_INDEX,
+            "block_range": TEST_BLOCK_RANGES_INDEX
         }
         self.client = TestClickhouse()
         self.client.prepare_indices({
-            "internal_transaction": TEST_TRANSACTIONS_INDEX
+            "internal_transaction": TEST_TRANSACTIONS_INDEX,
+            "block_range": TEST_BLOCK_RANGES_INDEX
         })
+        self.client.send_sql_request("DROP TABLE IF EXISTS {}_view".format(self.indices["contract"]))
         self.client.send_sql_request("DROP TABLE IF EXISTS {}".format(self.indices["contract"]))
         self.contract_transactions = ClickhouseContractTransactions(self.indices)
         self.contract_transactions.extract_contract_addresses()
 
     def tearDown(self):
+        self.client.send_sql_request("DROP TABLE IF EXISTS {}_view".format(self.indices["contract"]))
         self.client.send_sql_request("DROP TABLE IF EXISTS {}".format(self.indices["contract"]))
 
     def test_extract_contract_addresses(self):
@@ -33,14 +38,14 @@ class ClickhouseContractTransactionsTestCase(unittest.TestCase):
             "address": "0x0",
             "blockNumber": 1000,
             "from": "0x01",
-            "code": "0x12345678"
+            "code_hash": "0xc0de"
         }
         self.client.bulk_index(index=TEST_TRANSACTIONS_INDEX, docs=[transaction])
         result = self.client.search(index=TEST_CONTRACTS_INDEX, fields=[
             "address",
             "blockNumber",
             "owner",
-            "bytecode"
+            "code_hash"
         ])
         contract = result[0]
         print(contract)
@@ -48,21 +53,21 @@ class ClickhouseContractTransactionsTestCase(unittest.TestCase):
         assert contract['_source']["address"] == transaction["address"]
         assert contract['_source']["blockNumber"] == transaction["blockNumber"]
         assert contract['_source']["owner"] == transaction["from"]
-        assert contract['_source']["bytecode"] == transaction["code"]
+        assert contract['_source']["code_hash"] == transaction["code_hash"]
 
     def test_extract_contract_standards(self):
         transactions = [{
             "id": "0x1",
             "type": "create",
-            "code": TEST_ERC20_BYTECODE,
+            "selectors": _get_selectors(TEST_ERC20_BYTECODE),
         }, {
             "id": "0x2",
             "type": "create",
-            "code": TEST_BANCOR_CONVERTER_BYTECODE
+            "selectors": _get_selectors(TEST_BANCOR_CONVERTER_BYTECODE)
         }, {
             "id": "0x3",
             "type": "create",
-            "code": "0x0"
+            "selectors": _get_selectors("0x0")
         }]
         self.client.bulk_index(index=TEST_TRANSACTIONS_INDEX, docs=transactions)
         result = self.client.search(index=TEST_CONTRACTS_INDEX, fields=[
@@ -76,6 +81,28 @@ class ClickhouseContractTransactionsTestCase(unittest.TestCase):
         assert result[1]["_source"]["standard_bancor_converter"]
         assert not result[2]["_source"]["standard_bancor_converter"]
 
+    def test_get_standards(self):
+        standards = self.contract_transactions._get_standards()
+        assert "standard_erc721" in standards
+        assert "standard_erc1155" in standards
+        assert standards["standard_bancor_converter"].startswith("hasAll(selectors, ")
+        assert "LIKE" not in " ".join(standards.values())
+
+    def test_extract_contract_addresses_populate(self):
+        self.client.send_sql_request("DROP TABLE {}_view".format(TEST_CONTRACTS_INDEX))
+        self.client.send_sql_request("DROP TABLE {}".format(TEST_CONTRACTS_INDEX))
+        self.client.bulk_index(index=TEST_TRANSACTIONS_INDEX, docs=[
+            {"id": i, "type": "create", "address": "0x{}".format(i), "blockNumber": i * 1000}
+            for i in range(5)
+        ])
+        with patch("operations.views.VIEW_POPULATE_BLOCKS", 1500):
+            self.contract_transactions.extract_contract_addresses()
+        self.client.bulk_index(index=TEST_TRANSACTIONS_INDEX, docs=[
+            {"id": 5, "type": "create", "address": "0x5", "blockNumber": 5000}
+        ])
+        count = self.client.count(index=TEST_CONTRACTS_INDEX)
+        assert count == 6
+
     def test_extract_contract_addresses_if_exists(self):
         self.contract_transactions.extract_contract_addresses()
 
@@ -108,6 +135,7 @@ class ClickhouseContractTransactionsTestCase(unittest.TestCase):
         assert count == 1
 
     def test_extract_contract_addresses_recreate(self):
+        self.client.send_sql_request("DROP TABLE {}_view".format(TEST_CONTRACTS_INDEX))
         self.client.send_sql_request("DROP TABLE {}".format(TEST_CONTRACTS_INDEX))
         self.client.bulk_index(index=TEST_TRANSACTIONS_INDEX, docs=[{
             "id": 1,
@@ -135,6 +163,7 @@ class ClickhouseContractTransactionsTestCase(unittest.TestCase):
 
 TEST_TRANSACTIONS_INDEX = 'test_ethereum_transactions'
 TEST_CONTRACTS_INDEX = 'test_ethereum_contracts'
+TEST_BLOCK_RANGES_INDEX = 'test_ethereum_block_ranges'
 TEST_TRANSACTION_INPUT = '0x38a999ebba98a14a67ea7a83921e3e58d04a29fc55adfa124a985771f323052a'
 TEST_TRANSACTION_TO = '0xb1631db29e09ec5581a0ec398f1229abaf105d3524c49727621841af947bdc44'
 TEST_TRANSACTION_TO_COMMON = '0x38a999ebba98a14a67ea7a83921e3e58d04a29fc55adfa124a985771f323052a'
@@ -5,7 +5,7 @@ from tests.test_utils import TestClickhouse
 from operations.events import ClickhouseEvents as Events
 import httpretty
 from hexbytes import HexBytes
-from unittest.mock import MagicMock, Mock, call
+from unittest.mock import MagicMock, Mock, call, ANY
 from tests.test_utils import mockify
 import json
 
@@ -18,6 +18,7 @@ class EventsTestCase(unittest.TestCase):
         self.indices = {
             "block": TEST_BLOCKS_INDEX,
             "block_flag": TEST_BLOCKS_TRACES_EXTRACTED_INDEX,
+            "block_range": TEST_BLOCK_RANGES_INDEX,
             "event": TEST_EVENTS_INDEX
         }
         self.client.prepare_indices(self.indices)
@@ -48,30 +49,34 @@ class EventsTestCase(unittest.TestCase):
             "number": i
         } for i in range(3 * test_range_size)])
 
-        self.client.bulk_index(index=TEST_BLOCKS_TRACES_EXTRACTED_INDEX, docs=[{
-            "id": i + 10,
+        self.client.bulk_index(index=TEST_BLOCK_RANGES_INDEX, docs=[{
+            "id": "events_extracted.10",
             "name": "events_extracted",
-            "value": 1
-        } for i in range(test_range_size)])
-
-        self.client.bulk_index(index=TEST_BLOCKS_TRACES_EXTRACTED_INDEX, docs=[{
-            "id": i + 20,
+            "start_block": 10,
+            "end_block": 20
+        }, {
+            "id": "other_flag.20",
             "name": "other_flag",
-            "value": 1
-        } for i in range(test_range_size)])
-
-        self.client.bulk_index(index=TEST_BLOCKS_TRACES_EXTRACTED_INDEX, docs=[{
-            "id": i,
-            "name": "events_extracted",
-            "value": 1
-        } for i in range(test_range_size)] + [{
-            "id": i,
-            "name": "events_extracted"
-        } for i in range(test_range_size)])
+            "start_block": 20,
+            "end_block": 30
+        }])
 
         result = [r for r in self.events._iterate_block_ranges(test_range_size)]
         self.assertCountEqual(result, [(0, 10), (20, 30)])
-        pass
+
+    def test_iterate_block_ranges_skip_missing_blocks(self):
+        self.client.bulk_index(index=TEST_BLOCKS_INDEX, docs=[
+            {"id": i, "number": i} for i in list(range(0, 5)) + list(range(12, 15))
+        ])
+
+        result = [r for r in self.events._iterate_block_ranges(10)]
+        self.assertSequenceEqual(result, [(0, 5), (12, 15)])
+
+    def test_iterate_block_ranges_split_gaps(self):
+        self.client.bulk_index(index=TEST_BLOCKS_INDEX, docs=[{"id": i, "number": i} for i in range(25)])
+
+        result = [r for r in self.events._iterate_block_ranges(10)]
+        self.assertSequenceEqual(result, [(0, 10), (10, 20), (20, 25)])
 
     @httpretty.activate
     def test_get_events(self):
@@ -130,6 +135,7 @@ class EventsTestCase(unittest.TestCase):
         self.events._process_event = MagicMock(side_effect=test_processed_events)
 
         self.events._save_events(test_events)
+        self.events.client.flush()
 
         for event in test_events:
             self.events._process_event.assert_any_call(event)
@@ -144,11 +150,11 @@ class EventsTestCase(unittest.TestCase):
 
     def test_save_processed_blocks(self):
         test_range = (0, 10)
-        test_flags = [str(i) for i in range(0, 10)]
         self.events._save_processed_blocks(test_range)
-        flags = self.client.search(index=TEST_BLOCKS_TRACES_EXTRACTED_INDEX, fields=[],
-                                   query="WHERE name = 'events_extracted' AND value IS NOT NULL", size=1000)
-        self.assertCountEqual([flag["_id"] for flag in flags], test_flags)
+        self.events.client.flush()
+        ranges = self.client.search(index=TEST_BLOCK_RANGES_INDEX, fields=["start_block", "end_block"],
+                                    query="WHERE name = 'events_extracted'")
+        self.assertCountEqual([(r.start_block, r.end_block) for r in ranges], [test_range])
 
     def test_extract_events(self):
         test_ranges = [(0, 10), (20, 30)]
@@ -171,7 +177,7 @@ class EventsTestCase(unittest.TestCase):
 
         event_calls = []
         for i, events in enumerate(test_parity_events):
-            event_calls += [call.get_events(test_ranges[i]), call.save_events(events), call.save_blocks(test_ranges[i])]
+            event_calls += [call.get_events(test_ranges[i]), call.save_events(events, deduplication_token=ANY), call.save_blocks(test_ranges[i])]
         process.assert_has_calls([
                                      call.iterate_blocks()
                                  ] + event_calls)
@@ -179,4 +185,5 @@ class EventsTestCase(unittest.TestCase):
 
 TEST_BLOCKS_INDEX = "test_ethereum_block"
 TEST_BLOCKS_TRACES_EXTRACTED_INDEX = "test_ethereum_block_flag"
+TEST_BLOCK_RANGES_INDEX = "test_ethereum_block_range"
 TEST_EVENTS_INDEX = "test_ethereum_event"
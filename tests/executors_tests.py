@@ -0,0 +1,81 @@
+import unittest
+import asyncio
+import os
+from threading import current_thread
+from clients.executors import create_executor, open_worker_clients, get_worker_client
+
+
+def square(value):
+    return value * value
+
+
+def add(first, second):
+    return first + second
+
+
+def get_worker_id():
+    return id(get_worker_client("test", object))
+
+
+def get_process_id(value):
+    return os.getpid()
+
+
+def square_positive(value):
+    if value < 0:
+        raise ValueError("Negative value")
+    return value * value
+
+
+async def async_square(value):
+    await asyncio.sleep(0)
+    return value * value
+
+
+class ExecutorsTestCase(unittest.TestCase):
+    def test_map(self):
+        for kind in ["serial", "thread", "process", "async"]:
+            with create_executor(kind, 2) as executor:
+                assert executor.map(square, range(10)) == [value * value for value in range(10)]
+                assert executor.starmap(add, [(1, 2), (3, 4)]) == [3, 7]
+
+    def test_async_coroutines(self):
+        with create_executor("async", 3) as executor:
+            assert executor.map(async_square, range(5)) == [0, 1, 4, 9, 16]
+
+    def test_unknown_executor(self):
+        with self.assertRaises(ValueError):
+            create_executor("gpu")
+
+    def test_close_restarts_workers(self):
+        executor = create_executor("thread", 2)
+        executor.map(square, [1])
+        executor.close()
+        assert executor.pool is None
+        assert executor.map(square, [2]) == [4]
+        executor.close()
+
+    def test_process_isolation(self):
+        with create_executor("process", 2) as executor:
+            assert executor.isolated
+            assert os.getpid() not in executor.map(get_process_id, range(4))
+        assert not create_executor("thread").isolated
+
+    def test_initializer(self):
+        with create_executor("thread", 2, open_worker_clients, ({"test": object},)) as executor:
+            clients = executor.starmap(get_worker_id, [()] * 20)
+        assert 1 <= len(set(clients)) <= 2
+
+    def test_get_worker_client(self):
+        first_client = get_worker_client("test_thread", object)
+        assert get_worker_client("test_thread", object) is first_client
+        open_worker_clients({"test_thread": list})
+        assert get_worker_client("test_thread", object) == []
+
+    def test_release_results_after_exception(self):
+        for kind in ["serial", "thread", "process", "async"]:
+            released = []
+            with create_executor(kind, 2) as executor:
+                with self.assertRaises(ValueError):
+                    executor.starmap(square_positive, [(1,), (2,), (-1,)], release=released.append)
+            self.assertCountEqual(released, [1, 4])
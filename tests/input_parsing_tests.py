@@ -9,6 +9,8 @@ import multiprocessing
 import json
 from operations.indices import ClickhouseIndices
 from config import INPUT_PARSING_PROCESSES
+from clients.rows import create_row
+from clients.columns import ColumnBatch
 
 TEST_CONTRACT_ABI = json.loads(
     '[{"constant":true,"inputs":[],"name":"name","outputs":[{"name":"","type":"bytes32"}],"payable":false,"type":"function"},{"constant":false,"inputs":[],"name":"stop","outputs":[],"payable":false,"type":"function"},{"constant":false,"inputs":[{"name":"guy","type":"address"},{"name":"wad","type":"uint256"}],"name":"approve","outputs":[{"name":"","type":"bool"}],"payable":false,"type":"function"},{"constant":false,"inputs":[{"name":"owner_","type":"address"}],"name":"setOwner","outputs":[],"payable":false,"type":"function"},{"constant":true,"inputs":[],"name":"totalSupply","outputs":[{"name":"","type":"uint256"}],"payable":false,"type":"function"},{"constant":false,"inputs":[{"name":"src","type":"address"},{"name":"dst","type":"address"},{"name":"wad","type":"uint256"}],"name":"transferFrom","outputs":[{"name":"","type":"bool"}],"payable":false,"type":"function"},{"constant":true,"inputs":[],"name":"decimals","outputs":[{"name":"","type":"uint256"}],"payable":false,"type":"function"},{"constant":false,"inputs":[{"name":"dst","type":"address"},{"name":"wad","type":"uint128"}],"name":"push","outputs":[{"name":"","type":"bool"}],"payable":false,"type":"function"},{"constant":false,"inputs":[{"name":"name_","type":"bytes32"}],"name":"setName","outputs":[],"payable":false,"type":"function"},{"constant":false,"inputs":[{"name":"wad","type":"uint128"}],"name":"mint","outputs":[],"payable":false,"type":"function"},{"constant":true,"inputs":[{"name":"src","type":"address"}],"name":"balanceOf","outputs":[{"name":"","type":"uint256"}],"payable":false,"type":"function"},{"constant":true,"inputs":[],"name":"stopped","outputs":[{"name":"","type":"bool"}],"payable":false,"type":"function"},{"constant":false,"inputs":[{"name":"authority_","type":"address"}],"name":"setAuthority","outputs":[],"payable":false,"type":"function"},{"constant":false,"inputs":[{"name":"src","type":"address"},{"name":"wad","type":"uint128"}],"name":"pull","outputs":[{"name":"","type":"bool"}],"payable":false,"type":"function"},{"constant":true,"inputs":[],"name":"owner","outputs":[{"name":"","type":"address"}],"payable":false,"type":"function"},{"constant":false,"inputs":[{"name":"wad","type":"uint128"}],"name":"burn","outputs":[],"payable":false,"type":"function"},{"constant":true,"inputs":[],"name":"symbol","outputs":[{"name":"","type":"bytes32"}],"payable":false,"type":"function"},{"constant":false,"inputs":[{"name":"dst","type":"address"},{"name":"wad","type":"uint256"}],"name":"transfer","outputs":[{"name":"","type":"bool"}],"payable":false,"type":"function"},{"constant":false,"inputs":[],"name":"start","outputs":[],"payable":false,"type":"function"},{"constant":true,"inputs":[],"name":"authority","outputs":[{"name":"","type":"address"}],"payable":false,"type":"function"},{"constant":true,"inputs":[{"name":"src","type":"address"},{"name":"guy","type":"address"}],"name":"allowance","outputs":[{"name":"","type":"uint256"}],"payable":false,"type":"function"},{"inputs":[{"name":"symbol_","type":"bytes32"}],"payable":false,"type":"constructor"},{"anonymous":true,"inputs":[{"indexed":true,"name":"sig","type":"bytes4"},{"indexed":true,"name":"guy","type":"address"},{"indexed":true,"name":"foo","type":"bytes32"},{"indexed":true,"name":"bar","type":"bytes32"},{"indexed":false,"name":"wad","type":"uint256"},{"indexed":false,"name":"fax","type":"bytes"}],"name":"LogNote","type":"event"},{"anonymous":false,"inputs":[{"indexed":true,"name":"authority","type":"address"}],"name":"LogSetAuthority","type":"event"},{"anonymous":false,"inputs":[{"indexed":true,"name":"owner","type":"address"}],"name":"LogSetOwner","type":"event"},{"anonymous":false,"inputs":[{"indexed":true,"name":"from","type":"address"},{"indexed":true,"name":"to","type":"address"},{"indexed":false,"name":"value","type":"uint256"}],"name":"Transfer","type":"event"},{"anonymous":false,"inputs":[{"indexed":true,"name":"owner","type":"address"},{"indexed":true,"name":"spender","type":"address"},{"indexed":false,"name":"value","type":"uint256"}],"name":"Approval","type":"event"}]')
@@ -33,6 +35,7 @@ TEST_CONTRACT_BLOCK_INDEX = 'test_ethereum_contract_block'
 TEST_TRANSACTIONS_INPUT_INDEX = 'test_transactions_input'
 TEST_BLOCKS_INDEX = 'test_ethereum_blocks'
 TEST_BLOCKS_FLAG_INDEX = 'test_ethereum_blocks_flag'
+TEST_BLOCK_RANGES_INDEX = 'test_ethereum_block_ranges'
 
 
 class ClickhouseInputParsingTestCase():
@@ -45,7 +48,8 @@ class ClickhouseInputParsingTestCase():
             "contract_block": TEST_CONTRACT_BLOCK_INDEX,
             self.input_index: TEST_TRANSACTIONS_INPUT_INDEX,
             "block": TEST_BLOCKS_INDEX,
-            "block_flag": TEST_BLOCKS_FLAG_INDEX
+            "block_flag": TEST_BLOCKS_FLAG_INDEX,
+            "block_range": TEST_BLOCK_RANGES_INDEX
         }
         self.contracts = self.contracts_class(
             self.indices,
@@ -68,10 +72,9 @@ class ClickhouseInputParsingTestCase():
     def test_decode_inputs_batch_sync(self):
         """Test decode inputs batch"""
         response = inputs._decode_inputs_batch_sync({
-            "0x1": (TEST_CONTRACT_ABI, TEST_CONTRACT_PARAMETERS),
-            "0x2": (TEST_CONTRACT_ABI, TEST_CONTRACT_EVENT_PARAMETERS)
-        })
-        print(response['0x2'])
+            "0x1": (TEST_CONTRACT_ADDRESS, TEST_CONTRACT_PARAMETERS),
+            "0x2": (TEST_CONTRACT_ADDRESS, TEST_CONTRACT_EVENT_PARAMETERS)
+        }, {TEST_CONTRACT_ADDRESS: TEST_CONTRACT_ABI})
         self.assertSequenceEqual(response, {
             "0x1": TEST_CONTRACT_DECODED_PARAMETERS,
             "0x2": TEST_CONTRACT_DECODED_EVENT_PARAMETERS
@@ -79,18 +82,65 @@ class ClickhouseInputParsingTestCase():
 
     def test_decode_inputs_batch(self):
         """Test decoding inputs batch in parallel mode"""
-        test_inputs = {"0x" + str(i): "input" + str(i) for i in range(100)}
-        chunks = [[("0x1", "input1")], [("0x1", "input2")]]
-        decoded_inputs = [{"0x1": "decoded_input2"}, {"0x0": "decoded_input1"}]
+        test_inputs = {"0x" + str(i): ("0x0", "input" + str(i)) for i in range(100)}
+        chunks = [[("0x1", ("0x0", "input1"))], [("0x2", ("0x1", "input2"))]]
+        self.contracts._contracts_abi = {"0x0": "abi0", "0x1": "abi1", "0x2": "abi2"}
+        decoded_inputs = [
+            ColumnBatch(["id", "name"], [["0x1"], ["decoded_input2"]]),
+            ColumnBatch(["id", "name"], [["0x0"], ["decoded_input1"]])
+        ]
 
         self.contracts._split_on_chunks = MagicMock(return_value=chunks)
-        self.contracts.pool.map = MagicMock(return_value=decoded_inputs)
+        self.contracts.executor.starmap = MagicMock(return_value=decoded_inputs)
 
         response = self.contracts._decode_inputs_batch(test_inputs)
 
         self.contracts._split_on_chunks.assert_called_with([(hash, input) for hash, input in test_inputs.items()], INPUT_PARSING_PROCESSES)
-        self.contracts.pool.map.assert_called_with(inputs._decode_inputs_batch_sync, [dict(chunk) for chunk in chunks])
-        self.assertSequenceEqual({"0x0": "decoded_input1", "0x1": "decoded_input2"}, response)
+        self.contracts.executor.starmap.assert_called_with(
+            inputs._decode_inputs_to_columns,
+            [
+                ({"0x1": ("0x0", "input1")}, {"0x0": "abi0"}, self.contracts.executor.isolated),
+                ({"0x2": ("0x1", "input2")}, {"0x1": "abi1"}, self.contracts.executor.isolated)
+            ],
+            release=inputs.release_batch
+        )
+        self.assertSequenceEqual(response.to_docs(), [
+            {"id": "0x1", "name": "decoded_input2"},
+            {"id": "0x0", "name": "decoded_input1"}
+        ])
+
+    def test_decode_inputs_to_columns(self):
+        """Test decoding inputs batch to columns, undecoded inputs are skipped"""
+        batch = inputs._decode_inputs_to_columns({
+            "0x1": (TEST_CONTRACT_ADDRESS, TEST_CONTRACT_PARAMETERS),
+            "0x2": (TEST_CONTRACT_ADDRESS, "0x00000000")
+        }, {TEST_CONTRACT_ADDRESS: TEST_CONTRACT_ABI})
+        self.assertSequenceEqual(batch.to_docs(), [dict(TEST_CONTRACT_DECODED_PARAMETERS, id="0x1")])
+
+    def test_compile_abi(self):
+        """Test compiling ABI to a table of methods and events by selectors"""
+        dispatch_table = inputs._compile_abi(TEST_CONTRACT_ABI)
+        self.assertSequenceEqual(dispatch_table[bytes.fromhex("a9059cbb")], [("transfer", ["address", "uint256"])])
+        self.assertSequenceEqual(dispatch_table[bytes.fromhex("ddf252ad")],
+                                 [("Transfer", ["address", "address", "uint256"])])
+        assert all(len(methods) == 1 for methods in dispatch_table.values())
+
+    def test_get_dispatch_table_cached(self):
+        """Test ABI of each contract is compiled once"""
+        inputs._compile_abi_json.cache_clear()
+        with patch.object(inputs, "_compile_abi", wraps=inputs._compile_abi) as compile_abi:
+            first_table = inputs._get_dispatch_table(TEST_CONTRACT_ADDRESS, TEST_CONTRACT_ABI)
+            second_table = inputs._get_dispatch_table(TEST_CONTRACT_ADDRESS, TEST_CONTRACT_ABI)
+        assert first_table is second_table
+        compile_abi.assert_called_once_with(TEST_CONTRACT_ABI)
+
+    def test_get_dispatch_table_of_changed_abi(self):
+        """Test changed ABI of a contract is compiled again"""
+        inputs._compile_abi_json.cache_clear()
+        first_table = inputs._get_dispatch_table(TEST_CONTRACT_ADDRESS, TEST_CONTRACT_ABI)
+        second_table = inputs._get_dispatch_table(TEST_CONTRACT_ADDRESS, TEST_CONTRACT_ABI[:1])
+        assert first_table is not second_table
+        assert len(second_table) == 1
 
     def add_contracts_with_and_without_abi(self):
         """Add 10 contracts with no ABI at all, 10 contracts with abi_extracted flag and 5 contracts with ABI"""
@@ -161,10 +211,10 @@ class ClickhouseInputParsingTestCase():
     def test_decode_inputs_for_contracts_iterate_arguments(self):
         """Test arguments for iterate method (should pass contracts and max block)"""
         test_contracts = [
-            {"_source": {"address": "0x" + str(i), self.doc_type + "_inputs_decoded_block": i}}
+            create_row({"address": "0x" + str(i), self.doc_type + "_inputs_decoded_block": i})
             for i in range(10)
         ]
-        test_contracts.append({"_source": {"address": "0xa"}})
+        test_contracts.append(create_row({"address": "0xa"}))
         test_block = 100
         mock_iterate = MagicMock(return_value=[])
         mockify(self.contracts, {
@@ -183,15 +233,12 @@ class ClickhouseInputParsingTestCase():
                 raise multiprocessing.context.TimeoutError()
             return {key: "input" for key in inputs}
 
-        test_transactions = [[{
-            "_id": i * 10 + j,
-            "_source": {**self.doc, **{
-                "input": "input" + str(j)
-            }}
-        } for i in range(10)] for j in range(10)]
+        test_transactions = [[
+            create_row({**self.doc, **{"input": "input" + str(j)}}, id=i * 10 + j)
+            for i in range(10)
+        ] for j in range(10)]
         self.contracts._set_contracts_abi({TEST_CONTRACT_ADDRESS: json.dumps({"abi": i}) for i in range(10)})
         self.contracts._iterate_transactions_by_targets = MagicMock(return_value=test_transactions)
-        self.contracts._add_id_to_inputs = MagicMock()
         self.contracts.client.bulk_index = MagicMock()
         self.contracts._decode_inputs_batch = MagicMock(side_effect=exception_on_seven)
 
@@ -203,7 +250,7 @@ class ClickhouseInputParsingTestCase():
         """Test saving decoded inputs in process"""
         test_contracts = ["contract1", "contract2", "contract3"]
         test_contracts_from_elasticsearch = [
-            {"_id": contract, "_source": {"abi": contract, "address": contract + "_address"}} for contract in
+            create_row({"abi": contract, "address": contract + "_address"}, id=contract) for contract in
             test_contracts]
         mockify(self.contracts, {
             "_iterate_contracts_with_abi": MagicMock(return_value=[test_contracts_from_elasticsearch]),
@@ -225,7 +272,7 @@ class ClickhouseInputParsingTestCase():
         """Test saving max block parameter during all operation"""
         test_max_block = 1000
         test_contracts_from_elasticsearch = [
-            {"_id": "contract" + str(i), "_source": {"abi": "contract", "address": "contract_address" + str(i)}} for i
+            create_row({"abi": "contract", "address": "contract_address" + str(i)}, id="contract" + str(i)) for i
             in range(3)]
         mockify(self.contracts, {
             "_iterate_contracts_with_abi": MagicMock(return_value=[test_contracts_from_elasticsearch]),
@@ -297,7 +344,7 @@ class ClickhouseTransactionsInputParsingTestCase(ClickhouseInputParsingTestCase,
 
     def test_iterate_transactions_by_targets_ignore_transactions_with_error(self):
         """Test iterations through CALL EVM transactions without errors"""
-        self.contracts._create_transactions_request = MagicMock(return_value="id IS NOT NULL")
+        self.contracts._create_transactions_request = MagicMock(return_value=("id IS NOT NULL", []))
         test_transactions = [{
             "id": 1,
             "callType": "call"
@@ -311,7 +358,7 @@ class ClickhouseTransactionsInputParsingTestCase(ClickhouseInputParsingTestCase,
         }]
 
         self.client.bulk_index(index=TEST_TRANSACTIONS_INDEX, docs=test_transactions)
-        targets = [{"_source": {"address": TEST_CONTRACT_ADDRESS}}]
+        targets = [create_row({"address": TEST_CONTRACT_ADDRESS})]
         transactions = self.contracts._iterate_transactions_by_targets(targets, 0)
         transactions = [t["_id"] for transactions_list in transactions for t in transactions_list]
         self.assertCountEqual(transactions, ['1'])
@@ -336,8 +383,8 @@ class ClickhouseEventsInputParsingTestCase(ClickhouseInputParsingTestCase, unitt
     block_flag_name = "events_extracted"
 
     def test_iterate_transactions_restore_input_field(self):
-        test_transactions = [{"_source": self.doc}]
-        self.contracts._iterate_transactions = MagicMock(return_value=[test_transactions])
+        self.client.index(TEST_TRANSACTIONS_INDEX, self.doc, id=1)
+        self.contracts._create_transactions_request = MagicMock(return_value=("id IS NOT NULL", []))
         transactions = self.contracts._iterate_transactions_by_targets([], 0)
         transaction = next(transactions)[0]
-        assert transaction["_source"]["input"] == TEST_CONTRACT_PARAMETERS
+        assert transaction.input == TEST_CONTRACT_PARAMETERS
@@ -4,15 +4,26 @@ from operations.internal_transactions import *
 from operations.internal_transactions import \
     _get_parity_url_by_block, \
     _get_traces_sync, \
+    _get_transformed_traces_with_metrics, \
+    _release_transformed_traces, \
+    _set_trace_hashes, \
+    _set_parent_errors, \
+    _preprocess_internal_transaction, \
+    _transform_traces, \
+    _get_selectors, \
     _make_trace_requests, \
     _merge_block, \
     _make_transactions_requests, \
-    _send_jsonrpc_request
+    _send_jsonrpc_request, \
+    _unhex_fields
 from operations import internal_transactions
 import json
+import random
 import httpretty
+import pygtrie
 from unittest.mock import MagicMock, patch, call, Mock, ANY
 from clients.custom_clickhouse import CustomClickhouse
+from clients.columns import ColumnBatch
 from operations.indices import ClickhouseIndices
 import os
 from pprint import pprint
@@ -27,7 +38,9 @@ class InternalTransactionsTestCase(unittest.TestCase):
             "transaction": TEST_TRANSACTIONS_INDEX,
             "internal_transaction": TEST_INTERNAL_TRANSACTIONS_INDEX,
             "miner_transaction": TEST_MINER_TRANSACTIONS_INDEX,
-            "block_flag": TEST_BLOCKS_TRACES_EXTRACTED_INDEX
+            "bytecode": TEST_BYTECODE_INDEX,
+            "block_flag": TEST_BLOCKS_TRACES_EXTRACTED_INDEX,
+            "block_range": TEST_BLOCK_RANGES_INDEX
         }
         self.client.prepare_indices(self.indices)
         self.parity_hosts = [(None, None, TEST_PARITY_NODE)]
@@ -208,29 +221,35 @@ class InternalTransactionsTestCase(unittest.TestCase):
         Test parallel process of getting traces
         """
         test_hosts = []
-        test_traces = ["trace" + str(i + 1) for i in range(100)]
         test_blocks = [str(i + 1) for i in range(100)]
         test_chunks = [[str(j * 10 + i + 1) for i in range(10)] for j in range(10)]
         test_chunks_with_parameters = [(test_hosts, chunk) for chunk in test_chunks]
         test_map_result = [
-            ["trace" + str(j * 10 + i + 1) for i in range(10)]
+            ((
+                ColumnBatch(["hash"], [["0x{}.0".format(j)]]),
+                ColumnBatch(["hash"], [["reward{}".format(j)]]),
+                ColumnBatch(["id"], [["code{}".format(j)]])
+            ), {})
             for j in range(10)
         ]
         self.internal_transactions.parity_hosts = test_hosts
         self.internal_transactions._split_on_chunks = MagicMock(return_value=test_chunks)
-        self.internal_transactions.pool.starmap = MagicMock(return_value=test_map_result)
+        self.internal_transactions.executor.starmap = MagicMock(return_value=test_map_result)
         process = Mock(
             split=self.internal_transactions._split_on_chunks,
-            map=self.internal_transactions.pool.starmap
+            map=self.internal_transactions.executor.starmap
         )
 
-        traces = self.internal_transactions._get_traces(test_blocks)
+        internal_transactions, miner_transactions, bytecode = self.internal_transactions._get_traces(test_blocks)
 
         process.assert_has_calls([
             call.split(test_blocks, 10),
-            call.map(_get_traces_sync, test_chunks_with_parameters)
+            call.map(_get_transformed_traces_with_metrics, test_chunks_with_parameters,
+                     release=_release_transformed_traces)
         ])
-        self.assertCountEqual(test_traces, traces)
+        self.assertSequenceEqual(internal_transactions.columns, [["0x{}.0".format(j) for j in range(10)]])
+        self.assertSequenceEqual(miner_transactions.columns, [["reward{}".format(j) for j in range(10)]])
+        self.assertSequenceEqual(bytecode.columns, [["code{}".format(j) for j in range(10)]])
 
     def test_set_trace_hashes(self):
         """
@@ -245,7 +264,7 @@ class InternalTransactionsTestCase(unittest.TestCase):
         }, {
             "transactionHash": "0x1"
         }]
-        self.internal_transactions._set_trace_hashes(transactions)
+        _set_trace_hashes(transactions)
         assert transactions[0]["hash"] == "0x1.0"
         assert transactions[1]["hash"] == "0x1.1"
         assert transactions[2]["hash"] == "0x2.0"
@@ -262,7 +281,7 @@ class InternalTransactionsTestCase(unittest.TestCase):
             "transactionHash": None,
             "blockHash": "0x1"
         }]
-        self.internal_transactions._set_trace_hashes(transactions)
+        _set_trace_hashes(transactions)
         assert transactions[0]["hash"] == "0x1.0"
         assert transactions[1]["hash"] == "0x1.1"
 
@@ -281,7 +300,7 @@ class InternalTransactionsTestCase(unittest.TestCase):
             "transactionHash": "0x2",
             "traceAddress": [1]
         }]
-        self.internal_transactions._set_parent_errors(trace)
+        _set_parent_errors(trace)
         assert trace[1]["parent_error"]
         assert "parent_error" not in trace[2].keys()
 
@@ -297,7 +316,7 @@ class InternalTransactionsTestCase(unittest.TestCase):
             "error": "Out of gas",
             "traceAddress": [1]
         }]
-        self.internal_transactions._set_parent_errors(trace)
+        _set_parent_errors(trace)
         assert "parent_error" not in trace[0].keys()
 
     def test_set_parent_error_internal_node(self):
@@ -318,7 +337,7 @@ class InternalTransactionsTestCase(unittest.TestCase):
             "transactionHash": "0x1",
             "traceAddress": [2]
         }]
-        self.internal_transactions._set_parent_errors(trace)
+        _set_parent_errors(trace)
         assert "parent_error" in trace[2].keys()
         assert "parent_error" not in trace[3].keys()
         assert "parent_error" not in trace[0].keys()
@@ -340,76 +359,205 @@ class InternalTransactionsTestCase(unittest.TestCase):
             "transactionHash": "0x1",
             "traceAddress": [1, 2, 3]
         }]
-        self.internal_transactions._set_parent_errors(trace)
+        _set_parent_errors(trace)
         assert "parent_error" in trace[-1].keys()
 
+    def _set_parent_errors_with_trie(self, trace):
+        """
+        Reference implementation of _set_parent_errors based on prefix trees
+        """
+        errors = {}
+        for transaction in trace:
+            if "error" in transaction.keys():
+                if transaction["transactionHash"] not in errors.keys():
+                    errors[transaction["transactionHash"]] = pygtrie.Trie()
+                errors[transaction["transactionHash"]][transaction["traceAddress"]] = True
+        for transaction in trace:
+            if transaction["transactionHash"] in errors.keys():
+                prefix_exists = bool(
+                    errors[transaction["transactionHash"]].shortest_prefix(transaction["traceAddress"]))
+                is_node = errors[transaction["transactionHash"]].has_key(transaction["traceAddress"])
+                if prefix_exists and not is_node:
+                    transaction["parent_error"] = True
+
+    def _generate_calls(self, generator, transaction_hash, trace_address):
+        """
+        Generate random trace of a transaction in depth-first order
+        """
+        trace = [{"transactionHash": transaction_hash, "traceAddress": trace_address}]
+        if generator.random() < 0.3:
+            trace[0]["error"] = "Out of gas"
+        subtraces = generator.randint(0, 3) if len(trace_address) < 4 else 0
+        for index in range(subtraces):
+            trace += self._generate_calls(generator, transaction_hash, trace_address + [index])
+        return trace
+
+    def test_set_parent_errors_random_traces(self):
+        """
+        Test set parent errors gives the same result as prefix trees on random traces
+        """
+        generator = random.Random(0)
+        for _ in range(200):
+            trace = [
+                transaction
+                for index in range(generator.randint(1, 5))
+                for transaction in self._generate_calls(generator, "0x{}".format(index), [])
+            ]
+            expected_trace = [dict(transaction) for transaction in trace]
+            self._set_parent_errors_with_trie(expected_trace)
+            _set_parent_errors(trace)
+            self.assertSequenceEqual(trace, expected_trace)
+
     def test_preprocess_internal_transaction_with_empty_field(self):
-        self.internal_transactions._preprocess_internal_transaction({"action": None})
+        _preprocess_internal_transaction({"action": None})
         assert True
 
-    def test_preprocess_internal_transaction_value(self):
-        transaction = self.internal_transactions._preprocess_internal_transaction({"value": hex(int(50.001851 * 1e18))})
-        assert transaction["value"] == 50.001851
+    def test_preprocess_internal_transaction_flatten(self):
+        transaction = _preprocess_internal_transaction(
+            {"action": {"value": "0x1"}, "result": {"gasUsed": "0x2"}})
+        self.assertSequenceEqual(transaction, {"value": "0x1", "gasUsed": "0x2"})
+
+    def test_unhex_fields_value(self):
+        transactions = [{"value": hex(50001851 * 10 ** 12)}]
+        _unhex_fields(transactions, NUMERIC_FIELDS)
+        assert transactions[0]["value"] == 50001851 * 10 ** 12
 
-    def test_preprocess_internal_transaction_gas_used(self):
-        transaction = self.internal_transactions._preprocess_internal_transaction({"gasUsed": hex(10000)})
-        print(transaction["gasUsed"])
-        assert transaction["gasUsed"] == 10000
+    def test_unhex_fields_exact_integers(self):
+        transactions = [{"value": hex(2 ** 255 + 1), "gasPrice": hex(10 ** 18 + 1), "gasUsed": hex(10000)}]
+        _unhex_fields(transactions, NUMERIC_FIELDS)
+        assert transactions[0]["value"] == 2 ** 255 + 1
+        assert transactions[0]["gasPrice"] == 10 ** 18 + 1
+        assert transactions[0]["gasUsed"] == 10000
 
-    def test_preprocess_internal_transaction_gas_price(self):
-        transaction = self.internal_transactions._preprocess_internal_transaction(
-            {"gasPrice": hex(int(10.1 * 10 ** 18))})
-        assert transaction["gasPrice"] == 10.1
+    def test_unhex_fields_gas_and_balance(self):
+        transactions = [{"gas": "0xd0110", "balance": "0x10"}, {"gas": "0xd0110"}]
+        _unhex_fields(transactions, NUMERIC_FIELDS)
+        self.assertSequenceEqual(transactions, [{"gas": 0xd0110, "balance": 16}, {"gas": 0xd0110}])
 
-    def test_preprocess_internal_transaction_empty_value(self):
-        transaction = self.internal_transactions._preprocess_internal_transaction({"value": "0x"})
-        assert transaction["value"] == 0
+    def test_unhex_fields_empty_value(self):
+        transactions = [{"value": "0x"}, {"value": None}, {"value": 1}]
+        _unhex_fields(transactions, NUMERIC_FIELDS)
+        self.assertSequenceEqual([transaction["value"] for transaction in transactions], [0, None, 1])
+
+    def test_transform_traces(self):
+        """
+        Test preparing traces of blocks for insert
+        """
+        trace = [{
+            "transactionHash": "0x1",
+            "blockHash": "0x0",
+            "traceAddress": [],
+            "error": "Reverted",
+            "action": {"value": "0x10", "to": "0x2"},
+            "result": None
+        }, {
+            "transactionHash": "0x1",
+            "blockHash": "0x0",
+            "traceAddress": [0],
+            "action": {"value": "0x0"},
+            "result": {"gasUsed": "0x5208"}
+        }, {
+            "transactionHash": None,
+            "blockHash": "0x0",
+            "traceAddress": [],
+            "action": {"author": "0x3", "value": "0x1bc16d674ec80000"}
+        }]
+        internal_transactions, miner_transactions, bytecode = _transform_traces(trace)
+        internal_docs = internal_transactions.to_docs()
+        miner_docs = miner_transactions.to_docs()
+        self.assertSequenceEqual([doc["hash"] for doc in internal_docs], ["0x1.0", "0x1.1"])
+        self.assertSequenceEqual([doc["value"] for doc in internal_docs], [16, 0])
+        self.assertSequenceEqual([doc["parent_error"] for doc in internal_docs], [None, True])
+        assert internal_docs[0]["to"] == "0x2"
+        assert internal_docs[1]["gasUsed"] == 21000
+        self.assertSequenceEqual([doc["hash"] for doc in miner_docs], ["0x0.0"])
+        assert miner_docs[0]["value"] == 2 * 10 ** 18
+        assert "action" not in internal_transactions.fields
+        assert not len(bytecode)
+
+    def test_transform_traces_bytecode(self):
+        """
+        Test bytecode of created contracts is replaced with its hash and saved once
+        """
+        trace = [{
+            "transactionHash": "0x{}".format(i),
+            "blockHash": "0x0",
+            "traceAddress": [],
+            "type": "create",
+            "action": {"init": "0x6060"},
+            "result": {"code": "0x60", "address": "0x{}".format(i)}
+        } for i in range(3)]
+        internal_transactions, _, bytecode = _transform_traces(trace)
+        internal_docs = internal_transactions.to_docs()
+        code = dict(zip(*bytecode.columns))
+        assert "code" not in internal_transactions.fields
+        assert "init" not in internal_transactions.fields
+        self.assertCountEqual(code.values(), ["0x6060", "0x60"])
+        self.assertSequenceEqual([code[doc["init_hash"]] for doc in internal_docs], ["0x6060"] * 3)
+        self.assertSequenceEqual([code[doc["code_hash"]] for doc in internal_docs], ["0x60"] * 3)
+        self.assertSequenceEqual([doc["selectors"] for doc in internal_docs], [[]] * 3)
+
+    def test_get_selectors(self):
+        """
+        Test selectors are taken from PUSH4 and PUSH3 instructions only
+        """
+        bytecode = "0x" + "".join([
+            "63a9059cbb",  # PUSH4 transfer(address,uint256)
+            "62fdd58e",  # PUSH3 balanceOf(address,uint256) with a leading zero byte
+            "7f" + "63" * 4 + "00" * 28,  # PUSH32 with a selector-like argument
+            "6370a08231",  # PUSH4 balanceOf(address)
+            "63a9059cbb",  # repeated selector
+            "63aabb"  # truncated PUSH4 at the end of code
+        ])
+        self.assertSequenceEqual(_get_selectors(bytecode), [
+            bytes.fromhex("a9059cbb"),
+            bytes.fromhex("00fdd58e"),
+            bytes.fromhex("70a08231")
+        ])
+        self.assertSequenceEqual(_get_selectors("0xzz"), [])
 
     def test_save_internal_transactions(self):
         """
         Test saving given transactions from trace
         """
-        test_trace = [{"transactionHash": "0x0", "hash": "0x0.{}".format(i)} for i in range(10)]
-        test_preprocessed_trace = [{
-            "hash": "0x{}".format(i),
-            "transactionHash": '0x0'
-        } for i in range(10)]
-        test_transactions_ids = [transaction["hash"] for transaction in test_preprocessed_trace]
-        test_transactions_bodies = [{key: value for key, value in transaction.items() if key is not "hash"} for
-                                    transaction in test_preprocessed_trace]
-        self.internal_transactions._preprocess_internal_transaction = MagicMock(side_effect=test_preprocessed_trace)
-
-        self.internal_transactions._save_internal_transactions(test_trace)
+        test_transactions = ColumnBatch.from_docs(
+            [{"hash": "0x{}".format(i), "transactionHash": "0x0"} for i in range(10)],
+            ["hash", "transactionHash"]
+        )
 
-        for transaction in test_trace:
-            self.internal_transactions._preprocess_internal_transaction.assert_any_call(transaction)
+        self.internal_transactions._save_internal_transactions(test_transactions)
+        self.internal_transactions.client.flush()
 
         internal_transactions = self.client.search(index=TEST_INTERNAL_TRANSACTIONS_INDEX, fields=["transactionHash"])
         internal_transactions_bodies = [transaction["_source"] for transaction in internal_transactions]
         internal_transactions_ids = [transaction["_id"] for transaction in internal_transactions]
-        self.assertCountEqual(internal_transactions_ids, test_transactions_ids)
-        self.assertCountEqual(internal_transactions_bodies, test_transactions_bodies)
-
-    def test_save_internal_transactions_ignore_rewards(self):
-        """
-        Test ignoring transactions from trace which are not attached to any ethereum transaction
-        """
-        trace = [{"transactionHash": None, "hash": "0x1"}]
-        self.internal_transactions._save_internal_transactions(trace)
-        internal_transactions = self.client.search(index=TEST_INTERNAL_TRANSACTIONS_INDEX, fields=[])
-        assert not len(internal_transactions)
+        self.assertCountEqual(internal_transactions_ids, ["0x{}".format(i) for i in range(10)])
+        self.assertCountEqual(internal_transactions_bodies, [{"transactionHash": "0x0"}] * 10)
 
     def test_save_miner_transaction(self):
         """
         Test saving transactions which are not attached to any ethereum transaction
         """
-        trace = [{"transactionHash": None, "hash": "0x1"}, {"transactionHash": "0x1"}]
-        self.internal_transactions._save_miner_transactions(trace)
+        miner_transactions = ColumnBatch.from_docs([{"transactionHash": None, "hash": "0x1"}],
+                                                   ["hash", "transactionHash"])
+        self.internal_transactions._save_miner_transactions(miner_transactions)
+        self.internal_transactions.client.flush()
         miner_transactions = self.client.search(index=TEST_INTERNAL_TRANSACTIONS_INDEX, fields=["transactionHash"])
         assert len(miner_transactions) != 0
         assert miner_transactions[0]["_id"] == "0x1"
         self.assertCountEqual(miner_transactions[0]["_source"], {"transactionHash": None})
 
+    def test_save_bytecode(self):
+        """
+        Test saving bytecode of created contracts by hash
+        """
+        bytecode = ColumnBatch(["id", "code"], [["0x1", "0x2"], ["0x6060", "0x60"]])
+        self.internal_transactions._save_bytecode(bytecode)
+        self.internal_transactions.client.flush()
+        result = self.client.search(index=TEST_BYTECODE_INDEX, fields=["code"])
+        self.assertCountEqual([(code["_id"], code["_source"]["code"]) for code in result],
+                              [("0x1", "0x6060"), ("0x2", "0x60")])
+
     def test_save_genesis(self):
         test_genesis = [{"hash": "1", "to": "0x"}]
         with open('test_genesis.json', "w") as file:
@@ -428,13 +576,15 @@ class InternalTransactionsTestCase(unittest.TestCase):
         Test process of extraction internal transactions by a given blocks chunk
         """
         test_blocks = ["0x{}".format(i) for i in range(10)]
-        test_traces = [{"transactionHash": "0x{}".format(i % 3)} for i in range(10)]
+        test_internal_transactions = ColumnBatch(["hash"], [["0x1.0"]])
+        test_miner_transactions = ColumnBatch(["hash"], [["0x2.0"]])
+        test_bytecode = ColumnBatch(["id", "code"], [["0x3"], ["0x60"]])
         mockify(self.internal_transactions, {
-            "_get_traces": MagicMock(return_value=test_traces)
+            "_get_traces": MagicMock(return_value=(test_internal_transactions, test_miner_transactions, test_bytecode))
         }, ["_extract_traces_chunk"])
         process = Mock(
             get_traces=self.internal_transactions._get_traces,
-            set_hashes=self.internal_transactions._set_trace_hashes,
+            save_bytecode=self.internal_transactions._save_bytecode,
             save_traces=self.internal_transactions._save_traces,
             save_transactions=self.internal_transactions._save_internal_transactions,
             save_rewards=self.internal_transactions._save_miner_transactions
@@ -444,38 +594,16 @@ class InternalTransactionsTestCase(unittest.TestCase):
 
         calls = [
             call.get_traces(test_blocks),
-            call.set_hashes(test_traces),
-            call.save_transactions(test_traces),
-            call.save_rewards(test_traces),
+            call.save_bytecode(test_bytecode, deduplication_token=ANY),
+            call.save_transactions(test_internal_transactions, deduplication_token=ANY),
+            call.save_rewards(test_miner_transactions, deduplication_token=ANY),
             call.save_traces(test_blocks)
         ]
         process.assert_has_calls(calls)
 
-    def test_extract_traces_chunk_set_parent_error(self):
-        """
-        Test setting parent error in a process of extraction by a given block chunk
-        """
-        test_blocks = ["0x1"]
-        test_traces = []
-        mockify(self.internal_transactions, {
-            "_get_traces": MagicMock(return_value=test_traces)
-        }, ["_extract_traces_chunk"])
-        process = Mock(
-            save_errors=self.internal_transactions._set_parent_errors,
-            save_traces=self.internal_transactions._save_internal_transactions
-        )
-
-        self.internal_transactions._extract_traces_chunk(test_blocks)
-
-        calls = [
-            call.save_errors(test_traces),
-            call.save_traces(test_traces)
-        ]
-        process.assert_has_calls(calls)
-
     def test_extract_traces_chunk_extract_genesis(self):
         test_blocks = [0]
-        test_traces = []
+        test_traces = (ColumnBatch([], []), ColumnBatch([], []), ColumnBatch([], []))
         test_blocks_no_genesis = [1]
         mockify(self.internal_transactions, {
             "_get_traces": MagicMock(return_value=test_traces)
@@ -492,8 +620,7 @@ class InternalTransactionsTestCase(unittest.TestCase):
         Test overall extraction process
         """
         test_chunks = [list(range(5)), list(range(5, 10))]
-        test_chunks_from_elasticsearch = [[{"_source": {"number": block}} for block in chunk] for chunk in test_chunks]
-        self.internal_transactions._iterate_blocks = MagicMock(return_value=test_chunks_from_elasticsearch)
+        self.internal_transactions._iterate_blocks = MagicMock(return_value=test_chunks)
         self.internal_transactions._extract_traces_chunk = MagicMock()
         process = Mock(
             iterate=self.internal_transactions._iterate_blocks,
@@ -509,7 +636,18 @@ class InternalTransactionsTestCase(unittest.TestCase):
 
     def test_iterate_blocks(self):
         self.internal_transactions.parity_hosts = [(0, 4, "http://localhost:8545"), (5, None, "http://localhost:8545")]
-        blocks = [{'number': i, 'id': i} for i in range(1, 6)]
+        blocks = [{'number': i, 'id': i} for i in range(0, 6)]
+        ranges = [
+            {'name': 'traces_extracted', 'start_block': 3, 'end_block': 4, "id": "traces_extracted.3"},
+            {"name": "other_flag", 'start_block': 0, 'end_block': 6, "id": "other_flag.0"}
+        ]
+        self.client.bulk_index(index=TEST_BLOCKS_INDEX, docs=blocks)
+        self.client.bulk_index(index=TEST_BLOCK_RANGES_INDEX, docs=ranges)
+        blocks = list(self.internal_transactions._iterate_blocks())
+        self.assertSequenceEqual(blocks, [[0, 1, 2], [5]])
+
+    def test_iterate_blocks_import_flags(self):
+        blocks = [{'number': i, 'id': i} for i in range(0, 6)]
         flags = [
             {'name': 'traces_extracted', 'value': True, "id": 3},
             {'name': 'traces_extracted', 'value': True, "id": 2},
@@ -518,19 +656,15 @@ class InternalTransactionsTestCase(unittest.TestCase):
         ]
         self.client.bulk_index(index=TEST_BLOCKS_INDEX, docs=blocks)
         self.client.bulk_index(index=TEST_BLOCKS_TRACES_EXTRACTED_INDEX, docs=flags)
-        iterator = self.internal_transactions._iterate_blocks()
-        blocks = next(iterator)
-        blocks = [block["_source"]["number"] for block in blocks]
-        self.assertCountEqual(blocks, [1, 2, 5])
+        blocks = [block for chunk in self.internal_transactions._iterate_blocks() for block in chunk]
+        self.assertCountEqual(blocks, [0, 1, 2, 4, 5])
 
     def test_save_traces(self):
-        self.internal_transactions._save_traces([123])
-        block = \
-            self.client.search(index=TEST_BLOCKS_TRACES_EXTRACTED_INDEX, query="WHERE id = '123'",
-                               fields=["name", "value"])[0][
-                '_source']
-        assert block['value']
-        assert block['name'] == 'traces_extracted'
+        self.internal_transactions._save_traces([123, 124, 126])
+        self.internal_transactions.client.flush()
+        ranges = self.client.search(index=TEST_BLOCK_RANGES_INDEX, query="WHERE name = 'traces_extracted'",
+                                    fields=["start_block", "end_block"])
+        self.assertCountEqual([(r.start_block, r.end_block) for r in ranges], [(123, 125), (126, 127)])
 
     @parity
     def test_process(self):
@@ -557,9 +691,11 @@ TEST_BLOCK_NUMBER = 3068185
 TEST_BIG_TRANSACTIONS_NUMBER = TEST_TRANSACTIONS_NUMBER * 10
 TEST_TRANSACTIONS_INDEX = 'test_ethereum_transactions'
 TEST_INTERNAL_TRANSACTIONS_INDEX = 'test_ethereum_internal_transactions'
+TEST_BYTECODE_INDEX = 'test_ethereum_bytecode'
 TEST_BLOCKS_INDEX = "test_ethereum_blocks"
 TEST_MINER_TRANSACTIONS_INDEX = 'test_ethereum_miner_transactions'
 TEST_TRANSACTION_HASH = '0x38a999ebba98a14a67ea7a83921e3e58d04a29fc55adfa124a985771f323052a'
 TEST_TRANSACTION_INPUT = '0xb1631db29e09ec5581a0ec398f1229abaf105d3524c49727621841af947bdc44'
 TEST_INCORRECT_TRANSACTION_HASH = "0x"
 TEST_BLOCKS_TRACES_EXTRACTED_INDEX = "test_ethereum_block_traces_extracted"
+TEST_BLOCK_RANGES_INDEX = "test_ethereum_block_ranges"
@@ -0,0 +1,80 @@
+import unittest
+from unittest.mock import MagicMock, patch
+from time import time
+from operations.leases import ClickhouseBlockLeases, Worker
+from tests.pipeline_tests import TestStage
+
+
+class ClickhouseBlockLeasesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.client = MagicMock()
+        self.leases = ClickhouseBlockLeases("traces", self.client, "worker1", {"block_lease": "test_block_lease"})
+
+    def test_get_state(self):
+        now = time()
+        self.client.fetch_all = MagicMock(return_value=[
+            (0, "worker1", now - 10, now + 10, 0),
+            (0, "worker2", now - 20, now + 10, 0),
+            (10, "worker1", now - 30, now - 20, 0),
+            (20, "worker2", now - 30, now + 10, 0),
+            (30, "worker2", now - 30, now - 10, 40),
+            (40, "worker1", now - 30, now - 10, 45),
+            (40, "worker1", now - 5, now + 10, 0)
+        ])
+        state = self.leases.get_state()
+        self.assertDictEqual(state, {
+            0: (0, "worker2"),
+            20: (0, "worker2"),
+            30: (40, None),
+            40: (45, "worker1")
+        })
+
+    @patch("operations.leases.sleep", MagicMock())
+    def test_claim(self):
+        self.leases.get_state = MagicMock(side_effect=[{0: (0, "worker1")}, {10: (0, "worker2")}])
+        assert self.leases.claim(0, 10)
+        assert not self.leases.claim(10, 20)
+        docs = [call[1]["docs"][0] for call in self.client.bulk_index.call_args_list]
+        self.assertSequenceEqual([(doc["start_block"], doc["owner"]) for doc in docs], [(0, "worker1"), (10, "worker1")])
+        assert 0 in self.leases.claims and 10 not in self.leases.claims
+
+    def test_heartbeat_and_done(self):
+        self.leases.claims = {0: 100}
+        self.leases.heartbeat(0, 10)
+        self.leases.done(0, 10)
+        docs = [call[1]["docs"][0] for call in self.client.bulk_index.call_args_list]
+        assert all(doc["claimed"] == 100 for doc in docs)
+        self.assertSequenceEqual([doc["done"] for doc in docs], [0, 1])
+        assert docs[0]["expires"] > time()
+        assert not self.leases.claims
+
+
+class WorkerTestCase(unittest.TestCase):
+    def test_get_candidates(self):
+        leases = MagicMock()
+        leases.get_state = MagicMock(return_value={10: (20, None), 20: (0, "worker2")})
+        stages = [TestStage("first", (0, 5), []), TestStage("second", (0, 10), [])]
+        worker = Worker(stages, leases, MagicMock(), range_size=10)
+        candidates = worker._get_candidates(45)
+        self.assertSequenceEqual(candidates, [(0, 10), (30, 40), (40, 45)])
+
+    def test_get_candidates_after_partial_lease(self):
+        leases = MagicMock()
+        leases.get_state = MagicMock(return_value={0: (10, None), 10: (15, None)})
+        stages = [TestStage("first", (0, 0), [])]
+        worker = Worker(stages, leases, MagicMock(), range_size=10)
+        self.assertSequenceEqual(worker._get_candidates(15), [])
+        self.assertSequenceEqual(worker._get_candidates(25), [(10, 20), (20, 25)])
+
+    def test_work(self):
+        log = []
+        leases = MagicMock()
+        leases.get_state = MagicMock(return_value={})
+        leases.claim = MagicMock(side_effect=lambda start, end: leases.get_state.return_value.update({
+            start: (end, None)
+        }) or True)
+        stages = [TestStage("first", (0, 0), log)]
+        worker = Worker(stages, leases, MagicMock(return_value=19), range_size=10)
+        worker.work()
+        self.assertCountEqual(log, [("first", 0, 10), ("first", 10, 20)])
+        self.assertCountEqual([call[0] for call in leases.done.call_args_list], [(0, 10), (10, 20)])
@@ -0,0 +1,72 @@
+import unittest
+import json
+import os
+import tempfile
+from urllib.request import urlopen
+from clients.metrics import Metrics
+
+
+class MetricsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.metrics = Metrics(buckets=(1, 10))
+
+    def test_inc(self):
+        self.metrics.inc("test_total", table="a")
+        self.metrics.inc("test_total", 5, table="a")
+        self.metrics.inc("test_total", table="b")
+        samples = self.metrics.get_state()["test_total"]["samples"]
+        self.assertDictEqual(samples, {(("table", "a"),): 6, (("table", "b"),): 1})
+
+    def test_observe(self):
+        for value in [0.5, 5, 50]:
+            self.metrics.observe("test_seconds", value)
+        sample = self.metrics.get_state()["test_seconds"]["samples"][()]
+        self.assertDictEqual(sample, {"buckets": [1, 2], "sum": 55.5, "count": 3})
+
+    def test_merge(self):
+        other = Metrics(buckets=(1, 10))
+        self.metrics.inc("test_total", 2)
+        self.metrics.set("test_depth", 3)
+        other.inc("test_total", 3)
+        other.set("test_depth", 1)
+        other.observe("test_seconds", 5)
+        self.metrics.merge(other.get_state())
+        state = self.metrics.get_state()
+        assert state["test_total"]["samples"][()] == 5
+        assert state["test_depth"]["samples"][()] == 1
+        assert state["test_seconds"]["samples"][()]["count"] == 1
+
+    def test_get_exposition(self):
+        self.metrics.inc("test_total", 2, table='a"b')
+        self.metrics.observe("test_seconds", 5, method="m")
+        exposition = self.metrics.get_exposition()
+        self.assertSequenceEqual(exposition.splitlines(), [
+            '# TYPE test_seconds histogram',
+            'test_seconds_bucket{method="m",le="1"} 0',
+            'test_seconds_bucket{method="m",le="10"} 1',
+            'test_seconds_bucket{method="m",le="+Inf"} 1',
+            'test_seconds_sum{method="m"} 5',
+            'test_seconds_count{method="m"} 1',
+            '# TYPE test_total counter',
+            'test_total{table="a\\"b"} 2'
+        ])
+
+    def test_write_snapshot(self):
+        self.metrics.inc("test_total", table="a")
+        path = os.path.join(tempfile.mkdtemp(), "metrics.json")
+        self.metrics.write_snapshot(path)
+        with open(path) as snapshot_file:
+            snapshot = json.load(snapshot_file)
+        self.assertDictEqual(snapshot, {
+            "test_total": {"type": "counter", "samples": [{"labels": {"table": "a"}, "value": 1}]}
+        })
+
+    def test_start_server(self):
+        self.metrics.inc("test_total")
+        server = self.metrics.start_server(0)
+        try:
+            response = urlopen("http://127.0.0.1:{}/metrics".format(server.server_port)).read().decode()
+        finally:
+            server.shutdown()
+        assert "test_total 1" in response
+        assert server.server_address[0] == "127.0.0.1"
@@ -0,0 +1,115 @@
+import unittest
+from unittest.mock import MagicMock
+from operations.pipeline import Pipeline, Stage, Follower, TokensStage
+
+
+class TestStage(Stage):
+    def __init__(self, name, processed, log, fail_on=None):
+        super().__init__()
+        self.name = name
+        self.processed = processed
+        self.log = log
+        self.fail_on = fail_on
+        self.prepared = []
+
+    def get_unprocessed(self, start, end):
+        self.prepared.append((start, end))
+        gaps = [(start, min(self.processed[0], end)), (max(self.processed[1], start), end)]
+        return [gap for gap in gaps if gap[0] < gap[1]]
+
+    def process(self, start, end):
+        if start == self.fail_on:
+            raise Exception("Test")
+        self.log.append((self.name, start, end))
+
+
+class PipelineTestCase(unittest.TestCase):
+    def test_run(self):
+        log = []
+        stages = [TestStage("first", (0, 20), log), TestStage("second", (0, 10), log)]
+        Pipeline(stages, range_size=10).run(0, 30)
+        self.assertCountEqual(log, [
+            ("second", 10, 20),
+            ("first", 20, 30),
+            ("second", 20, 30)
+        ])
+        assert log.index(("first", 20, 30)) < log.index(("second", 20, 30))
+
+    def test_finish_stages_once(self):
+        log = []
+        stage = TestStage("first", (0, 0), log)
+        stage.finish = MagicMock(side_effect=lambda: log.append(("finish",)))
+        Pipeline([stage], range_size=10).run(0, 30)
+        self.assertSequenceEqual(log, [("first", 0, 10), ("first", 10, 20), ("first", 20, 30), ("finish",)])
+
+    def test_run_without_prepare(self):
+        log = []
+        stage = TestStage("first", (0, 20), log)
+        Pipeline([stage], range_size=10).run(20, 30, prepare=False)
+        assert not stage.prepared
+        self.assertSequenceEqual(log, [("first", 20, 30)])
+
+    def test_skip_ranges_after_exception(self):
+        log = []
+        stages = [TestStage("first", (0, 0), log, fail_on=10), TestStage("second", (0, 0), log)]
+        with self.assertRaises(Exception):
+            Pipeline(stages, range_size=10, queue_size=1).run(0, 50)
+        assert ("first", 20, 30) not in log
+        assert ("second", 10, 20) not in log
+
+
+class TokensStageTestCase(unittest.TestCase):
+    def setUp(self):
+        self.stage = TokensStage.__new__(TokensStage)
+        Stage.__init__(self.stage)
+        self.stage.contract_methods = MagicMock()
+        self.stage.block_ranges = MagicMock()
+        self.stage.processed = []
+
+    def test_get_unprocessed(self):
+        self.stage.block_ranges.get_unprocessed = MagicMock(return_value=[(10, 20)])
+        self.assertSequenceEqual(self.stage.get_unprocessed(0, 20), [(10, 20)])
+        self.stage.block_ranges.get_unprocessed.assert_called_with(0, 20)
+
+    def test_save_ranges_after_search(self):
+        Pipeline([self.stage], range_size=10).run(0, 30, prepare=False)
+        self.stage.contract_methods.search_methods.assert_called_once_with()
+        self.stage.block_ranges.add.assert_called_once_with(0, 30)
+        assert not self.stage.processed
+
+    def test_skip_search_without_ranges(self):
+        self.stage.finish()
+        self.stage.contract_methods.search_methods.assert_not_called()
+        self.stage.block_ranges.add.assert_not_called()
+
+
+class FollowerTestCase(unittest.TestCase):
+    def test_follow_new_blocks(self):
+        log = []
+        stages = [TestStage("first", (0, 0), log)]
+        follower = Follower(stages, MagicMock(side_effect=[9, 9, 14]), poll_interval=0)
+        follower.follow(iterations=3)
+        self.assertSequenceEqual(log, [("first", 0, 10), ("first", 10, 15)])
+
+    def test_prepare_once(self):
+        log = []
+        stage = TestStage("first", (0, 5), log)
+        follower = Follower([stage], MagicMock(side_effect=[9, 14, 19]), poll_interval=0)
+        follower.follow(iterations=3)
+        self.assertSequenceEqual(stage.prepared, [(0, 10)])
+        self.assertSequenceEqual(log, [("first", 5, 10), ("first", 10, 15), ("first", 15, 20)])
+
+    def test_prepare_again_after_exception(self):
+        log = []
+        stage = TestStage("first", (0, 0), log, fail_on=10)
+        follower = Follower([stage], MagicMock(side_effect=[9, 14, 14]), poll_interval=0)
+        follower.follow(iterations=2)
+        stage.fail_on = None
+        follower.follow(iterations=1)
+        self.assertSequenceEqual(stage.prepared, [(0, 10), (10, 15)])
+        self.assertSequenceEqual(log, [("first", 0, 10), ("first", 10, 15)])
+
+    def test_retry_after_exception(self):
+        follower = Follower([], MagicMock(side_effect=[Exception("Test"), 9]), poll_interval=0)
+        follower.follow(iterations=2)
+        assert follower.start == 10
@@ -1,5 +1,6 @@
 import unittest
 from operations.indices import ClickhouseIndices
+from operations.internal_transactions import _get_bytecode_hash
 from tests.test_utils import TestClickhouse
 from datetime import datetime
 
@@ -22,10 +23,10 @@ class ClickhouseIndicesTestCase(unittest.TestCase):
             "output": "0x0000000000000000000000000000000000000000000000000000000000000000",
             "input": "0x70a08231000000000000000000000000bda109309f9fafa6dd6a9cb9f1df4085b27ee8ef",
             "gasUsed": 100000,
-            "gasPrice": 10,
+            "gasPrice": 10 ** 10,
             "transactionPosition": 133,
             "blockNumber": 5846858,
-            "gas": "0xd0110",
+            "gas": 852240,
             "from": "0x4b79366182ddd0dce4b1282498ffcc76dc37668e",
             "to": "0xf53ad2c6851052a81b42133467480961b2321c09",
             "value": 0,
@@ -44,10 +45,10 @@ class ClickhouseIndicesTestCase(unittest.TestCase):
             "output": "0x0000000000000000000000000000000000000000000000000000000000000001",
             "input": "0x32921690000000000000000000000000606ddac6f2928369e8515340f8de97fe2d1667770000000000000000000000000000000000000000000000000000000000000001",
             "gasUsed": 10000,
-            "gasPrice": 10.1,
+            "gasPrice": 10 ** 10,
             "transactionPosition": 8,
             "blockNumber": 3147251,
-            "gas": "0x1b30f",
+            "gas": 111375,
             "from": "0x68c769478002b2e2db64fe3be55c943fe4fbd6b1",
             "to": "0x606ddac6f2928369e8515340f8de97fe2d166777",
             "value": 0,
@@ -65,10 +66,10 @@ class ClickhouseIndicesTestCase(unittest.TestCase):
             "output": "0x0000000000000000000000000000000000000000000000000000000000000000",
             "input": "0x524f38890000000000000000000000000000000000000000000000000000000000000020000000000000000000000000000000000000000000000000000000000000000355524c0000000000000000000000000000000000000000000000000000000000",
             "gasUsed": 10000,
-            "gasPrice": 10.1,
+            "gasPrice": 10 ** 10,
             "transactionPosition": 30,
             "blockNumber": 3609421,
-            "gas": "0x2687f",
+            "gas": 157823,
             "from": "0xa545da30f0a7cb1d3eafa7e4add768d66a993be1",
             "to": "0x001a589dda0d6be37632925eaf1256986b2c6ad0",
             "value": 0,
@@ -86,10 +87,10 @@ class ClickhouseIndicesTestCase(unittest.TestCase):
             "output": "0x0000000000000000000000000000000000000000000000000000000000000000",
             "input": "0x5035db4a0000000000000000000000000000000000000000000000000000000000000001000000000000000000000000caa216e03ee4932941ef0729f250e297fd5655ad",
             "gasUsed": 10000,
-            "gasPrice": 10.1,
+            "gasPrice": 10 ** 10,
             "transactionPosition": 1,
             "blockNumber": 3241777,
-            "gas": "0xae05",
+            "gas": 44549,
             "from": "0xfdc77b9cb732eb8c896b152e28294521f5f62e67",
             "to": "0xfdc77b9cb732eb8c896b152e28294521f5f62e67",
             "value": 0,
@@ -98,16 +99,16 @@ class ClickhouseIndicesTestCase(unittest.TestCase):
         "create": {
             "hash": 5,
             "blockHash": "0x5ce9b8599ad120469b35ca06f597ab89e558ce65c07dbd6c48e95987ba2cd050",
-            "init": "0x6060604052346100005760405161136138038061136183398101604090815281516020830151918301519201915b805b83835b815160019081019055600033600160a060020a03166003825b505550600160a060020a033316600090815261010260205260408120600190555b82518110156100ee57828181518110156100005790602001906020020151600160a060020a0316600282600201610100811015610000570160005b5081905550806002016101026000858481518110156100005790602001906020020151600160a060020a03168152602001908152602001600020819055505b60010161006c565b60008290555b5050506101058190556101126401000000006111f161012182021704565b610107555b505b50505061012b565b6201518042045b90565b6112278061013a6000396000f300606060405236156100e05763ffffffff60e060020a600035041663173825d981146101365780632f54bf6e146101515780634123cb6b1461017e578063523750931461019d5780635c52c2f5146101bc578063659010e7146101cb5780637065cb48146101ea578063746c917114610205578063797af62714610224578063b20d30a914610248578063b61d27f61461025a578063b75c7dc614610295578063ba51a6df146102a7578063c2cf7326146102b9578063c41a360a146102e9578063cbf0b0c014610315578063f00d4b5d14610330578063f1736d8614610351575b6101345b60003411156101315760408051600160a060020a033316815234602082015281517fe1fffcc4923d04b559f4d29a8bfc6cda04eb5b0d3c460751c2402c5c5cc9109c929181900390910190a15b5b565b005b3461000057610134600160a060020a0360043516610370565b005b346100005761016a600160a060020a036004351661045d565b604080519115158252519081900360200190f35b346100005761018b61047e565b60408051918252519081900360200190f35b346100005761018b610484565b60408051918252519081900360200190f35b346100005761013461048b565b005b346100005761018b6104c3565b60408051918252519081900360200190f35b3461000057610134600160a060020a03600435166104ca565b005b346100005761018b6105b9565b60408051918252519081900360200190f35b346100005761016a6004356105bf565b604080519115158252519081900360200190f35b34610000576101346004356108a7565b005b346100005761018b60048035600160a060020a03169060248035916044359182019101356108e0565b60408051918252519081900360200190f35b3461000057610134600435610aa3565b005b3461000057610134600435610b4e565b005b346100005761016a600435600160a060020a0360243516610bd0565b604080519115158252519081900360200190f35b34610000576102f9600435610c25565b60408051600160a060020a039092168252519081900360200190f35b3461000057610134600160a060020a0360043516610c45565b005b3461000057610134600160a060020a0360043581169060243516610c83565b005b346100005761018b610d7c565b60408051918252519081900360200190f35b600060003660405180838380828437820191505092505050604051809103902061039981610d83565b1561045657600160a060020a0383166000908152610102602052604090205491508115156103c657610456565b60016001540360005411156103da57610456565b6000600283610100811015610000570160005b5055600160a060020a03831660009081526101026020526040812055610411610f1e565b610419610fee565b60408051600160a060020a038516815290517f58619076adf5bb0943d100ef88d52d7c3fd691b19d3a9071b555b651fbf418da9181900360200190a15b5b5b505050565b600160a060020a03811660009081526101026020526040812054115b919050565b60015481565b6101075481565b6000366040518083838082843782019150509250505060405180910390206104b281610d83565b156104be576000610106555b5b5b50565b6101065481565b6000366040518083838082843782019150509250505060405180910390206104f181610d83565b156105b3576104ff8261045d565b15610509576105b3565b610511610f1e565b60015460fa901061052457610524610fee565b5b60015460fa9010610535576105b3565b60018054810190819055600160a060020a03831690600290610100811015610000570160005b5055600154600160a060020a03831660008181526101026020908152604091829020939093558051918252517f994a936646fe87ffe4f1e469d3d6aa417d6b855598397f323de5b449f765f0c3929181900390910190a15b5b5b5050565b60005481565b60006000826105cd81610d83565b1561089d5760008481526101086020526040902054600160a060020a03161561089d5760008481526101086020526040908190208054600180830154935160029384018054600160a060020a0390941695949093919283928592918116156101000260001901160480156106825780601f1061065757610100808354040283529160200191610682565b820191906000526020600020905b81548152906001019060200180831161066557829003601f168201915b505091505060006040518083038185876185025a03f19250505091507fe7c957c06e9a662c1a6c77366179f5b702b97651dc28eee7d5bf1dff6e40bb4a338561010860008860001916600019168152602001908152602001600020600101546101086000896000191660001916815260200190815260200160002060000160009054906101000a9004600160a060020a031661010860008a600019166000191681526020019081526020016000206002016040518086600160a060020a0316600160a060020a03168152602001856000191660001916815260200184815260200183600160a060020a0316600160a060020a03168152602001806020018281038252838181546001816001161561010002031660029004815260200191508054600181600116156101000203166002900480156108005780601f106107d557610100808354040283529160200191610800565b820191906000526020600020905b8154815290600101906020018083116107e357829003601f168201915b5050965050505050505060405180910390a16000848152610108602052604081208054600160a060020a0319168155600180820183905560028083018054858255939493909281161561010002600019011604601f8190106108625750610894565b601f01602090049060005260206000209081019061089491905b80821115610890576000815560010161087c565b5090565b5b505050600192505b5b5b5b5050919050565b6000366040518083838082843782019150509250505060405180910390206108ce81610d83565b156105b3576101058290555b5b5b5050565b60006108eb3361045d565b15610a985760003643604051808484808284378201915050828152602001935050505060405180910390209050610921816105bf565b158015610944575060008181526101086020526040902054600160a060020a0316155b15610a985760008181526101086020908152604082208054600160a060020a038916600160a060020a0319909116178155600180820188905560029182018054818652948490209094601f928116156101000260001901169290920481019290920481019185919087908390106109c65782800160ff198235161785556109f3565b828001600101855582156109f3579182015b828111156109f35782358255916020019190600101906109d8565b5b50610a149291505b80821115610890576000815560010161087c565b5090565b505060408051828152600160a060020a033381811660208401529282018790528716606082015260a0608082018181529082018590527f1733cbb53659d713b79580f79f3f9ff215f78a7c7aa45890f3b89fc5cddfbf32928492909188918a918991899160c082018484808284376040519201829003995090975050505050505050a15b5b5b5b949350505050565b600160a060020a033316600090815261010260205260408120549080821515610acb57610b47565b50506000828152610103602052604081206001810154600284900a929083161115610b475780546001908101825581018054839003905560408051600160a060020a03331681526020810186905281517fc7fb647e59b18047309aa15aad418e5d7ca96d173ad704f1031a2c3d7591734b929181900390910190a15b5b50505050565b600036604051808383808284378201915050925050506040518091039020610b7581610d83565b156105b357600154821115610b89576105b3565b6000829055610b96610f1e565b6040805183815290517facbdb084c721332ac59f9b8e392196c9eb0e4932862da8eb9beaf0dad4f550da9181900360200190a15b5b5b5050565b600082815261010360209081526040808320600160a060020a038516845261010290925282205482811515610c085760009350610c1c565b8160020a9050808360010154166000141593505b50505092915050565b6000600282600101610100811015610000570160005b505490505b919050565b600036604051808383808284378201915050925050506040518091039020610c6c81610d83565b156105b35781600160a060020a0316ff5b5b5b5050565b6000600036604051808383808284378201915050925050506040518091039020610cac81610d83565b15610b4757610cba8361045d565b15610cc457610b47565b600160a060020a038416600090815261010260205260409020549150811515610cec57610b47565b610cf4610f1e565b82600160a060020a0316600283610100811015610000570160005b5055600160a060020a0380851660008181526101026020908152604080832083905593871680835291849020869055835192835282015281517fb532073b38c83145e3e5135377a08bf9aab55bc0fd7c1179cd4fb995d2a5159c929181900390910190a15b5b5b50505050565b6101055481565b600160a060020a033316600090815261010260205260408120548180821515610dab57610f14565b60008581526101036020526040902080549092501515610e3f576000805483556001808401919091556101048054918201808255828015829011610e1457600083815260209020610e149181019083015b80821115610890576000815560010161087c565b5090565b5b50505060028301819055610104805487929081101561000057906000526020600020900160005b50555b8260020a90508082600101541660001415610f145760408051600160a060020a03331681526020810187905281517fe1c52dc63b719ade82e8bea94cc41a0d5d28e4aaf536adb5e9cccc9ff8c1aeda929181900390910190a1815460019011610f015760008581526101036020526040902060020154610104805490919081101561000057906000526020600020900160005b506000908190558581526101036020526040812081815560018082018390556002909101919091559350610f14565b8154600019018255600182018054821790555b5b5b505050919050565b6101045460005b81811015610fe157610108600061010483815481101561000057906000526020600020900160005b50548152602081019190915260400160009081208054600160a060020a0319168155600180820183905560028083018054858255939493909281161561010002600019011604601f819010610fa25750610fd4565b601f016020900490600052602060002090810190610fd491905b80821115610890576000815560010161087c565b5090565b5b5050505b600101610f25565b6105b361111d565b5b5050565b60015b6001548110156104be575b6001548110801561101e5750600281610100811015610000570160005b505415155b1561102b57600101610ffc565b5b600160015411801561105057506002600154610100811015610000570160005b5054155b15611064576001805460001901905561102c565b6001548110801561108857506002600154610100811015610000570160005b505415155b80156110a45750600281610100811015610000570160005b5054155b15611114576002600154610100811015610000570160005b5054600282610100811015610000570160005b5055806101026000600283610100811015610000570160005b505481526020019081526020016000208190555060006002600154610100811015610000570160005b50555b610ff1565b5b50565b6101045460005b8181101561119a5761010481815481101561000057906000526020600020900160005b50541561119157610103600061010483815481101561000057906000526020600020900160005b505481526020810191909152604001600090812081815560018101829055600201555b5b600101611124565b6101048054600080835591909152610456907f4c0be60200faa20559308cb7b5a1bb3255c16cb1cab91f525b5ae7a03d02fabe908101905b80821115610890576000815560010161087c565b5090565b5b505b5050565b6201518042045b905600a165627a7a72305820f0fdc796f510b51e8b2e979ceb3cecb8cc5ce8eee4fdb2e1256c0c2f9a329ef400290000000000000000000000000000000000000000000000000000000000000060000000000000000000000000000000000000000000000000000000000000000200000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000",
-            "code": "0x",
+            "init_hash": "0x9c0c7ac57ebd9edb27d8a9fc4bdc2eb3c71fb18c6fc52d2b1a8a2e26c7b87b1a",
+            "code_hash": "0xa54942c8e365f3784f38b8d437f9d708290db60738b00cdcfb934c32d1be97f3",
             "traceAddress": [],
             "error": "Out of gas",
             "type": "create",
             "transactionHash": "0xdf3e180ba2a69002230655c8a2b568b855cfdf250b225c581df5acc470cde35e",
             "transactionPosition": 0,
             "blockNumber": 3510702,
-            "gas": "0x6134",
-            "gasPrice": 10.1,
+            "gas": 24884,
+            "gasPrice": 10 ** 10,
             "gasUsed": 10000,
             "from": "0xd8213dd9e21626f45b4e28b85e15f90bc11cd2fe",
             "value": 0,
@@ -120,7 +121,7 @@ class ClickhouseIndicesTestCase(unittest.TestCase):
             "blockHash": "0xffe458f4eb5fddb9c5446e6f5aef2344644e91db13dc7c53aeaebfb9d03efb67",
             "address": "0x0dad1d600347bbb5f8b93a5a1017a5cfc07120db",
             "transactionPosition": 22,
-            "balance": "0x0",
+            "balance": 0,
             "traceAddress": [
                 0
             ],
@@ -137,13 +138,13 @@ class ClickhouseIndicesTestCase(unittest.TestCase):
             "type": "reward",
             "subtraces": 0,
             "author": "0x3dfcf2bf579c831a03379a140b74f884e49caff3",
-            "value": 5,
+            "value": 5 * 10 ** 18,
             "blockNumber": 51259,
         },
         "reward_uncle": {
             "hash": 8,
             "blockHash": "0xcaf341d0bc00339b91cd09a914777b9b3eae79d2c40053609a0fa321035e8428",
-            "value": 3.75,
+            "value": 375 * 10 ** 16,
             "type": "reward",
             "subtraces": 0,
             "traceAddress": [],
@@ -197,6 +198,83 @@ class ClickhouseIndicesTestCase(unittest.TestCase):
         result = [transaction["_id"] for transaction in result]
         self.assertCountEqual(result, [str(i + 1) for i in range(len(self._test_transactions))])
 
+    def test_migrate_internal_transaction_columns(self):
+        self.client.send_sql_request("""
+            CREATE TABLE {} (
+                id String, value Nullable(Float64), gasPrice Nullable(Float64), gas Nullable(String),
+                gasUsed Nullable(Int32), balance Nullable(String)
+            ) ENGINE = ReplacingMergeTree() ORDER BY id
+        """.format(TEST_INDICES["internal_transaction"]))
+        self.client.bulk_index(index=TEST_INDICES["internal_transaction"], docs=[
+            {
+                "id": 1, "value": 1.5, "gasPrice": 2e-8, "gas": "0x5208", "gasUsed": 21000,
+                "balance": "0xde0b6b3a7640000"
+            },
+            {"id": 2, "value": None, "gasPrice": None, "gas": None, "gasUsed": None, "balance": None}
+        ])
+        self.indices.prepare_indices()
+        self.indices.prepare_indices()
+        result = self.client.search(
+            index=TEST_INDICES["internal_transaction"],
+            fields=["value", "gasPrice", "gas", "gasUsed", "balance"]
+        )
+        result = {transaction["_id"]: transaction["_source"] for transaction in result}
+        self.assertDictEqual(result["1"], {
+            "value": 15 * 10 ** 17,
+            "gasPrice": 2 * 10 ** 10,
+            "gas": 21000,
+            "gasUsed": 21000,
+            "balance": 10 ** 18
+        })
+        assert result["2"]["value"] is None
+
+    def test_add_missing_columns(self):
+        self.client.send_sql_request("""
+            CREATE TABLE {} (id String, blockNumber Int64) ENGINE = ReplacingMergeTree() ORDER BY id
+        """.format(TEST_INDICES["internal_transaction"]))
+        self.indices.prepare_indices()
+        columns = self.indices._get_column_types(TEST_INDICES["internal_transaction"])
+        assert columns["code_hash"] == "Nullable(String)"
+        assert columns["selectors"] == "Array(FixedString(4))"
+
+    def test_migrate_bytecode(self):
+        self.client.send_sql_request("""
+            CREATE TABLE {} (
+                id String, blockNumber Int64, type String, code Nullable(String), init Nullable(String)
+            ) ENGINE = ReplacingMergeTree() ORDER BY id
+        """.format(TEST_INDICES["internal_transaction"]))
+        self.client.bulk_index(index=TEST_INDICES["internal_transaction"], docs=[
+            {"id": 1, "blockNumber": 1, "type": "create", "code": "0x63a9059cbb", "init": "0x6060"},
+            {"id": 2, "blockNumber": 1, "type": "call", "code": None, "init": None}
+        ])
+        self.indices.prepare_indices()
+        self.indices.prepare_indices()
+        result = self.client.search(
+            index=TEST_INDICES["internal_transaction"],
+            fields=["code_hash", "init_hash", "selectors"]
+        )
+        result = {transaction["_id"]: transaction["_source"] for transaction in result}
+        self.assertDictEqual(result["1"], {
+            "code_hash": _get_bytecode_hash("0x63a9059cbb"),
+            "init_hash": _get_bytecode_hash("0x6060"),
+            "selectors": [bytes.fromhex("a9059cbb")]
+        })
+        assert result["2"]["code_hash"] is None
+        bytecode = self.client.search(index=TEST_INDICES["bytecode"], fields=["code"])
+        self.assertCountEqual([code["_source"]["code"] for code in bytecode], ["0x63a9059cbb", "0x6060"])
+        assert "code" not in self.indices._get_column_types(TEST_INDICES["internal_transaction"])
+
+    def test_create_bytecode_index(self):
+        self.indices.prepare_indices()
+        self.client.bulk_index(index=TEST_INDICES["bytecode"], docs=[
+            {"id": "0x1", "code": "0x6060"},
+            {"id": "0x1", "code": "0x6060"},
+            {"id": "0x2", "code": "0x"}
+        ])
+        result = self.client.search(index=TEST_INDICES["bytecode"], fields=["code"])
+        result = [(code["_id"], code["_source"]["code"]) for code in result]
+        self.assertCountEqual([("0x1", "0x6060"), ("0x2", "0x")], result)
+
     def test_create_block_traces_extracted_index(self):
         self.indices.prepare_indices()
         self.client.bulk_index(index=TEST_INDICES["block_flag"], docs=[
@@ -317,6 +395,7 @@ TEST_INDICES = {
     "contract_description": "test_ethereum_contract_description",
     "transaction": "test_ethereum_transaction",
     "internal_transaction": "test_ethereum_internal_transaction",
+    "bytecode": "test_ethereum_bytecode",
     "listed_token": "test_ethereum_listed_token",
     "token_tx": "test_ethereum_token_transaction",
     "block": "test_ethereum_block",
@@ -325,6 +404,8 @@ TEST_INDICES = {
     "event": "test_ethereum_event",
 
     "block_flag": "test_block_traces_extracted",
+    "block_range": "test_block_range",
+    "block_lease": "test_block_lease",
     "contract_abi": "test_contract_abi",
     "contract_block": "test_contract_block",
     "transaction_fee": "test_transaction_fee",
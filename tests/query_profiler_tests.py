@@ -0,0 +1,78 @@
+import unittest
+from threading import Thread
+from unittest.mock import Mock, call, patch
+from clients.query_profiler import QueryProfiler, _get_fingerprint
+
+
+class QueryProfilerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.profiler = QueryProfiler(keep_query_ids=True)
+
+    def test_get_fingerprint(self):
+        fingerprint = _get_fingerprint("SELECT id FROM test\n  WHERE name = 'flag' AND value IN(1, 2, 3)")
+        assert fingerprint == "SELECT id FROM test WHERE name = ? AND value IN(?, ...)"
+
+    def test_query_id_contains_stage(self):
+        @self.profiler.profile_stage
+        def test_stage():
+            return self.profiler.create_query_id()
+
+        assert test_stage().startswith("test_stage:")
+        assert self.profiler.create_query_id().startswith("default:")
+
+    def test_stage_of_other_thread(self):
+        query_ids = []
+
+        @self.profiler.profile_stage
+        def test_stage():
+            thread = Thread(target=lambda: query_ids.append(self.profiler.create_query_id()))
+            thread.start()
+            thread.join()
+            with self.profiler.tag_stage("inner"):
+                query_ids.append(self.profiler.create_query_id())
+
+        test_stage()
+        assert query_ids[0].startswith("default:")
+        assert query_ids[1].startswith("inner:")
+
+    def test_skip_query_ids(self):
+        profiler = QueryProfiler()
+        profiler.record("stage:1", "SELECT 1", 0.5)
+        assert profiler.get_query_ids() == []
+
+    @patch("clients.query_profiler.MAX_QUERY_IDS", 2)
+    def test_remove_old_query_ids(self):
+        for index in range(3):
+            self.profiler.record("stage:{}".format(index), "SELECT 1", 0.5)
+        self.assertSequenceEqual(self.profiler.get_query_ids(), ["stage:1", "stage:2"])
+
+    def test_record(self):
+        query_info = Mock(progress=Mock(rows=10, bytes=100, written_rows=0), profile_info=Mock(rows=2))
+        self.profiler.record("stage:1", "SELECT 1", 0.5, query_info)
+        self.profiler.record("stage:2", "SELECT 2", 1.5, query_info)
+        self.profiler.add_query_log([("stage:1", 10, 1000, 20), ("stage:2", 10, 2000, 30)])
+        summary = self.profiler.get_summary()
+        self.assertDictEqual(summary["stage"][0], {
+            "stage": "stage",
+            "query": "SELECT ?",
+            "count": 2,
+            "elapsed": 2.0,
+            "result_rows": 4,
+            "read_rows": 20,
+            "read_bytes": 200,
+            "written_rows": 0,
+            "server_read_rows": 20,
+            "max_memory_usage": 2000,
+            "server_duration_ms": 50
+        })
+
+    def test_listeners(self):
+        listener = Mock()
+        self.profiler.add_listener(listener)
+
+        @self.profiler.profile_stage
+        def test_stage():
+            pass
+
+        test_stage()
+        listener.assert_has_calls([call.start_stage("test_stage"), call.end_stage("test_stage")])
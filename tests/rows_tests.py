@@ -0,0 +1,26 @@
+import unittest
+from clients.rows import create_row, get_row_class
+
+
+class RowsTestCase(unittest.TestCase):
+    def test_attributes(self):
+        row = get_row_class(["address", "params.type", "id"])("0x1", "uint256", "1")
+        assert row.address == "0x1"
+        assert row.params_type == "uint256"
+        assert row._id == "1"
+
+    def test_compatible_access(self):
+        row = create_row({"address": "0x1", "params.type": "uint256"}, id="1")
+        self.assertSequenceEqual(row["_source"], {"address": "0x1", "params.type": "uint256"})
+        assert row["_id"] == "1"
+        assert row == {"_id": "1", "_source": {"address": "0x1", "params.type": "uint256"}}
+
+    def test_row_without_id(self):
+        row = create_row({"number": 1})
+        assert "_id" not in row
+        assert row.get("_id") is None
+        with self.assertRaises(AttributeError):
+            row.other = 1
+
+    def test_reuse_class(self):
+        assert type(create_row({"number": 1})) is type(create_row({"number": 2}))
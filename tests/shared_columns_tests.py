@@ -0,0 +1,62 @@
+import unittest
+from unittest.mock import patch
+from clients.columns import ColumnBatch
+from clients import shared_columns
+from clients.shared_columns import share_batch, receive_batch, release_batch, SharedColumnBatch
+
+
+@unittest.skipIf(shared_columns.shared_memory is None, "Shared memory requires python 3.8+")
+class SharedColumnsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.batch = ColumnBatch(
+            ["id", "gas", "error", "value", "params.value", "params.count", "flag"],
+            [
+                ["0x1", "0x2", "0x3"],
+                [21000, None, 0],
+                [None, "Reverted", None],
+                [10 ** 18 * 100, None, 2 ** 255],
+                [["a", "ü"], [], ["b"]],
+                [[1, 2], [], [-3]],
+                [True, False, None]
+            ]
+        )
+
+    def test_round_trip(self):
+        """Test batch read from shared memory is equal to original batch"""
+        shared_batch = share_batch(self.batch)
+        assert isinstance(shared_batch, SharedColumnBatch)
+        received_batch = receive_batch(shared_batch)
+        self.assertSequenceEqual(received_batch.fields, self.batch.fields)
+        self.assertSequenceEqual(received_batch.to_docs(), self.batch.to_docs())
+
+    def test_big_integers_inline(self):
+        """Test columns that don't fit int64 are pickled as usual"""
+        shared_batch = share_batch(self.batch)
+        receive_batch(shared_batch)
+        self.assertSequenceEqual(list(shared_batch.inline_columns.keys()), ["value"])
+
+    def test_segment_removed_after_load(self):
+        """Test segment is removed when batch is received"""
+        shared_batch = share_batch(self.batch)
+        receive_batch(shared_batch)
+        with self.assertRaises(FileNotFoundError):
+            shared_columns.shared_memory.SharedMemory(name=shared_batch.name)
+
+    def test_release_batch(self):
+        """Test segment of a batch that won't be received is removed"""
+        shared_batch = share_batch(self.batch)
+        release_batch(shared_batch)
+        with self.assertRaises(FileNotFoundError):
+            shared_columns.shared_memory.SharedMemory(name=shared_batch.name)
+        release_batch(self.batch)
+
+    def test_share_empty_batch(self):
+        """Test empty batches are returned as is"""
+        batch = ColumnBatch(["id"], [[]])
+        assert share_batch(batch) is batch
+
+    def test_share_disabled(self):
+        """Test batch is returned as is if shared memory transport is disabled"""
+        with patch("clients.shared_columns.SHARED_MEMORY_TRANSPORT", False):
+            assert share_batch(self.batch) is self.batch
+        assert receive_batch(self.batch) is self.batch
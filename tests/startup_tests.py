@@ -0,0 +1,10 @@
+import unittest
+from benchmarks.startup import get_heavy_imports
+
+
+class StartupTestCase(unittest.TestCase):
+    def test_no_heavy_imports_at_startup(self):
+        """
+        Test that extractor.py imports heavy dependencies only inside commands
+        """
+        self.assertSequenceEqual(get_heavy_imports(), [])
@@ -17,18 +17,22 @@ class ClickhouseTokenHoldersTestCase(unittest.TestCase):
         self.indices = {
             "token_transaction": TEST_TOKEN_TX_INDEX,
             "event": TEST_EVENTS_INDEX,
-            "contract_description": TEST_CONTRACT_INDEX
+            "contract_description": TEST_CONTRACT_INDEX,
+            "block_range": TEST_BLOCK_RANGES_INDEX
         }
         self.client = TestClickhouse()
         self.client.prepare_indices({
             "event": TEST_EVENTS_INDEX,
-            "contract_description": TEST_CONTRACT_INDEX
+            "contract_description": TEST_CONTRACT_INDEX,
+            "block_range": TEST_BLOCK_RANGES_INDEX
         })
+        self.client.send_sql_request("DROP TABLE IF EXISTS {}_view".format(self.indices["token_transaction"]))
         self.client.send_sql_request("DROP TABLE IF EXISTS {}".format(self.indices["token_transaction"]))
         self.token_holders = ClickhouseTokenHolders(self.indices)
         self.token_holders.extract_token_transactions()
 
     def tearDown(self):
+        self.client.send_sql_request("DROP TABLE IF EXISTS {}_view".format(self.indices["token_transaction"]))
         self.client.send_sql_request("DROP TABLE IF EXISTS {}".format(self.indices["token_transaction"]))
 
     def test_big_hex_to_float_clickhouse(self):
@@ -136,6 +140,7 @@ class ClickhouseTokenHoldersTestCase(unittest.TestCase):
 TEST_CONTRACT_INDEX = 'test_ethereum_contracts'
 TEST_ITX_INDEX = 'test_ethereum_internal_txs'
 TEST_TOKEN_TX_INDEX = 'test_token_txs'
+TEST_BLOCK_RANGES_INDEX = 'test_block_ranges'
 TEST_BLOCK_INDEX = 'test_block'
 TEST_EVENTS_INDEX = 'test_ethereum_events'
 TEST_EVENT_INPUTS_INDEX = 'test_ethereum_events_inputs'
@@ -3,6 +3,7 @@ from utils import split_on_chunks, make_range_query, repeat_on_exception
 from utils import ClickhouseContractTransactionsIterator
 from tests.test_utils import TestClickhouse
 import config
+from clients.rows import create_row
 from unittest.mock import MagicMock, ANY
 from clients.custom_clickhouse import CustomClickhouse
 
@@ -51,7 +52,8 @@ class ClickhouseIteratorTestCase(unittest.TestCase):
             "contract": TEST_CONTRACTS_INDEX,
             "internal_transaction": TEST_TRANSACTIONS_INDEX,
             "contract_block": TEST_CONTRACT_BLOCK_INDEX,
-            "block_flag": TEST_BLOCK_FLAGS_INDEX
+            "block_flag": TEST_BLOCK_FLAGS_INDEX,
+            "block_range": TEST_BLOCK_RANGES_INDEX
         }
         self.client.prepare_indices(self.indices)
         self._create_contracts_iterator()
@@ -169,7 +171,8 @@ class ClickhouseIteratorTestCase(unittest.TestCase):
         self.contracts_iterator.client.iterate = MagicMock()
         self.contracts_iterator._iterate_contracts(partial_query="WHERE address IS NOT NULL", fields=test_fields)
         self.contracts_iterator.client.iterate.assert_called_with(index=ANY, query=ANY,
-                                                                  fields=test_fields + ["tx_test_block"], final=ANY)
+                                                                  fields=test_fields + ["tx_test_block"], final=ANY,
+                                                                  external_tables=ANY)
 
     def test_iterate_contracts_return_flags(self):
         test_contracts = [{
@@ -199,54 +202,60 @@ class ClickhouseIteratorTestCase(unittest.TestCase):
     def test_create_transactions_request(self):
         test_max_block = 40
         test_contracts = [
-            {"_source": {"address": "0x1", "tx_test_block": 10}},
-            {"_source": {"address": "0x2", "tx_test_block": 30}},
+            create_row({"address": "0x1", "tx_test_block": 10}),
+            create_row({"address": "0x2", "tx_test_block": 30}),
         ]
-        transactions_request = self.contracts_iterator._create_transactions_request(
+        transactions_request, external_tables = self.contracts_iterator._create_transactions_request(
             test_contracts,
             test_max_block
         )
         assert transactions_request == \
-               "(to = '0x1' AND blockNumber > 10 AND blockNumber <= 40)" + \
-               " OR (to = '0x2' AND blockNumber > 30 AND blockNumber <= 40)"
+               "(to in(SELECT address FROM target_contracts WHERE block = 10) AND blockNumber > 10 AND blockNumber <= 40)" + \
+               " OR (to in(SELECT address FROM target_contracts WHERE block = 30) AND blockNumber > 30 AND blockNumber <= 40)"
+        self.assertSequenceEqual(external_tables[0]["data"], [
+            {"address": "0x1", "block": 10},
+            {"address": "0x2", "block": 30}
+        ])
 
     def test_create_transactions_request_empty_block(self):
         test_max_block = 40
         test_contracts = [
-            {"_source": {"address": "0x1"}},
+            create_row({"address": "0x1"}),
         ]
-        transactions_request = self.contracts_iterator._create_transactions_request(
+        transactions_request, external_tables = self.contracts_iterator._create_transactions_request(
             test_contracts,
             test_max_block
         )
-        assert transactions_request == "(to = '0x1')"
+        assert transactions_request == "(to in(SELECT address FROM target_contracts WHERE block = 0))"
 
     def test_create_transactions_request_multiple_blocks(self):
         test_max_block = 40
         test_contracts = [
-            {"_source": {"address": "0x1", "tx_test_block": 10}},
-            {"_source": {"address": "0x2", "tx_test_block": 10}},
+            create_row({"address": "0x1", "tx_test_block": 10}),
+            create_row({"address": "0x2", "tx_test_block": 10}),
         ]
-        transactions_request = self.contracts_iterator._create_transactions_request(
+        transactions_request, external_tables = self.contracts_iterator._create_transactions_request(
             test_contracts,
             test_max_block
         )
-        assert transactions_request == "(to in('0x1', '0x2') AND blockNumber > 10 AND blockNumber <= 40)"
+        assert transactions_request == \
+               "(to in(SELECT address FROM target_contracts WHERE block = 10) AND blockNumber > 10 AND blockNumber <= 40)"
+        assert len(external_tables[0]["data"]) == 2
 
     def test_create_transactions_request_contract_field(self):
         test_max_block = 40
         test_contracts = [
-            {"_source": {"address": "0x1"}},
+            create_row({"address": "0x1"}),
         ]
         self.contracts_iterator.contract_field = "test_field"
-        transactions_request = self.contracts_iterator._create_transactions_request(
+        transactions_request, external_tables = self.contracts_iterator._create_transactions_request(
             test_contracts,
             test_max_block
         )
-        assert transactions_request == "(test_field = '0x1')"
+        assert transactions_request == "(test_field in(SELECT address FROM target_contracts WHERE block = 0))"
 
     def test_iterate_transactions_by_query(self):
-        self.contracts_iterator._create_transactions_request = MagicMock(return_value="id IS NOT NULL")
+        self.contracts_iterator._create_transactions_request = MagicMock(return_value=("id IS NOT NULL", []))
         documents = [{
             "id": 1,
             'to': "0x1",
@@ -257,7 +266,7 @@ class ClickhouseIteratorTestCase(unittest.TestCase):
             "from": "0x2",
         }]
         self.client.bulk_index(index=TEST_TRANSACTIONS_INDEX, docs=documents)
-        targets = [{"_source": {"address": "0x1"}}]
+        targets = [create_row({"address": "0x1"})]
         transactions = self.contracts_iterator._iterate_transactions(targets, 0, "WHERE from = '0x1'")
         transactions = [t["_id"] for transactions_list in transactions for t in transactions_list]
         self.assertCountEqual(transactions, ['1'])
@@ -277,7 +286,7 @@ class ClickhouseIteratorTestCase(unittest.TestCase):
             "id": 3
         }]
         self.client.bulk_index(index=TEST_TRANSACTIONS_INDEX, docs=test_contracts)
-        targets = [{"_source": {"address": "0x1", "tx_test_block": 1}}]
+        targets = [create_row({"address": "0x1", "tx_test_block": 1})]
         test_query = "WHERE id IS NOT NULL"
         transactions = [c for c in self.contracts_iterator._iterate_transactions(targets, 2, test_query)]
         transactions = [t["_id"] for transactions_list in transactions for t in transactions_list]
@@ -285,10 +294,25 @@ class ClickhouseIteratorTestCase(unittest.TestCase):
 
     def test_iterate_transactions_use_fields(self):
         test_fields = ["field1", "field2"]
-        self.contracts_iterator._create_transactions_request = MagicMock()
+        self.contracts_iterator._create_transactions_request = MagicMock(return_value=("", []))
         self.contracts_iterator.client.iterate = MagicMock()
         self.contracts_iterator._iterate_transactions([], 0, partial_query="WHERE to IS NOT NULL", fields=test_fields)
-        self.contracts_iterator.client.iterate.assert_called_with(index=ANY, query=ANY, fields=test_fields, final=ANY)
+        self.contracts_iterator.client.iterate.assert_called_with(index=ANY, query=ANY, fields=test_fields, final=ANY,
+                                                                  external_tables=ANY)
+
+    def test_iterate_contracts_load_watermarks_once(self):
+        self.client.bulk_index(index=TEST_CONTRACTS_INDEX, docs=[{"address": "0x1", "blockNumber": 1, "id": 1}])
+        self.client.bulk_index(index=TEST_CONTRACT_BLOCK_INDEX, docs=[{"id": 1, "name": "tx_test_block", "value": 1}])
+        self.contracts_iterator.client.fetch_all = MagicMock(side_effect=self.contracts_iterator.client.fetch_all)
+        for max_block in [1, 2]:
+            list(self.contracts_iterator._iterate_contracts(max_block, "WHERE address IS NOT NULL"))
+        self.contracts_iterator._save_max_block(["1"], 2)
+        contracts = [
+            c["_id"] for contracts in self.contracts_iterator._iterate_contracts(2, "WHERE address IS NOT NULL")
+            for c in contracts
+        ]
+        assert self.contracts_iterator.client.fetch_all.call_count == 1
+        assert contracts == []
 
     def test_save_max_block(self):
         test_max_block = 100
@@ -328,6 +352,23 @@ class ClickhouseIteratorTestCase(unittest.TestCase):
         max_block = self.contracts_iterator._get_max_block({"trace": 1})
         assert max_block == 0
 
+    def test_get_max_block_by_saved_ranges(self):
+        self.client.bulk_index(index=TEST_BLOCK_RANGES_INDEX, docs=[
+            {"id": "trace.0", "name": "trace", "start_block": 0, "end_block": 10},
+            {"id": "other.0", "name": "other", "start_block": 0, "end_block": 20}
+        ])
+        max_block = self.contracts_iterator._get_max_block({"trace": 1})
+        assert max_block == 9
+
+    def test_get_max_block_before_hole(self):
+        self.client.bulk_index(index=TEST_BLOCKS_INDEX, docs=[{"id": i, "number": i} for i in range(5, 40)])
+        self.client.bulk_index(index=TEST_BLOCK_RANGES_INDEX, docs=[
+            {"id": "trace.5", "name": "trace", "start_block": 5, "end_block": 10},
+            {"id": "trace.20", "name": "trace", "start_block": 20, "end_block": 30}
+        ])
+        max_block = self.contracts_iterator._get_max_block({"trace": 1})
+        assert max_block == 9
+
     def test_get_max_block_in_empty_index(self):
         max_block = self.contracts_iterator._get_max_block({}, 1)
         assert max_block == 1
@@ -383,6 +424,7 @@ class ClickhouseIteratorTestCase(unittest.TestCase):
 
 TEST_BLOCKS_INDEX = "test_ethereum_blocks"
 TEST_BLOCK_FLAGS_INDEX = "test_ethereum_block_flags"
+TEST_BLOCK_RANGES_INDEX = "test_ethereum_block_ranges"
 TEST_CONTRACTS_INDEX = "test_ethereum_contract"
 TEST_TRANSACTIONS_INDEX = "test_ethereum_transaction"
 TEST_CONTRACT_BLOCK_INDEX = "test_ethereum_contract_flags"
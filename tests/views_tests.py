@@ -0,0 +1,98 @@
+import unittest
+from unittest.mock import MagicMock, Mock, call, patch
+from operations.views import ClickhouseView, MAX_BLOCK
+
+TEST_INDICES = {
+    "contract": "test_contract",
+    "internal_transaction": "test_internal_transaction",
+    "block_range": "test_block_range"
+}
+
+
+class ClickhouseViewTestCase(unittest.TestCase):
+    def setUp(self):
+        self.client = MagicMock()
+        self.client.bulk_index_async = MagicMock(side_effect=lambda callback=None, **kwargs: callback())
+        self.view = ClickhouseView(
+            "contract", "internal_transaction",
+            fields="address AS id",
+            condition="type = 'create'",
+            client=self.client,
+            indices=TEST_INDICES
+        )
+        self.view.block_ranges.ranges = []
+
+    def test_get_select(self):
+        assert self.view._get_select("blockNumber < 10") == \
+            "SELECT address AS id FROM test_internal_transaction  WHERE (type = 'create') AND (blockNumber < 10)"
+
+    def test_create_target(self):
+        self.client.send_sql_request = MagicMock(return_value=None)
+        self.view.block_ranges.clear = MagicMock()
+        self.view._create_target()
+        self.view.block_ranges.clear.assert_called_with()
+        self.client.send_sql_request.assert_called_with(
+            "CREATE TABLE test_contract ENGINE = ReplacingMergeTree() ORDER BY id AS {}".format(
+                self.view._get_select("0")
+            )
+        )
+
+    def test_create_existing_target(self):
+        self.client.send_sql_request = MagicMock(return_value="ReplacingMergeTree")
+        self.view.block_ranges.clear = MagicMock()
+        self.view._create_target()
+        self.view.block_ranges.clear.assert_not_called()
+        self.client.send_sql_request.assert_called_once_with(
+            "SELECT engine FROM system.tables WHERE database = currentDatabase() AND name = 'test_contract'"
+        )
+
+    def test_create_target_over_old_view(self):
+        self.client.send_sql_request = MagicMock(return_value="MaterializedView")
+        self.view.block_ranges.clear = MagicMock()
+        with self.assertRaises(ValueError):
+            self.view._create_target()
+        self.view.block_ranges.clear.assert_not_called()
+
+    def test_skip_import_of_flags(self):
+        assert not self.view.block_ranges.import_flags
+
+    def test_populate_range(self):
+        self.view._populate_range(10, 20)
+        self.client.send_sql_request.assert_called_with("INSERT INTO test_contract {}".format(
+            self.view._get_select("blockNumber >= 10 AND blockNumber < 20")
+        ))
+        self.assertSequenceEqual(self.view.block_ranges.ranges, [(10, 20)])
+
+    @patch("operations.views.VIEW_POPULATE_BLOCKS", 10)
+    def test_create(self):
+        self.view.block_ranges.ranges = [(0, 15)]
+        self.view._get_max_block = MagicMock(return_value=34)
+        self.view._create_target = MagicMock()
+        self.view._attach_view = MagicMock()
+        self.view._populate_range = MagicMock()
+        process = Mock(
+            create_target=self.view._create_target,
+            attach_view=self.view._attach_view,
+            populate=self.view._populate_range
+        )
+
+        self.view.create()
+
+        process.assert_has_calls([
+            call.create_target(),
+            call.attach_view(),
+            call.populate(15, 25),
+            call.populate(25, 35)
+        ])
+        self.assertSequenceEqual(self.view.block_ranges.ranges, [(0, 15), (35, MAX_BLOCK)])
+
+    def test_create_populated(self):
+        self.view.block_ranges.ranges = [(0, 35), (35, MAX_BLOCK)]
+        self.view._get_max_block = MagicMock(return_value=50)
+        self.view._create_target = MagicMock()
+        self.view._attach_view = MagicMock()
+        self.view._populate_range = MagicMock()
+
+        self.view.create()
+
+        self.view._populate_range.assert_not_called()
@@ -1,5 +1,11 @@
 from config import INDICES, PROCESSED_CONTRACTS
 from time import sleep
+from operations.block_ranges import ClickhouseBlockRanges, BLOCKS_EXTRACTED
+from clients.metrics import METRICS
+
+PROCESSED_CONTRACTS_TABLE = "processed_contracts"
+CONTRACTS_TABLE = "target_contracts"
+WATERMARKS_TABLE = "contract_watermarks"
 
 
 def generate_sql_for_value(field):
@@ -26,6 +32,7 @@ def repeat_on_exception(target_function):
                 return target_function(*args)
             except Exception as e:
                 print("Exception: ", e)
+                METRICS.inc("extractor_retries_total", operation=target_function.__name__)
                 sleep(5)
     return wrapped
 
@@ -93,61 +100,105 @@ def split_on_chunks(iterable, size):
 
 
 class ClickhouseContractTransactionsIterator():
+    watermarks = None
+
+    def _load_watermarks(self):
+        """
+        Load last processed blocks of all contracts for current operation
+
+        Watermarks are loaded once and updated in memory by _save_max_block
+
+        Returns
+        -------
+        dict
+            Contract ids and block numbers
+        """
+        if self.watermarks is None:
+            self.watermarks = dict(self.client.fetch_all(
+                "SELECT id, value FROM {} FINAL WHERE name = '{}'".format(
+                    self.indices["contract_block"],
+                    self._get_flag_name()
+                )
+            ))
+        return self.watermarks
+
     def _iterate_contracts(self, max_block=None, partial_query=None, fields=[]):
+        """
+        Iterate through contracts with last processed blocks
+
+        Last processed blocks are sent from memory in a temporary table
+
+        Parameters
+        ----------
+        max_block : int
+            Skip contracts processed up to this block
+        partial_query : str
+            Additional SQL condition started with WHERE
+        fields : list
+            Contract fields to return
+
+        Returns
+        -------
+        generator
+            Generator that returns chunks of contracts with last processed block in flag field
+        """
         query = partial_query
+        external_tables = [self.client.make_external_table(
+            WATERMARKS_TABLE,
+            [("id", "String"), ("value", "Int64")],
+            [{"id": id, "value": value} for id, value in self._load_watermarks().items()]
+        )]
         if max_block is not None:
-            inner_query = "SELECT id FROM {} WHERE name = '{}' AND value >= {}".format(
-                self.indices["contract_block"],
-                self._get_flag_name(),
-                max_block
-            )
-            query += " AND id NOT in({})".format(inner_query)
+            query += " AND id NOT IN (SELECT id FROM {} WHERE value >= {})".format(WATERMARKS_TABLE, max_block)
         if PROCESSED_CONTRACTS:
-            addresses = ",".join(["'{}'".format(address) for address in PROCESSED_CONTRACTS])
-            query += " AND address in({})".format(addresses)
+            query += " AND address in {}".format(PROCESSED_CONTRACTS_TABLE)
+            external_tables.append(self.client.make_external_table(
+                PROCESSED_CONTRACTS_TABLE,
+                [("address", "String")],
+                [{"address": address} for address in PROCESSED_CONTRACTS]
+            ))
         created_index = "(SELECT * FROM {} FINAL {})".format(
             self.indices["contract"],
             query
         )
-        query = "ANY LEFT JOIN (SELECT id, value AS {1} FROM {0} FINAL WHERE name = '{1}') USING id".format(
-            self.indices["contract_block"],
-            self._get_flag_name()
+        query = "ANY LEFT JOIN (SELECT id, value AS {} FROM {}) USING id".format(
+            self._get_flag_name(),
+            WATERMARKS_TABLE
         )
         return self.client.iterate(index=created_index, query=query, fields=fields + [self._get_flag_name()],
-                                   final=False)
+                                   final=False, external_tables=external_tables)
 
     def _create_transactions_request(self, contracts, max_block):
         """
         Create SQL request to get transactions for all contracts
         from last processed block to specified block
 
+        Contract addresses are sent in a temporary table instead of the query text,
+        contracts with the same last processed block share one condition
+
         Parameters
         ----------
         contracts : list
-            Contracts info in JSON format, i.e.
-            {"_id": TRANSACTION_ID, "_source": {"document": "fields"}}
+            Contracts returned by _iterate_contracts
         max_block : int
             Block number
 
         Returns
         -------
-        dict
-            ElasticSearch request to get transactions by conditions above
+        str
+            SQL condition to get transactions by conditions above
+        list
+            Temporary tables used in condition
         """
-        max_blocks_contracts = {}
-        for contract_dict in contracts:
-            block = contract_dict["_source"].get(self._get_flag_name(), 0)
-            contract = contract_dict["_source"]["address"]
-            if block not in max_blocks_contracts.keys():
-                max_blocks_contracts[block] = []
-            max_blocks_contracts[block].append(contract)
+        groups = {}
+        for contract in contracts:
+            block = getattr(contract, self._get_flag_name(), 0)
+            groups.setdefault(block, []).append(contract.address)
+        rows = [{"address": address, "block": block} for block, addresses in groups.items() for address in addresses]
 
         query = []
-        for max_synced_block, contracts in max_blocks_contracts.items():
-            if len(contracts) == 1:
-                contracts_string = "= '{}'".format(contracts[0])
-            else:
-                contracts_string = "in({})".format(", ".join(["'{}'".format(contract) for contract in contracts]))
+        for max_synced_block in groups:
+            contracts_string = "in(SELECT address FROM {} WHERE block = {})".format(CONTRACTS_TABLE, max_synced_block)
             if max_synced_block > 0:
                 subquery = "({} {} AND blockNumber > {} AND blockNumber <= {})".format(
                     self.contract_field,
@@ -158,7 +209,12 @@ class ClickhouseContractTransactionsIterator():
             else:
                 subquery = "({} {})".format(self.contract_field, contracts_string)
             query.append(subquery)
-        return " OR ".join(query)
+        external_table = self.client.make_external_table(
+            CONTRACTS_TABLE,
+            [("address", "String"), ("block", "Int64")],
+            rows
+        )
+        return " OR ".join(query), [external_table]
 
     def _iterate_transactions(self, contracts, max_block, partial_query, fields=[]):
         """
@@ -179,9 +235,10 @@ class ClickhouseContractTransactionsIterator():
         generator
             Generator that returns unprocessed transactions
         """
-        query = partial_query
-        query += " AND " + self._create_transactions_request(contracts, max_block)
-        return self.client.iterate(index=self.indices[self.index], fields=fields, query=query, final=False)
+        condition, external_tables = self._create_transactions_request(contracts, max_block)
+        query = partial_query + " AND ({})".format(condition)
+        return self.client.iterate(index=self.indices[self.index], fields=fields, query=query, final=False,
+                                   external_tables=external_tables)
 
     def _get_flag_name(self):
         """
@@ -197,13 +254,37 @@ class ClickhouseContractTransactionsIterator():
     def _save_max_block(self, contracts, max_block):
         docs = [{"id": contract, "name": self._get_flag_name(), "value": max_block} for contract in contracts]
         self.client.bulk_index(self.indices["contract_block"], docs)
+        if self.watermarks is not None:
+            self.watermarks.update({contract: max_block for contract in contracts})
 
     def _get_max_block(self, query={}, min_consistent_block=0):
-        query_string = " OR ".join(
-            ["(name = '{}' AND value = {})".format(field, value) for field, value in query.items()])
-        sql = "SELECT MAX(toInt32(id))"
-        if query_string:
-            sql += " FROM {} WHERE {}".format(self.indices["block_flag"], query_string)
+        """
+        Get the last processed block
+
+        Only blocks processed without holes from the first extracted block are taken into account,
+        see ClickhouseBlockRanges.get_max_block
+
+        Parameters
+        ----------
+        query : dict
+            Names of stages, i.e. {"traces_extracted": 1}.
+            The last extracted block is used if no stages specified
+        min_consistent_block : int
+            Lower bound for result
+
+        Returns
+        -------
+        int
+            Number of block
+        """
+        extracted = ClickhouseBlockRanges(BLOCKS_EXTRACTED, self.client, self.indices)
+        extracted_ranges = extracted.load()
+        start = extracted_ranges[0][0] if extracted_ranges else 0
+        if query:
+            max_blocks = [
+                ClickhouseBlockRanges(name, self.client, self.indices).get_max_block(start)
+                for name in query
+            ]
         else:
-            sql += " FROM {}".format(self.indices["block"])
-        return max(self.client.send_sql_request(sql), min_consistent_block)
+            max_blocks = [extracted.get_max_block(start)]
+        return max([block for block in max_blocks if block is not None] + [min_consistent_block])